@@ -33,7 +33,11 @@ from src.visualization.geo_charts import (
     create_geo_fear_timeline,
     create_neighborhood_chart,
 )
-from src.visualization.topic_charts import create_topic_distribution_chart
+from src.visualization.topic_charts import (
+    create_topic_distribution_chart,
+    create_topic_phase_heatmap,
+    create_topic_timeline,
+)
 
 st.set_page_config(page_title="South Shore Sentiment Study", page_icon="🏘️", layout="wide")
 
@@ -87,6 +91,8 @@ def load_data():
         ("platform", exp / "platform_contrast.parquet"),
         ("geo", exp / "geo_emotions.parquet"),
         ("topics", pro / "topics.parquet"),
+        ("topics_phase", exp / "topics_over_time_phase.parquet"),
+        ("topics_day", exp / "topics_over_time_day.parquet"),
     ]:
         try:
             d[name] = pd.read_parquet(path)
@@ -105,6 +111,26 @@ def load_data():
 
 data = load_data()
 
+
+def score_text(text: str) -> pd.DataFrame:
+    """Ad-hoc scores: all models via the local model server if it runs, else VADER only."""
+    from src.analysis.emotions import emotion_frame, emotion_matrix
+    from src.analysis.inference import model_labels
+    from src.analysis.model_server import get_client
+    from src.analysis.sentiment import roberta_matrix, score_vader, sentiment_frame
+
+    client = get_client()
+    if client is None:
+        st.caption("VADER only — run `make model-server` to add RoBERTa and GoEmotions.")
+        return pd.DataFrame([score_vader(text)])
+
+    vader = client.score("vader", [text])
+    roberta_pipe, emotion_pipe = client.pipeline("roberta"), client.pipeline("goemotions")
+    roberta = roberta_matrix(roberta_pipe.proba([text]), model_labels(roberta_pipe))
+    emotions = emotion_matrix(emotion_pipe.proba([text]), model_labels(emotion_pipe))
+    return pd.DataFrame({**sentiment_frame(vader, roberta), **emotion_frame(emotions)})
+
+
 with st.sidebar:
     st.title("🏘️ South Shore Sentiment Study")
     st.markdown("---")
@@ -147,6 +173,14 @@ with tab1:
     if not data["daily"].empty:
         st.plotly_chart(create_sentiment_heatmap(data["daily"]), width="stretch")
 
+    with st.expander("🔎 Score your own text"):
+        text = st.text_area("Text", placeholder="Paste a post or comment")
+        if st.button("Score") and text.strip():
+            try:
+                st.dataframe(score_text(text), width="stretch")
+            except Exception as e:
+                st.error(f"Scoring failed: {e}")
+
 with tab2:
     st.header("Discussion Themes")
     if not data["topics"].empty:
@@ -156,6 +190,32 @@ with tab2:
         st.write(f"**{len(tp)} posts**")
         if not tp.empty and isinstance(tp["top_terms"].iloc[0], list):
             st.write(f"Top terms: {', '.join(tp['top_terms'].iloc[0][:10])}")
+        if not data["topics_phase"].empty:
+            phase_rows = data["topics_phase"][data["topics_phase"]["phase"].isin(selected_phases)]
+            st.plotly_chart(create_topic_phase_heatmap(phase_rows), width="stretch")
+            slices = phase_rows[phase_rows["topic_label"] == sel]
+            if not slices.empty:
+                st.dataframe(
+                    slices.assign(terms=slices["terms"].map(", ".join))[
+                        ["phase", "n_posts", "share", "terms"]
+                    ],
+                    hide_index=True,
+                )
+        if not data["topics_day"].empty:
+            st.plotly_chart(create_topic_timeline(data["topics_day"]), width="stretch")
+        with st.expander("🔎 Similar posts"):
+            query = st.text_input("Post id or text", key="similar_query")
+            if query:
+                try:
+                    from src.analysis.similar_posts import similar_posts
+
+                    known = query in set(data["topics"]["id"])
+                    hits = similar_posts(
+                        post_id=query if known else None, text=None if known else query
+                    )
+                    st.dataframe(hits, hide_index=True)
+                except Exception as e:
+                    st.error(f"Similar-post search failed: {e}")
     else:
         st.info("Run `make analyze`")
 
@@ -0,0 +1,136 @@
+"""
+Confidence-gated cascade — VADER first, transformers only for posts it can't settle.
+
+VADER's confidence in a post is ``|compound|`` when it leans one way and its
+neutral share when it doesn't, so strongly polarized and plainly neutral
+one-liners score high. Posts at or above the threshold keep VADER's scores
+(RoBERTa columns NULL, VADER-derived emotions) and are flagged
+``score_tier = 'vader'``; the rest go through RoBERTa and GoEmotions as usual
+and are flagged ``'transformer'`` (``'distilled'`` on that backend).
+
+The cascade is off unless ``cascade.threshold`` is set in config/settings.yaml
+or passed to ``src.analysis.scoring --cascade-threshold``. Pick a threshold
+with the calibration report, which replays the gate over posts that already
+have full transformer scores:
+
+Usage:
+    python -m src.analysis.cascade                       # report → data/exports/cascade_calibration.csv
+    python -m src.analysis.cascade --thresholds 0.5 0.7 0.9
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from src.utils.constants import PROJECT_ROOT
+from src.utils.db import get_connection
+from src.utils.logger import log
+from src.utils.settings import get_setting
+
+NEUTRAL_BAND = 0.05  # |compound| at or below this is VADER's neutral call (see sentiment_labels)
+DEFAULT_THRESHOLDS = (0.5, 0.6, 0.7, 0.8, 0.9, 0.95)
+CALIBRATION_PATH = PROJECT_ROOT / "data" / "exports" / "cascade_calibration.csv"
+
+
+def model_tier(backend: str) -> str:
+    """``score_tier`` of posts scored by the models on ``backend`` (not settled by VADER)."""
+    return "distilled" if backend == "distilled" else "transformer"
+
+
+def cascade_threshold(threshold: float | None = None) -> float | None:
+    """Resolve the threshold (argument → settings ``cascade.threshold``); None = cascade off."""
+    if threshold is None:
+        threshold = get_setting("cascade", "threshold")
+    return None if threshold is None else float(threshold)
+
+
+def vader_confidence(vader: np.ndarray) -> np.ndarray:
+    """Confidence in VADER's call for an (N × 4) ``VADER_KEYS`` matrix, in [0, 1]."""
+    vader = np.asarray(vader, dtype=np.float32).reshape(-1, 4)
+    compound, neutral = np.abs(vader[:, 0]), vader[:, 3]
+    return np.where(compound > NEUTRAL_BAND, compound, neutral)
+
+
+def settled_by_vader(vader: np.ndarray, threshold: float | None) -> np.ndarray:
+    """Boolean mask of posts VADER settles on its own (all False when the cascade is off)."""
+    if threshold is None:
+        return np.zeros(len(vader), dtype=bool)
+    return vader_confidence(vader) >= threshold
+
+
+def calibration_report(conn, thresholds: tuple[float, ...] = DEFAULT_THRESHOLDS) -> pd.DataFrame:
+    """Agreement with the full models and compute saved at each threshold.
+
+    Uses posts whose stored scores came from the transformer tier. For each
+    threshold: share of posts and of words (a proxy for transformer tokens)
+    the cascade would skip, and how often the cascaded sentiment label and
+    dominant emotion match the full-model ones — overall and among skipped posts.
+    """
+    from src.analysis.emotions import dominant_emotions, vader_emotion_matrix
+    from src.analysis.sentiment import sentiment_labels
+
+    df = conn.execute("""
+        SELECT c.word_count, e.vader_compound, e.vader_positive, e.vader_negative,
+               e.vader_neutral, e.sentiment_label, e.dominant_emotion
+        FROM posts_clean c JOIN posts_emotions e ON c.id = e.id
+        WHERE c.is_duplicate = false AND c.quality_flag = 'ok'
+          AND e.roberta_positive IS NOT NULL AND e.dominant_emotion IS NOT NULL
+          AND coalesce(e.score_tier, 'transformer') = 'transformer'
+    """).fetchdf()
+    if df.empty:
+        return pd.DataFrame()
+
+    vader = df[["vader_compound", "vader_positive", "vader_negative", "vader_neutral"]].to_numpy()
+    words = df["word_count"].fillna(0).to_numpy()
+    nan = np.full(len(df), np.nan)
+    vader_label = sentiment_labels(vader[:, 0], nan, nan)
+    vader_dominant, _ = dominant_emotions(vader_emotion_matrix(vader[:, 0]))
+    label_match = vader_label == df["sentiment_label"].to_numpy()
+    emotion_match = vader_dominant == df["dominant_emotion"].to_numpy()
+
+    rows = []
+    for threshold in thresholds:
+        skip = settled_by_vader(vader, threshold)
+        n_skip = int(skip.sum())
+        rows.append(
+            {
+                "threshold": threshold,
+                "n_posts": len(df),
+                "n_skipped": n_skip,
+                "posts_saved": n_skip / len(df),
+                "words_saved": float(words[skip].sum() / max(words.sum(), 1)),
+                # Posts that still run the transformers agree by construction
+                "label_agreement": float(np.where(skip, label_match, True).mean()),
+                "emotion_agreement": float(np.where(skip, emotion_match, True).mean()),
+                "skipped_label_agreement": float(label_match[skip].mean()) if n_skip else np.nan,
+                "skipped_emotion_agreement": float(emotion_match[skip].mean())
+                if n_skip
+                else np.nan,
+            }
+        )
+    return pd.DataFrame(rows)
+
+
+def run_calibration(thresholds: tuple[float, ...] = DEFAULT_THRESHOLDS) -> pd.DataFrame:
+    """Write the calibration report for the current database to CALIBRATION_PATH."""
+    conn = get_connection()
+    report = calibration_report(conn, thresholds)
+    conn.close()
+    if report.empty:
+        log.warning("No transformer-scored posts to calibrate against — run scoring first")
+        return report
+
+    CALIBRATION_PATH.parent.mkdir(parents=True, exist_ok=True)
+    report.to_csv(CALIBRATION_PATH, index=False)
+    log.info(f"Cascade calibration on {report['n_posts'].iloc[0]} posts → {CALIBRATION_PATH}")
+    log.info(f"\n{report.drop(columns='n_posts').to_string(index=False, float_format='%.3f')}")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Calibrate the VADER → transformer cascade")
+    parser.add_argument("--thresholds", type=float, nargs="+", default=list(DEFAULT_THRESHOLDS))
+    args = parser.parse_args()
+
+    run_calibration(tuple(args.thresholds))
@@ -27,12 +27,15 @@ def clean_text(text: str) -> str:
     if not isinstance(text, str):
         return ""
 
-    # Remove URLs
-    text = re.sub(r"https?://\S+", "", text)
     # Remove Reddit-specific markdown
     text = re.sub(r"\[([^\]]+)\]\([^\)]+\)", r"\1", text)  # [text](url) → text
+    text = re.sub(r"\[(?:deleted|removed)\]", "", text)
     text = re.sub(r"/?r/\w+", "", text)  # r/subreddit
     text = re.sub(r"/?u/\w+", "", text)  # u/username
+    # Remove URLs and @mentions; hashtags keep their word
+    text = re.sub(r"https?://\S+|www\.\S+", "", text)
+    text = re.sub(r"(?<!\w)@\w+", "", text)
+    text = re.sub(r"(?<!\w)#(\w+)", r"\1", text)
     # Remove excessive whitespace
     text = re.sub(r"\s+", " ", text).strip()
     # Remove very short results
@@ -61,16 +64,123 @@ def detect_phase(dt_str: str) -> str:
             if phase_info["start"] <= date_str <= phase_info["end"]:
                 return phase_name
 
-        return "outside_window"
+        return "out_of_window"
     except Exception:
         return "unknown"
 
 
+def tokenize_simple(text: str) -> list[str]:
+    """Lowercased word tokens (letters only; digits and punctuation dropped)."""
+    return re.findall(_WORD_RE, (text or "").lower())
+
+
 def compute_text_hash(text: str) -> str:
     """SHA-256 hash for deduplication."""
     return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
 
 
+# ── Quality Flagging ─────────────────────────────────────────
+
+MIN_WORDS = 3  # Fewer words → 'short'
+SPAM_MIN_URLS = 3  # Absolute URL count that marks a post as link spam
+SPAM_URL_RATIO = 0.3  # URLs per token (with at least 2 URLs)
+SPAM_MIN_UNIQUE_RATIO = 0.3  # Distinct/total tokens for posts with 8+ tokens
+SPAM_REPEAT_SHARE = 0.5  # Share of a post's characters in 10+ runs of one letter
+NON_ENGLISH_MIN_TOKENS = 4  # Too few tokens → no language decision
+NON_LATIN_RATIO = 0.5  # Share of letters outside basic Latin
+
+# Transformer passes a flagged post no longer goes through:
+# RoBERTa sentiment, GoEmotions, BERTopic embeddings.
+INFERENCE_PASSES = 3
+
+# Compact stopword profiles for language ID. English competes against the
+# languages most likely to appear in Chicago local discussion.
+LANGUAGE_STOPWORDS = {
+    "en": set(
+        "the and is are was were to of in that it this for with on be have has not "
+        "they you we what about at from but or by an so just".split()
+    ),
+    "es": set(
+        "el la los las que y en es por con para una del se lo como pero su al muy "
+        "está son nos ellos nuestra nuestro porque también".split()
+    ),
+    "fr": set(
+        "le les et est une des du que qui dans pour pas sur avec ce sont nous vous "
+        "mais très".split()
+    ),
+    "pt": set(
+        "o os as e que não uma do da em para com por mais são muito nós também isso está".split()
+    ),
+}
+
+_URL_RE = r"https?://\S+|www\.\S+"
+_WORD_RE = r"[^\W\d_]+"
+_REPEATED_LETTER_RE = r"([^\W\d_])\1{9,}"
+
+
+def flag_quality_column(texts: pd.Series, word_counts: pd.Series) -> pd.Series:
+    """Vectorized quality flags: 'ok' | 'short' | 'spam' | 'non_english'.
+
+    ``texts`` should be the original (uncleaned) text so URL density is
+    still measurable; precedence is short → spam → non_english.
+    """
+    # Object dtype keeps Python `re` semantics (backreferences) on every pandas version
+    texts = texts.fillna("").astype(str).astype(object)
+    word_counts = word_counts.fillna(0).astype(int)
+
+    # Spam: URL density and repetition
+    n_urls = texts.str.count(_URL_RE)
+    no_urls = texts.str.replace(_URL_RE, " ", regex=True).str.lower()
+    n_tokens = texts.str.split().str.len().fillna(0)
+    url_ratio = n_urls / n_tokens.clip(lower=1)
+
+    words = no_urls.str.findall(_WORD_RE)
+    n_words = words.str.len()
+    exploded = words.explode().dropna()
+    n_unique = exploded.groupby(level=0).nunique().reindex(texts.index, fill_value=0)
+    unique_ratio = n_unique / n_words.clip(lower=1)
+
+    # Keyboard mashing: letter runs that make up most of the post. Emphasis
+    # ("Nooooooooooo", "!!!!!!!!!!", emoji runs, separators) is not spam.
+    n_chars = no_urls.str.count(r"\S")
+    n_repeated = n_chars - no_urls.str.replace(_REPEATED_LETTER_RE, "", regex=True).str.count(r"\S")
+    repeat_share = n_repeated / n_chars.clip(lower=1)
+
+    is_spam = (
+        (n_urls >= SPAM_MIN_URLS)
+        | ((n_urls >= 2) & (url_ratio > SPAM_URL_RATIO))
+        | ((n_words >= 8) & (unique_ratio < SPAM_MIN_UNIQUE_RATIO))
+        | (repeat_share > SPAM_REPEAT_SHARE)
+    )
+
+    # Language: non-Latin script share, then stopword profile vote
+    n_letters = no_urls.str.count(r"[^\W\d_]")
+    n_latin = no_urls.str.count(r"[a-zà-ÿ]")
+    non_latin = (n_letters > 0) & (
+        (n_letters - n_latin) / n_letters.clip(lower=1) > NON_LATIN_RATIO
+    )
+
+    hits = pd.DataFrame(
+        {
+            lang: exploded.isin(stops).groupby(level=0).sum()
+            for lang, stops in LANGUAGE_STOPWORDS.items()
+        }
+    ).reindex(texts.index, fill_value=0)
+    foreign = hits.drop(columns="en").max(axis=1)
+    non_english = non_latin | ((n_words >= NON_ENGLISH_MIN_TOKENS) & (foreign > hits["en"]))
+
+    flags = pd.Series("ok", index=texts.index, dtype=object)
+    flags[non_english] = "non_english"
+    flags[is_spam] = "spam"
+    flags[word_counts < MIN_WORDS] = "short"
+    return flags
+
+
+def flag_quality(text: str, word_count: int) -> str:
+    """Quality flag for a single post (see ``flag_quality_column``)."""
+    return flag_quality_column(pd.Series([text]), pd.Series([word_count])).iloc[0]
+
+
 # ── Main Pipeline ────────────────────────────────────────────
 
 
@@ -113,6 +223,17 @@ def run_cleaning():
     # Word count
     df["word_count"] = df["text_clean"].str.split().str.len()
 
+    # Quality flags — only 'ok' posts reach the transformer stages
+    df["is_duplicate"] = False
+    df["quality_flag"] = flag_quality_column(df["text"], df["word_count"])
+    flag_dist = df["quality_flag"].value_counts().to_dict()
+    n_flagged = int((df["quality_flag"] != "ok").sum())
+    log.info(f"Quality flags: {flag_dist}")
+    log.info(
+        f"Inference calls saved: {n_flagged * INFERENCE_PASSES} "
+        f"({n_flagged} posts × {INFERENCE_PASSES} model passes)"
+    )
+
     # Store to DuckDB
     con.execute(f"DROP TABLE IF EXISTS {TABLE_POSTS_CLEAN}")
     con.execute(f"""
@@ -131,7 +252,9 @@ def run_cleaning():
             parent_id,
             post_type,
             phase,
-            word_count
+            word_count,
+            is_duplicate,
+            quality_flag
         FROM df
     """)
 
@@ -0,0 +1,357 @@
+"""
+Distilled scorer — a hashed n-gram linear model trained on the transformers' own outputs.
+
+The corpus is one narrow domain, so a compact student model can reproduce
+most of what RoBERTa and GoEmotions say about it. ``train_distilled`` reads
+the teacher scores already stored in posts_emotions and fits two heads on
+hashed word uni- and bigrams (log term frequency, L2-normalized):
+
+- sentiment: softmax over positive / negative / neutral (the roberta_* columns)
+- emotions: one sigmoid per target emotion (the emo_* columns)
+
+Training is plain mini-batch AdaGrad in numpy against the soft teacher
+targets. Every fifth post (by id hash) is held out for the agreement report,
+broken down by phase and platform.
+
+The trained model is the 'distilled' inference backend: ``--backend distilled``
+(or INFERENCE_BACKEND=distilled) makes the scoring stages use it in place of
+both transformers, with the same output columns.
+
+Usage:
+    python -m src.analysis.distilled               # train + agreement report
+    python -m src.analysis.distilled --report-only # re-check the saved model
+"""
+
+import argparse
+import hashlib
+import json
+import re
+import time
+import zlib
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+from src.utils.constants import PROJECT_ROOT, TARGET_EMOTIONS
+from src.utils.db import get_connection
+from src.utils.logger import log
+from src.utils.settings import get_setting
+
+MODEL_PATH = PROJECT_ROOT / "data" / "processed" / "distilled" / "model.npz"
+REPORT_PATH = PROJECT_ROOT / "data" / "exports" / "distilled_agreement.csv"
+
+SENTIMENT_LABELS = ["positive", "negative", "neutral"]  # roberta_* column order
+HEADS = {"sentiment": slice(0, 3), "emotions": slice(3, 3 + len(TARGET_EMOTIONS))}
+TEACHER_COLUMNS = [f"roberta_{k}" for k in SENTIMENT_LABELS] + [f"emo_{e}" for e in TARGET_EMOTIONS]
+HOLDOUT_EVERY = 5  # Posts whose id hashes to 0 mod this are held out
+
+_TOKEN = re.compile(r"[a-z0-9']+")
+_model = None
+
+
+# ── Features ────────────────────────────────────────────────
+
+
+def _ngrams(text: str) -> list[str]:
+    words = ["<s>", *_TOKEN.findall(text.lower() if isinstance(text, str) else ""), "</s>"]
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+def featurize(texts: list[str], n_features: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Hashed n-gram features as CSR arrays (indptr, columns, values).
+
+    Values are log(1 + count), L2-normalized per text. The sentence markers
+    guarantee every row has at least one feature.
+    """
+    indptr, cols, vals = [0], [], []
+    for text in texts:
+        hashed = [zlib.crc32(gram.encode()) % n_features for gram in _ngrams(text)]
+        idx, counts = np.unique(hashed, return_counts=True)
+        weight = np.log1p(counts)
+        cols.append(idx)
+        vals.append(weight / np.linalg.norm(weight))
+        indptr.append(indptr[-1] + len(idx))
+    return (
+        np.asarray(indptr, dtype=np.int64),
+        np.concatenate(cols).astype(np.int64),
+        np.concatenate(vals).astype(np.float32),
+    )
+
+
+def _logits(weights, bias, indptr, cols, vals) -> np.ndarray:
+    return np.add.reduceat(weights[cols] * vals[:, None], indptr[:-1], axis=0) + bias
+
+
+def _softmax(z: np.ndarray) -> np.ndarray:
+    e = np.exp(z - z.max(axis=1, keepdims=True))
+    return e / e.sum(axis=1, keepdims=True)
+
+
+def _sigmoid(z: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-z))
+
+
+# ── Model ───────────────────────────────────────────────────
+
+
+@dataclass
+class DistilledModel:
+    """Student weights (features × 11 outputs) plus training metadata."""
+
+    weights: np.ndarray
+    bias: np.ndarray
+    meta: dict = field(default_factory=dict)
+    revision: str | None = None
+
+    @property
+    def n_features(self) -> int:
+        return self.weights.shape[0]
+
+    def predict(self, texts: list[str]) -> tuple[np.ndarray, np.ndarray]:
+        """(sentiment N × 3 in ``SENTIMENT_LABELS`` order, emotions N × 8) probabilities."""
+        if not len(texts):
+            return np.zeros((0, 3), np.float32), np.zeros((0, len(TARGET_EMOTIONS)), np.float32)
+        z = _logits(self.weights, self.bias, *featurize(texts, self.n_features))
+        return (
+            _softmax(z[:, HEADS["sentiment"]]).astype(np.float32),
+            _sigmoid(z[:, HEADS["emotions"]]).astype(np.float32),
+        )
+
+    def save(self, path=MODEL_PATH) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "wb") as f:
+            np.savez_compressed(
+                f, weights=self.weights, bias=self.bias, meta=np.array(json.dumps(self.meta))
+            )
+        self.revision = _file_revision(path)
+
+    @classmethod
+    def load(cls, path=MODEL_PATH) -> "DistilledModel":
+        if not path.exists():
+            raise FileNotFoundError(
+                f"No distilled model at {path} — train one with `make distill` first"
+            )
+        with np.load(path) as data:
+            return cls(
+                weights=data["weights"],
+                bias=data["bias"],
+                meta=json.loads(str(data["meta"])),
+                revision=_file_revision(path),
+            )
+
+
+def _file_revision(path) -> str:
+    return "distilled-" + hashlib.sha256(path.read_bytes()).hexdigest()[:12]
+
+
+@dataclass
+class DistilledPipeline:
+    """One head of the student model in the shape the scoring stages expect.
+
+    ``src.analysis.inference.model_labels`` and ``score_cache.pipeline_revision``
+    work on it unchanged; ``proba`` replaces ``predict_proba``.
+    """
+
+    student: DistilledModel
+    head: str
+    revision: str | None = None
+    model: SimpleNamespace = field(default_factory=SimpleNamespace)
+
+    def proba(self, texts: list[str]) -> np.ndarray:
+        sentiment, emotions = self.student.predict(texts)
+        return sentiment if self.head == "sentiment" else emotions
+
+
+def load_distilled_pipeline(head: str) -> DistilledPipeline:
+    """The 'sentiment' or 'emotions' head of the saved student model (loaded once)."""
+    global _model
+    if _model is None:
+        _model = DistilledModel.load()
+        log.info(f"Distilled model loaded ({_model.revision}, {_model.meta.get('n_train')} posts)")
+    labels = SENTIMENT_LABELS if head == "sentiment" else TARGET_EMOTIONS
+    config = SimpleNamespace(
+        id2label=dict(enumerate(labels)),
+        num_labels=len(labels),
+        name_or_path=str(MODEL_PATH),
+        _commit_hash=_model.revision,
+    )
+    return DistilledPipeline(
+        _model, head, revision=_model.revision, model=SimpleNamespace(config=config)
+    )
+
+
+# ── Training ────────────────────────────────────────────────
+
+
+def load_teacher_scores(conn) -> pd.DataFrame:
+    """Clean posts with complete transformer-tier scores, plus a holdout flag."""
+    cols = ", ".join(f"e.{c}" for c in TEACHER_COLUMNS)
+    df = conn.execute(f"""
+        SELECT c.id, c.text_clean, c.phase, c.platform, e.vader_compound,
+               e.sentiment_label, e.dominant_emotion, {cols}
+        FROM posts_clean c JOIN posts_emotions e ON c.id = e.id
+        WHERE c.is_duplicate = false AND c.quality_flag = 'ok'
+          AND e.roberta_positive IS NOT NULL AND e.emotion_confidence IS NOT NULL
+          AND coalesce(e.score_tier, 'transformer') = 'transformer'
+        ORDER BY c.id
+    """).fetchdf()
+    df["holdout"] = [zlib.crc32(str(i).encode()) % HOLDOUT_EVERY == 0 for i in df["id"]]
+    return df
+
+
+def fit(
+    texts: list[str],
+    targets: np.ndarray,
+    n_features: int = 2**18,
+    epochs: int = 8,
+    learning_rate: float = 0.1,
+    l2: float = 1e-6,
+    batch_size: int = 256,
+    seed: int = 42,
+) -> DistilledModel:
+    """Fit both heads to soft teacher targets (N × 11, ``TEACHER_COLUMNS`` order)."""
+    rng = np.random.default_rng(seed)
+    order = rng.permutation(len(texts))
+    indptr, cols, vals = featurize([texts[i] for i in order], n_features)
+    targets = np.asarray(targets, dtype=np.float32)[order]
+
+    n_out = targets.shape[1]
+    weights = np.zeros((n_features, n_out), dtype=np.float32)
+    # Start from the teacher's priors so the weights only learn what the text adds
+    prior = targets.mean(axis=0).clip(1e-4, 1 - 1e-4)
+    bias = np.concatenate(
+        [
+            np.log(prior[HEADS["sentiment"]]),
+            np.log(prior[HEADS["emotions"]] / (1 - prior[HEADS["emotions"]])),
+        ]
+    ).astype(np.float32)
+    g2_weights = np.full_like(weights, 1e-8)
+    g2_bias = np.full_like(bias, 1e-8)
+
+    for epoch in range(epochs):
+        loss = 0.0
+        for start in range(0, len(texts), batch_size):
+            stop = min(start + batch_size, len(texts))
+            lo, hi = indptr[start], indptr[stop]
+            b_ptr, b_cols, b_vals = indptr[start : stop + 1] - lo, cols[lo:hi], vals[lo:hi]
+            y = targets[start:stop]
+
+            z = _logits(weights, bias, b_ptr, b_cols, b_vals)
+            p_sent = _softmax(z[:, HEADS["sentiment"]])
+            p_emo = _sigmoid(z[:, HEADS["emotions"]])
+            loss += float(-(y[:, HEADS["sentiment"]] * np.log(p_sent + 1e-9)).sum())
+            grad = np.hstack([p_sent - y[:, HEADS["sentiment"]], p_emo - y[:, HEADS["emotions"]]])
+            grad /= stop - start
+
+            # Sparse AdaGrad step on the feature rows this batch touched
+            rows = np.repeat(np.arange(stop - start), np.diff(b_ptr))
+            touched, inverse = np.unique(b_cols, return_inverse=True)
+            g_w = np.zeros((len(touched), n_out), dtype=np.float32)
+            np.add.at(g_w, inverse, b_vals[:, None] * grad[rows])
+            g_w += l2 * weights[touched]
+            g2_weights[touched] += g_w**2
+            weights[touched] -= learning_rate * g_w / np.sqrt(g2_weights[touched])
+            g_b = grad.sum(axis=0)
+            g2_bias += g_b**2
+            bias -= learning_rate * g_b / np.sqrt(g2_bias)
+        log.info(f"   epoch {epoch + 1}/{epochs}: sentiment cross-entropy {loss / len(texts):.4f}")
+
+    return DistilledModel(weights=weights, bias=bias)
+
+
+def agreement_report(student: DistilledModel, df: pd.DataFrame) -> pd.DataFrame:
+    """Student vs teacher on ``df``: overall, per phase and per platform.
+
+    Sentiment labels are re-derived with the student's RoBERTa-equivalent
+    scores (VADER unchanged) and compared with the stored labels; dominant
+    emotions likewise.
+    """
+    from src.analysis.emotions import dominant_emotions
+    from src.analysis.sentiment import sentiment_labels
+
+    sentiment, emotions = student.predict(df["text_clean"].tolist())
+    teacher = df[TEACHER_COLUMNS].to_numpy(dtype=np.float32)
+    label = sentiment_labels(df["vader_compound"], sentiment[:, 0], sentiment[:, 1])
+    dominant, _ = dominant_emotions(emotions)
+    scored = pd.DataFrame(
+        {
+            "phase": df["phase"].fillna("unknown").values,
+            "platform": df["platform"].fillna("unknown").values,
+            "label_agreement": label == df["sentiment_label"].to_numpy(),
+            "roberta_top_agreement": sentiment.argmax(1)
+            == teacher[:, HEADS["sentiment"]].argmax(1),
+            "emotion_agreement": dominant == df["dominant_emotion"].to_numpy(),
+            "emotion_mae": np.abs(emotions - teacher[:, HEADS["emotions"]]).mean(axis=1),
+        }
+    )
+    metrics = ["label_agreement", "roberta_top_agreement", "emotion_agreement", "emotion_mae"]
+
+    frames = [scored[metrics].mean().to_frame().T.assign(group="all", value="all", n=len(scored))]
+    for group in ("phase", "platform"):
+        by = scored.groupby(group)
+        stats = by[metrics].mean().assign(n=by.size()).reset_index()
+        frames.append(stats.rename(columns={group: "value"}).assign(group=group))
+    return pd.concat(frames, ignore_index=True)[["group", "value", "n", *metrics]]
+
+
+def _report(student: DistilledModel, holdout: pd.DataFrame) -> pd.DataFrame:
+    start = time.perf_counter()
+    report = agreement_report(student, holdout)
+    seconds = time.perf_counter() - start
+    REPORT_PATH.parent.mkdir(parents=True, exist_ok=True)
+    report.to_csv(REPORT_PATH, index=False)
+    log.info(f"Agreement on {len(holdout)} held-out posts → {REPORT_PATH}")
+    log.info(f"\n{report.to_string(index=False, float_format='%.3f')}")
+    log.info(f"   Student throughput: {len(holdout) / max(seconds, 1e-9):,.0f} posts/s")
+    return report
+
+
+def train_distilled(report_only: bool = False) -> DistilledModel | None:
+    """Train the student on stored teacher scores, save it and write the agreement report."""
+    global _model
+    conn = get_connection()
+    df = load_teacher_scores(conn)
+    conn.close()
+    if df.empty:
+        log.warning("No transformer-scored posts to distill from — run scoring first")
+        return None
+    train, holdout = df[~df["holdout"]], df[df["holdout"]]
+
+    if report_only:
+        student = DistilledModel.load()
+    else:
+        params = get_setting("models", "distilled", default={}) or {}
+        log.info(
+            f"🧪 Distilling RoBERTa + GoEmotions into a hashed n-gram model ({len(train)} posts)"
+        )
+        student = fit(
+            train["text_clean"].tolist(),
+            train[TEACHER_COLUMNS].to_numpy(dtype=np.float32),
+            **params,
+        )
+        student.meta = {
+            "trained_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "n_train": len(train),
+            "n_holdout": len(holdout),
+            **params,
+        }
+        student.save()
+        _model = None  # Reload on next use so pipelines pick up the new revision
+        log.info(f"✅ Distilled model saved: {MODEL_PATH} ({student.revision})")
+
+    if not holdout.empty:
+        _report(student, holdout)
+    return student
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Distill the transformers into a fast local model")
+    parser.add_argument(
+        "--report-only", action="store_true", help="Agreement report for the saved model"
+    )
+    args = parser.parse_args()
+
+    train_distilled(report_only=args.report_only)
@@ -0,0 +1,174 @@
+"""
+Embedding store — sentence embeddings on disk, keyed by text hash.
+
+BERTopic's most expensive step is embedding the corpus. The store keeps
+every embedding it has computed in a float16 matrix that is memory-mapped
+on read, with a parallel index of posts_clean.text_hash values (row i of
+the matrix belongs to line i of the index). Each run embeds only the texts
+the store has not seen and appends them, so a topic refit with different
+hyperparameters skips embedding entirely.
+
+Layout under ``data/processed/embeddings/<model>/``:
+
+- ``meta.json``: model name and embedding dimension
+- ``vectors.f16``: row-major float16 matrix, one row per indexed hash
+- ``index.txt``: one text hash per line
+
+Rows are appended to the matrix before their hashes reach the index, so
+an interrupted append leaves at most unindexed trailing rows, which the
+next append overwrites. Embeddings from another model are never mixed in:
+a store whose meta names a different model is reset.
+"""
+
+import json
+from pathlib import Path
+
+import numpy as np
+
+from src.utils.constants import PROJECT_ROOT
+from src.utils.logger import log
+
+STORE_DIR = PROJECT_ROOT / "data" / "processed" / "embeddings"
+DTYPE = np.float16
+
+
+class EmbeddingStore:
+    """Append-only float16 embedding matrix with a text-hash index."""
+
+    def __init__(self, model_name: str, directory: Path | None = None):
+        self.model_name = model_name
+        self.dir = Path(directory) if directory else STORE_DIR / model_name.replace("/", "__")
+        self.dim: int | None = None
+        self.row: dict[str, int] = {}
+        self._hashes: list[str] = []
+        self.hits = 0
+        self.misses = 0
+        self._load()
+
+    @property
+    def _meta_path(self) -> Path:
+        return self.dir / "meta.json"
+
+    @property
+    def _vectors_path(self) -> Path:
+        return self.dir / "vectors.f16"
+
+    @property
+    def _index_path(self) -> Path:
+        return self.dir / "index.txt"
+
+    def _load(self) -> None:
+        if not self._meta_path.exists():
+            return
+        meta = json.loads(self._meta_path.read_text())
+        if meta.get("model") != self.model_name:
+            log.info(
+                f"Embedding store: {self.dir} holds {meta.get('model')} vectors, "
+                f"resetting for {self.model_name}"
+            )
+            self.clear()
+            return
+        self.dim = int(meta["dim"])
+        hashes = self._index_path.read_text().split() if self._index_path.exists() else []
+        # Hashes whose rows never made it to disk are dropped
+        stored_rows = self._stored_rows()
+        if len(hashes) > stored_rows:
+            log.warning(f"Embedding store: index ahead of vectors, keeping {stored_rows} rows")
+            hashes = hashes[:stored_rows]
+            self._index_path.write_text("".join(f"{h}\n" for h in hashes))
+        self.row = {h: i for i, h in enumerate(hashes)}
+        self._hashes = hashes
+
+    def reload(self) -> None:
+        """Re-read the store from disk (picks up rows appended by other processes)."""
+        self.dim, self.row, self._hashes = None, {}, []
+        self._load()
+
+    def _stored_rows(self) -> int:
+        if not self._vectors_path.exists() or not self.dim:
+            return 0
+        return self._vectors_path.stat().st_size // (self.dim * np.dtype(DTYPE).itemsize)
+
+    def __len__(self) -> int:
+        return len(self.row)
+
+    def __contains__(self, text_hash: str) -> bool:
+        return text_hash in self.row
+
+    def clear(self) -> None:
+        """Delete the stored vectors and index."""
+        for path in (self._vectors_path, self._index_path, self._meta_path):
+            path.unlink(missing_ok=True)
+        self.dim = None
+        self.row = {}
+        self._hashes = []
+
+    def matrix(self) -> np.ndarray:
+        """Read-only memory map over every indexed vector (float16, rows in index order)."""
+        if not self.row:
+            return np.zeros((0, self.dim or 0), dtype=DTYPE)
+        return np.memmap(self._vectors_path, dtype=DTYPE, mode="r", shape=(len(self.row), self.dim))
+
+    def hashes(self) -> list[str]:
+        """Indexed text hashes in row order."""
+        return list(self._hashes)
+
+    def hash_at(self, rows) -> list[str]:
+        """Text hashes of the given matrix rows."""
+        return [self._hashes[r] for r in rows]
+
+    def get(self, hashes: list[str]) -> np.ndarray:
+        """float32 vectors for ``hashes``, all of which must already be stored."""
+        rows = np.fromiter((self.row[h] for h in hashes), dtype=np.int64, count=len(hashes))
+        return np.asarray(self.matrix()[rows], dtype=np.float32)
+
+    def add(self, hashes: list[str], vectors: np.ndarray) -> None:
+        """Append vectors for hashes not yet stored (duplicates keep their first vector)."""
+        vectors = np.asarray(vectors)
+        if vectors.ndim != 2 or len(vectors) != len(hashes):
+            raise ValueError(f"Expected {len(hashes)} embedding rows, got shape {vectors.shape}")
+        if self.dim is None:
+            self.dim = int(vectors.shape[1])
+            self.dir.mkdir(parents=True, exist_ok=True)
+            self._meta_path.write_text(json.dumps({"model": self.model_name, "dim": self.dim}))
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(f"Embedding dimension {vectors.shape[1]} != stored {self.dim}")
+
+        new, keep = {}, []
+        for i, h in enumerate(hashes):
+            if h not in self.row and h not in new:
+                new[h] = len(self.row) + len(new)
+                keep.append(i)
+        if not keep:
+            return
+        # Vectors first, truncated to the indexed rows so leftovers from an interrupted run go
+        with open(self._vectors_path, "ab") as f:
+            f.truncate(len(self.row) * self.dim * np.dtype(DTYPE).itemsize)
+            f.write(np.ascontiguousarray(vectors[keep], dtype=DTYPE).tobytes())
+        with open(self._index_path, "a") as f:
+            f.write("".join(f"{h}\n" for h in new))
+        self.row.update(new)
+        self._hashes.extend(new)
+
+    def get_or_embed(self, hashes: list[str], texts: list[str], embed_fn) -> np.ndarray:
+        """Embedding matrix for ``texts``: stored rows first, ``embed_fn`` for unique misses."""
+        miss_hashes, miss_texts = [], []
+        seen = set()
+        for h, t in zip(hashes, texts):
+            if h not in self.row and h not in seen:
+                seen.add(h)
+                miss_hashes.append(h)
+                miss_texts.append(t)
+        self.hits += len(hashes) - sum(h in seen for h in hashes)
+        self.misses += len(miss_texts)
+        if miss_texts:
+            self.add(miss_hashes, embed_fn(miss_texts))
+        return self.get(hashes)
+
+    def report(self) -> str:
+        total = self.hits + self.misses
+        rate = self.hits / total if total else 0.0
+        return (
+            f"Embedding store: {self.hits} stored, {self.misses} embedded "
+            f"({rate:.0%} hit rate, {len(self)} vectors on disk)"
+        )
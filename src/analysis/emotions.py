@@ -5,130 +5,294 @@ Maps 27 GoEmotions labels to 8 target emotions:
 fear, anger, sadness, joy, surprise, disgust, gratitude, pride.
 """
 
+import argparse
+from collections import Counter
+from contextlib import ExitStack
+from functools import lru_cache, partial
+
+import numpy as np
+
+from src.analysis.cascade import model_tier
+from src.analysis.distilled import DistilledPipeline, load_distilled_pipeline
+from src.analysis.inference import (
+    DEFAULT_MAX_BATCH_SIZE,
+    model_labels,
+    predict_proba,
+    sliding_window,
+)
+from src.analysis.model_server import RemotePipeline, get_client
+from src.analysis.onnx_backend import BACKENDS, get_backend, load_onnx_pipeline
+from src.analysis.score_cache import ScoreCache, cache_model_name, pipeline_revision, text_hashes
+from src.analysis.sentences import SentenceCache, pooling_rule, sentence_mode
+from src.analysis.streaming import (
+    DEFAULT_CHUNK_SIZE,
+    ParquetAppender,
+    clean_post_batches,
+    count_clean_posts,
+    score_schema,
+    scored_post_batches,
+)
+from src.analysis.worker_pool import InferencePool
 from src.utils.constants import GOEMOTIONS_MAP, PROJECT_ROOT, TARGET_EMOTIONS
-from src.utils.db import get_connection, init_database
+from src.utils.db import bulk_upsert, get_connection, init_database
 from src.utils.logger import log
+from src.utils.settings import get_setting
+
+GOEMOTIONS_MODEL = "monologg/bert-base-cased-goemotions-original"
 
-_emotion_pipeline = None
+EMOTION_COLUMNS = [f"emo_{e}" for e in TARGET_EMOTIONS] + ["dominant_emotion", "emotion_confidence"]
+EMOTION_DONE = "e.emotion_confidence IS NOT NULL"  # posts_emotions rows --resume skips
 
+_emotion_pipelines = {}  # backend → loaded pipeline
 
-def _get_pipeline():
-    global _emotion_pipeline
-    if _emotion_pipeline is None:
-        from transformers import pipeline
 
-        _emotion_pipeline = pipeline(
-            "text-classification",
-            model="monologg/bert-base-cased-goemotions-original",
-            tokenizer="monologg/bert-base-cased-goemotions-original",
-            max_length=512,
-            truncation=True,
-            top_k=None,
+def _get_pipeline(backend: str | None = None):
+    backend = get_backend(backend)
+    if backend not in _emotion_pipelines:
+        client = get_client()
+        if client is not None:
+            _emotion_pipelines[backend] = client.pipeline("goemotions", backend)
+        elif backend == "distilled":
+            _emotion_pipelines[backend] = load_distilled_pipeline("emotions")
+        elif backend == "torch":
+            from transformers import pipeline
+
+            _emotion_pipelines[backend] = pipeline(
+                "text-classification",
+                model=GOEMOTIONS_MODEL,
+                tokenizer=GOEMOTIONS_MODEL,
+                max_length=512,
+                truncation=True,
+                top_k=None,
+            )
+        else:
+            _emotion_pipelines[backend] = load_onnx_pipeline(
+                GOEMOTIONS_MODEL, quantize=backend == "onnx-int8"
+            )
+        where = "model server" if client is not None else "in-process"
+        log.info(f"GoEmotions pipeline loaded ({backend}, {where})")
+    return _emotion_pipelines[backend]
+
+
+def emotion_proba(
+    texts: list[str],
+    max_tokens: int | None = None,
+    max_batch_size: int | None = None,
+    backend: str | None = None,
+) -> np.ndarray:
+    """Raw GoEmotions probabilities (N × labels, ``model_labels`` order; NaN rows = failed text)."""
+    pipe = _get_pipeline(backend)
+    batch = [t if t and isinstance(t, str) and len(t.strip()) > 0 else "neutral" for t in texts]
+    if isinstance(pipe, (RemotePipeline, DistilledPipeline)):
+        return pipe.proba(batch)
+    if max_batch_size is None:
+        max_batch_size = get_setting(
+            "models", "goemotions", "batch_size", default=DEFAULT_MAX_BATCH_SIZE
         )
-        log.info("GoEmotions pipeline loaded")
-    return _emotion_pipeline
+    return predict_proba(pipe, batch, max_tokens, max_batch_size, **sliding_window())
 
 
-def score_emotions_batch(texts: list[str], batch_size: int = 32) -> list[dict]:
-    pipe = _get_pipeline()
-    results = []
-    for i in range(0, len(texts), batch_size):
-        batch = [
-            t if t and isinstance(t, str) and len(t.strip()) > 0 else "neutral"
-            for t in texts[i : i + batch_size]
+@lru_cache(maxsize=8)
+def _target_index(labels: tuple[str, ...]) -> np.ndarray:
+    """Target-emotion column for each model label (-1 = unmapped)."""
+    return np.array(
+        [
+            TARGET_EMOTIONS.index(GOEMOTIONS_MAP[label])
+            if GOEMOTIONS_MAP.get(label) in TARGET_EMOTIONS
+            else -1
+            for label in labels
         ]
-        try:
-            preds = pipe(batch)
-            for pred in preds:
-                scores = {e: 0.0 for e in TARGET_EMOTIONS}
-                if isinstance(pred, list):
-                    for item in pred:
-                        target = GOEMOTIONS_MAP.get(item["label"].lower())
-                        if target and target in scores:
-                            scores[target] = max(scores[target], item["score"])
-                results.append(scores)
-        except Exception as e:
-            log.warning(f"GoEmotions batch error: {e}")
-            results.extend([{e: 0.0 for e in TARGET_EMOTIONS}] * len(batch))
-    return results
-
-
-def determine_dominant(scores: dict, threshold: float = 0.3) -> tuple[str, float]:
+    )
+
+
+def emotion_matrix(probs: np.ndarray, labels: list[str]) -> np.ndarray:
+    """Map GoEmotions probabilities (N × labels) onto the target emotions (N × 8).
+
+    Each target column is the max over the model labels mapped to it; the
+    label → target index is built once per label set. Rows that failed
+    inference stay all-NaN (NULL in the database).
+    """
+    probs = np.asarray(probs, dtype=np.float32).reshape(len(probs), -1)
+    index = _target_index(tuple(labels))
+    out = np.zeros((len(probs), len(TARGET_EMOTIONS)), dtype=np.float32)
+    for t in range(len(TARGET_EMOTIONS)):
+        cols = index == t
+        if cols.any():
+            out[:, t] = probs[:, cols].max(axis=1)
+    out[np.isnan(probs).any(axis=1)] = np.nan
+    return out
+
+
+def emotions_to_dicts(probs: np.ndarray, labels: list[str]) -> list[dict]:
+    """Per-text {emotion: score} dicts (see ``emotion_matrix``)."""
+    return [dict(zip(TARGET_EMOTIONS, row)) for row in emotion_matrix(probs, labels).tolist()]
+
+
+def score_emotions_batch(
+    texts: list[str],
+    max_tokens: int | None = None,
+    max_batch_size: int | None = None,
+    backend: str | None = None,
+) -> list[dict]:
+    probs = emotion_proba(texts, max_tokens, max_batch_size, backend)
+    return emotions_to_dicts(probs, model_labels(_get_pipeline(backend)))
+
+
+def vader_emotion_fallback(compound: float) -> dict:
+    """Coarse emotion profile from a VADER compound score (used when GoEmotions is unavailable)."""
+    return dict(zip(TARGET_EMOTIONS, vader_emotion_matrix(np.array([compound]))[0].tolist()))
+
+
+def vader_emotion_matrix(compound: np.ndarray) -> np.ndarray:
+    """``vader_emotion_fallback`` for a vector of compound scores (N × 8)."""
+    compound = np.asarray(compound, dtype=np.float32)
+    out = np.zeros((len(compound), len(TARGET_EMOTIONS)), dtype=np.float32)
+    neg, pos = compound < -0.3, compound > 0.3
+    for emo, weight in [("fear", 0.5), ("anger", 0.3), ("sadness", 0.2)]:
+        out[neg, TARGET_EMOTIONS.index(emo)] = np.abs(compound[neg]) * weight
+    for emo, weight in [("joy", 0.4), ("gratitude", 0.3), ("pride", 0.3)]:
+        out[pos, TARGET_EMOTIONS.index(emo)] = compound[pos] * weight
+    return out
+
+
+def determine_dominant(scores: dict, threshold: float = 0.3) -> tuple[str | None, float]:
     if not scores:
         return "neutral", 0.0
+    if any(np.isnan(v) for v in scores.values()):
+        return None, np.nan  # Unscored text — leave dominant emotion NULL
     top = max(scores, key=scores.get)
     return (top, scores[top]) if scores[top] >= threshold else ("neutral", scores[top])
 
 
-def run_emotion_analysis():
-    log.info("Starting GoEmotions analysis")
+def dominant_emotions(matrix: np.ndarray, threshold: float = 0.3) -> tuple[np.ndarray, np.ndarray]:
+    """``determine_dominant`` over an (N × 8) emotion matrix: (labels, confidences).
+
+    Argmax picks the first emotion on ties, like ``max`` over the dict. Rows
+    under ``threshold`` are 'neutral'; all-NaN rows get label None.
+    """
+    matrix = np.asarray(matrix, dtype=np.float32).reshape(-1, len(TARGET_EMOTIONS))
+    failed = np.isnan(matrix).any(axis=1)
+    filled = np.where(failed[:, None], 0.0, matrix)
+    top = filled.argmax(axis=1)
+    confidence = filled[np.arange(len(filled)), top].astype(np.float32)
+    labels = np.where(confidence >= threshold, np.array(TARGET_EMOTIONS)[top], "neutral")
+    labels = labels.astype(object)
+    labels[failed] = None
+    confidence[failed] = np.nan
+    return labels, confidence
+
+
+def emotion_frame(matrix: np.ndarray) -> dict:
+    """posts_emotions emotion columns from an (N × 8) emotion matrix."""
+    dominant, confidence = dominant_emotions(matrix)
+    columns = {f"emo_{e}": matrix[:, i] for i, e in enumerate(TARGET_EMOTIONS)}
+    columns.update(dominant_emotion=dominant, emotion_confidence=confidence)
+    return columns
+
+
+def run_emotion_analysis(
+    backend: str | None = None,
+    workers: int = 1,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    resume: bool = False,
+    sentences: bool | None = None,
+):
+    """GoEmotions scores for posts_clean → posts_emotions, streamed ``chunk_size`` posts at a time.
+
+    ``resume`` skips posts that already have emotion scores; ``workers`` > 1 uses a process pool;
+    ``sentences`` scores each unique sentence once and pools back to posts.
+    """
+    log.info(f"Starting GoEmotions analysis ({get_backend(backend)} backend)")
     init_database()
     conn = get_connection()
-    df = conn.execute(
-        "SELECT id, text_clean FROM posts_clean WHERE is_duplicate=false AND quality_flag='ok'"
-    ).fetchdf()
 
-    if df.empty:
+    skip_done = EMOTION_DONE if resume else None
+    total = count_clean_posts(conn, skip_done)
+    if total == 0:
         log.warning("No posts to analyze")
         conn.close()
         return
+    log.info(f"Scoring {total} posts in chunks of {chunk_size}")
 
-    log.info(f"Scoring {len(df)} posts")
     try:
-        emo_scores = score_emotions_batch(df["text_clean"].tolist())
+        pipe = _get_pipeline(backend)
+        cache = ScoreCache(
+            conn,
+            cache_model_name(GOEMOTIONS_MODEL, get_backend(backend)),
+            pipeline_revision(pipe),
+        )
+        cache.prune_stale()
+        if sentence_mode(sentences):
+            cache = SentenceCache(cache, pooling_rule("goemotions"))
+        labels = model_labels(pipe)
     except Exception as e:
         log.error(f"GoEmotions failed: {e}. Using VADER fallback.")
-        from src.analysis.sentiment import score_vader
-
-        emo_scores = []
-        for t in df["text_clean"]:
-            v = score_vader(t)["compound"]
-            s = {e: 0.0 for e in TARGET_EMOTIONS}
-            if v < -0.3:
-                s["fear"], s["anger"], s["sadness"] = abs(v) * 0.5, abs(v) * 0.3, abs(v) * 0.2
-            elif v > 0.3:
-                s["joy"], s["gratitude"], s["pride"] = v * 0.4, v * 0.3, v * 0.3
-            emo_scores.append(s)
-
-    for emo in TARGET_EMOTIONS:
-        df[f"emo_{emo}"] = [s.get(emo, 0.0) for s in emo_scores]
-
-    dominant = [determine_dominant(s) for s in emo_scores]
-    df["dominant_emotion"] = [d[0] for d in dominant]
-    df["emotion_confidence"] = [d[1] for d in dominant]
-
-    existing = (
-        set(conn.execute("SELECT id FROM posts_emotions").fetchdf()["id"])
-        if conn.execute("SELECT COUNT(*) FROM posts_emotions").fetchone()[0] > 0
-        else set()
-    )
+        cache = None
 
-    for _, r in df.iterrows():
-        vals = [r[f"emo_{e}"] for e in TARGET_EMOTIONS] + [
-            r["dominant_emotion"],
-            r["emotion_confidence"],
-        ]
-        if r["id"] in existing:
-            conn.execute(
-                f"UPDATE posts_emotions SET {', '.join(f'emo_{e}=?' for e in TARGET_EMOTIONS)}, "
-                "dominant_emotion=?, emotion_confidence=? WHERE id=?",
-                vals + [r["id"]],
-            )
-        else:
-            conn.execute(
-                f"INSERT INTO posts_emotions (id, {', '.join(f'emo_{e}' for e in TARGET_EMOTIONS)}, "
-                "dominant_emotion, emotion_confidence) VALUES (?"
-                + ", ?" * (len(TARGET_EMOTIONS) + 2)
-                + ")",
-                [r["id"]] + vals,
+    dominant_counts = Counter()
+    scored = 0
+    out = PROJECT_ROOT / "data" / "processed" / "emotion_scores.parquet"
+    with ExitStack() as stack:
+        writer = stack.enter_context(
+            ParquetAppender(out, score_schema(EMOTION_COLUMNS, ["dominant_emotion"]))
+        )
+        if resume:
+            for done in scored_post_batches(conn, EMOTION_COLUMNS, EMOTION_DONE, chunk_size):
+                writer.write(done)
+
+        score_fn = partial(emotion_proba, backend=backend)
+        if workers > 1 and cache is not None:
+            pool = stack.enter_context(InferencePool("goemotions", backend, workers))
+            score_fn = partial(pool.score, conn)
+
+        for df in clean_post_batches(conn, chunk_size, skip_done):
+            texts = df["text_clean"].tolist()
+            matrix = None
+            tier = model_tier(get_backend(backend))
+            if cache is not None:
+                try:
+                    probs = cache.get_or_score(text_hashes(df), texts, score_fn)
+                    matrix = emotion_matrix(probs, labels)
+                except Exception as e:
+                    log.error(f"GoEmotions failed on this chunk: {e}. Using VADER fallback.")
+            if matrix is None:
+                from src.analysis.sentiment import score_vader_matrix
+
+                matrix = vader_emotion_matrix(score_vader_matrix(texts)[:, 0])
+                tier = "vader"
+
+            df = df.assign(**emotion_frame(matrix), score_tier=tier)
+
+            bulk_upsert(
+                conn, "posts_emotions", df, key="id", columns=EMOTION_COLUMNS + ["score_tier"]
             )
+            writer.write(df)
+
+            dominant_counts.update(df["dominant_emotion"].dropna())
+            scored += len(df)
+            log.info(f"   {scored}/{total} posts scored")
 
-    out = PROJECT_ROOT / "data" / "processed"
-    out.mkdir(parents=True, exist_ok=True)
-    df.to_parquet(out / "emotion_scores.parquet", index=False)
-    log.info(f"Emotion analysis complete: {df['dominant_emotion'].value_counts().to_dict()}")
+    if cache is not None:
+        log.info(f"Score cache — {cache.report()}")
+    log.info(f"Emotion analysis complete: {dict(dominant_counts.most_common())}")
     conn.close()
 
 
 if __name__ == "__main__":
-    run_emotion_analysis()
+    parser = argparse.ArgumentParser(description="GoEmotions emotion scoring")
+    parser.add_argument("--backend", choices=BACKENDS, help="Inference backend (default: torch)")
+    parser.add_argument("--workers", type=int, default=1, help="GoEmotions worker processes")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--resume", action="store_true", help="Skip posts already scored")
+    parser.add_argument(
+        "--sentences", action="store_true", help="Score unique sentences, pool per post"
+    )
+    args = parser.parse_args()
+
+    run_emotion_analysis(
+        backend=args.backend,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        resume=args.resume,
+        sentences=args.sentences or None,
+    )
@@ -1,12 +1,67 @@
-"""Neighborhood geo-tagging. Already handled in cleaning.py — this is for standalone runs."""
+"""Neighborhood geo-tagging — one compiled, word-bounded gazetteer match over the whole column.
+
+Every NEIGHBORHOOD_LEXICON term goes into a single regex run over lowercased
+text (longest terms first, so "South Shore Drive" wins over "South Shore"), bounded
+by word edges so "75th" does not fire inside "175th". Tags for all posts are
+written back with one set-based UPDATE.
+"""
+
+import re
+from functools import reduce
+from operator import or_
+
+import numpy as np
+import pandas as pd
 
 from src.utils.constants import NEIGHBORHOOD_LEXICON
-from src.utils.db import get_connection
+from src.utils.db import bulk_update, get_connection
 from src.utils.logger import log
 
+_HOODS = list(NEIGHBORHOOD_LEXICON)
+
+
+def _gazetteer() -> tuple[re.Pattern, dict[str, int]]:
+    """Compiled matcher over lowercased text, plus term → bitmask of the neighborhoods it names.
+
+    The regex reports only the longest term at a position, so a term's mask
+    also covers the neighborhoods of the terms inside it.
+    """
+    masks: dict[str, int] = {}
+    for bit, terms in enumerate(NEIGHBORHOOD_LEXICON.values()):
+        for term in terms:
+            masks[term.lower()] = masks.get(term.lower(), 0) | 1 << bit
+    bounded = {t: re.compile(rf"\b{re.escape(t)}\b") for t in masks}
+    term_masks = {
+        term: reduce(or_, (masks[t] for t in masks if bounded[t].search(term)), 0) for term in masks
+    }
+    alternation = "|".join(re.escape(t) for t in sorted(masks, key=len, reverse=True))
+    return re.compile(rf"\b(?:{alternation})\b"), term_masks
+
+
+_PATTERN, _TERM_MASKS = _gazetteer()
+
+
+def _decode(mask: int) -> list[str]:
+    return [hood for bit, hood in enumerate(_HOODS) if mask >> bit & 1]
+
+
+def detect_neighborhoods(text: str) -> list[str]:
+    """Neighborhoods mentioned in ``text``, in lexicon order."""
+    return tag_neighborhoods(pd.Series([text])).iloc[0]
+
+
+def tag_neighborhoods(texts: pd.Series) -> pd.Series:
+    """Neighborhood lists for a whole column (aligned with ``texts``; [] where none)."""
+    lowered = texts.reset_index(drop=True).fillna("").astype(str).str.lower()
+    hits = lowered.str.findall(_PATTERN).explode().dropna()
+    masks = np.zeros(len(texts), dtype=np.int64)
+    np.bitwise_or.at(masks, hits.index.to_numpy(), hits.map(_TERM_MASKS).to_numpy(np.int64))
+    decoded = {m: _decode(m) for m in np.unique(masks).tolist()}
+    return pd.Series([list(decoded[m]) for m in masks.tolist()], index=texts.index, dtype=object)
+
 
 def run_geo_tagging():
-    """Re-run geo tagging on posts_clean (updates neighborhoods column)."""
+    """Re-run geo tagging on posts_clean (updates neighborhoods and has_geo)."""
     log.info("Running geo-tagging pass")
     conn = get_connection()
     df = conn.execute("SELECT id, text_clean FROM posts_clean WHERE quality_flag='ok'").fetchdf()
@@ -14,17 +69,10 @@ def run_geo_tagging():
         conn.close()
         return
 
-    for _, row in df.iterrows():
-        text_lower = (row["text_clean"] or "").lower()
-        detected = []
-        for neighborhood, terms in NEIGHBORHOOD_LEXICON.items():
-            if any(t.lower() in text_lower for t in terms):
-                detected.append(neighborhood)
-        if detected:
-            conn.execute(
-                "UPDATE posts_clean SET neighborhoods=?, has_geo=true WHERE id=?",
-                [list(set(detected)), row["id"]],
-            )
+    df["neighborhoods"] = tag_neighborhoods(df["text_clean"])
+    df["has_geo"] = df["neighborhoods"].str.len() > 0
+    # Every eligible row is rewritten, so tags from an older lexicon are cleared too
+    bulk_update(conn, "posts_clean", df[["id", "neighborhoods", "has_geo"]], key="id")
 
     count = conn.execute("SELECT COUNT(*) FROM posts_clean WHERE has_geo=true").fetchone()[0]
     log.info(f"Geo-tagged {count} posts with neighborhood mentions")
@@ -0,0 +1,365 @@
+"""
+Batched transformer inference — length-bucketed, token-budgeted batching.
+
+Texts are tokenized once, sorted by token length and grouped so that every
+batch stays under a padded-token budget. A batch of one-liners no longer pads
+to the length of the one 500-token comment that happened to sit next to them
+in corpus order. Scores are scattered back to the original order.
+
+Unless a fixed budget is passed, the budget is tuned per model and host by
+``BatchTuner``: it grows while throughput holds and resident memory stays
+under the limit, halves on out-of-memory errors, and is saved to
+data/processed/batch_tuning.json so the next run starts where this one ended.
+Failed batches are split and retried; only a text that fails on its own is
+left unscored.
+
+Texts past the 512-token context are truncated by default. With
+``inference.sliding_window`` enabled in config/settings.yaml they are scored
+whole instead: the tokenizer's overflow support cuts them into overlapping
+windows, windows from different posts are packed into the same batches, and
+window scores are pooled back into one row per post.
+"""
+
+import json
+import os
+import socket
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+from src.utils.constants import PROJECT_ROOT
+from src.utils.logger import log
+from src.utils.settings import get_setting
+
+MAX_LENGTH = 512  # Model context window (tokens)
+DEFAULT_MAX_TOKENS = 8192  # Padded tokens per batch (batch size × longest sequence)
+DEFAULT_MAX_BATCH_SIZE = 128  # Upper bound on items per batch, even for one-liners
+MIN_TOKENS = 256  # Floor for the tuned budget
+TOKEN_LIMIT = 131072  # Ceiling for the tuned budget
+MEMORY_LIMIT_FRACTION = 0.8  # Shrink batches once RSS passes this share of physical RAM
+GROW, SHRINK = 1.25, 0.75  # Budget multipliers per observed batch
+DEFAULT_STRIDE = 128  # Tokens shared by consecutive sliding windows
+POOLING = ("mean", "weighted", "max")  # How per-sentence / per-window scores combine per post
+TUNING_PATH = PROJECT_ROOT / "data" / "processed" / "batch_tuning.json"
+
+_OOM_MARKERS = ("out of memory", "failed to allocate", "bad_alloc", "cannot allocate memory")
+
+
+def plan_batches(
+    lengths: np.ndarray,
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+    max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+) -> list[np.ndarray]:
+    """Group item indices into batches whose padded size stays under ``max_tokens``.
+
+    Items are visited longest first, so the first item of each batch sets its
+    padded width. A single item longer than the budget still gets its own batch.
+    """
+    lengths = np.asarray(lengths)
+    order = np.argsort(-lengths, kind="stable")
+    batches = []
+    start = 0
+    while start < len(order):
+        width = max(int(lengths[order[start]]), 1)
+        size = min(max(max_tokens // width, 1), max_batch_size)
+        batches.append(order[start : start + size])
+        start += size
+    return batches
+
+
+def rss_mb() -> float:
+    """Resident memory of this process in MiB (0.0 if it cannot be read)."""
+    try:
+        import psutil
+
+        return psutil.Process().memory_info().rss / 2**20
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, AttributeError):
+        return 0.0
+
+
+def total_memory_mb() -> float:
+    """Physical memory in MiB (inf if it cannot be read, which disables the RSS guard)."""
+    try:
+        import psutil
+
+        return psutil.virtual_memory().total / 2**20
+    except ImportError:
+        pass
+    try:
+        return os.sysconf("SC_PHYS_PAGES") * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, AttributeError):
+        return float("inf")
+
+
+def is_oom(error: BaseException) -> bool:
+    """True for allocation failures from Python, PyTorch (CPU/CUDA) or ONNX Runtime."""
+    return isinstance(error, MemoryError) or any(m in str(error).lower() for m in _OOM_MARKERS)
+
+
+def tuner_key(pipe) -> str:
+    """Identifies a model variant on a device, e.g. ``cardiffnlp/...:torch@cpu``."""
+    model = pipe.model
+    variant = getattr(model, "name", "torch")
+    return f"{model.config.name_or_path}:{variant}@{pipe.device}"
+
+
+class BatchTuner:
+    """Padded-token budget for one model on this host, tuned from observed batches.
+
+    After each batch the budget grows by ``GROW`` while tokens/sec holds within
+    5% of the best seen and RSS stays under the memory limit; it shrinks by
+    ``SHRINK`` when RSS passes the limit and falls back to the best budget when
+    throughput drops. An out-of-memory error halves the budget and caps future
+    growth below the size that failed.
+    """
+
+    def __init__(
+        self,
+        key: str,
+        path: Path = TUNING_PATH,
+        max_tokens: int | None = None,
+        memory_limit_mb: float | None = None,
+    ):
+        cfg = get_setting("inference", default={}) or {}
+        self.key = key
+        self.path = Path(path)
+        self.host = socket.gethostname()
+        self.min_tokens = int(cfg.get("min_batch_tokens", MIN_TOKENS))
+        self.ceiling = int(cfg.get("max_batch_tokens_limit", TOKEN_LIMIT))
+        fraction = cfg.get("memory_limit_fraction", MEMORY_LIMIT_FRACTION)
+        if memory_limit_mb is None:
+            memory_limit_mb = fraction * total_memory_mb()
+        self.memory_limit_mb = memory_limit_mb
+
+        saved = self._load().get(self.host, {}).get(key, {})
+        self.ceiling = int(saved.get("ceiling", self.ceiling))
+        start = max_tokens or saved.get("max_tokens") or cfg.get("max_batch_tokens")
+        self.max_tokens = self._clamp(start or DEFAULT_MAX_TOKENS)
+        self.best_rate = 0.0
+        self.best_tokens = self.max_tokens
+        self.ooms = 0
+
+    def _clamp(self, tokens: float) -> int:
+        return int(min(max(tokens, self.min_tokens), self.ceiling))
+
+    def _load(self) -> dict:
+        if not self.path.exists():
+            return {}
+        try:
+            return json.loads(self.path.read_text())
+        except (OSError, ValueError) as e:
+            log.warning(f"Ignoring unreadable batch tuning file {self.path}: {e}")
+            return {}
+
+    def observe(self, padded_tokens: int, seconds: float) -> None:
+        """Adjust the budget after a batch of ``padded_tokens`` ran in ``seconds``."""
+        if rss_mb() > self.memory_limit_mb:
+            self.max_tokens = self._clamp(self.max_tokens * SHRINK)
+            return
+        # Batches capped by item count or the tail of the corpus say little about the budget
+        if padded_tokens < self.max_tokens * 0.5:
+            return
+        rate = padded_tokens / max(seconds, 1e-6)
+        if rate >= self.best_rate * 0.95:
+            if rate > self.best_rate:
+                self.best_rate, self.best_tokens = rate, self.max_tokens
+            self.max_tokens = self._clamp(self.max_tokens * GROW)
+        else:
+            self.max_tokens = self.best_tokens
+
+    def on_oom(self, padded_tokens: int) -> None:
+        """Halve the budget and never grow back to the size that failed."""
+        self.ooms += 1
+        self.ceiling = max(self.min_tokens, int(padded_tokens * SHRINK))
+        self.max_tokens = self._clamp(min(self.max_tokens, padded_tokens) // 2)
+        self.best_tokens = min(self.best_tokens, self.max_tokens)
+
+    def save(self) -> None:
+        """Persist the budget for this host and model.
+
+        Pool workers save too, so the file is re-read just before writing and
+        replaced atomically: readers never see a half-written file, and a
+        concurrent save can at worst overwrite this key with its own estimate.
+        """
+        data = self._load()
+        data.setdefault(self.host, {})[self.key] = {
+            "max_tokens": self.best_tokens if self.best_rate else self.max_tokens,
+            "ceiling": self.ceiling,
+            "tokens_per_sec": round(self.best_rate),
+            "updated": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        }
+        tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp.write_text(json.dumps(data, indent=2, sort_keys=True))
+            os.replace(tmp, self.path)
+        except OSError as e:
+            tmp.unlink(missing_ok=True)
+            log.warning(f"Could not save batch tuning to {self.path}: {e}")
+
+
+def pool(scores: np.ndarray, counts: np.ndarray, weights: np.ndarray, rule: str) -> np.ndarray:
+    """Pool consecutive rows (``counts`` per post) into one row per post.
+
+    Used for sentence scores and sliding-window chunks. ``rule`` is one of
+    ``POOLING``: mean, weighted (by ``weights``), or max per column. A NaN
+    row (failed inference) makes its post's row NaN.
+    """
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    if rule == "max":
+        return np.maximum.reduceat(scores, starts, axis=0)
+    if rule == "weighted":
+        w = weights[:, None]
+        return np.add.reduceat(scores * w, starts, axis=0) / np.add.reduceat(w, starts, axis=0)
+    return np.add.reduceat(scores, starts, axis=0) / counts[:, None]
+
+
+def sliding_window() -> dict:
+    """``predict_proba`` window arguments from settings ``inference.sliding_window`` ({} = off)."""
+    window = get_setting("inference", "sliding_window", default={}) or {}
+    if not window.get("enabled"):
+        return {}
+    stride = int(window.get("stride", DEFAULT_STRIDE))
+    if not 0 <= stride < MAX_LENGTH // 2:
+        raise ValueError(f"Sliding window stride must be in [0, {MAX_LENGTH // 2}), got {stride}")
+    pooling = window.get("pooling", "weighted")
+    if pooling not in POOLING:
+        raise ValueError(f"Unknown pooling rule '{pooling}' (expected one of {POOLING})")
+    return {"stride": stride, "pooling": pooling}
+
+
+def activation_for(config) -> str:
+    """Score function the transformers text-classification pipeline would apply."""
+    if config.problem_type == "multi_label_classification" or config.num_labels == 1:
+        return "sigmoid"
+    if config.problem_type == "single_label_classification" or config.num_labels > 1:
+        return "softmax"
+    return getattr(config, "function_to_apply", "none")
+
+
+def _activate(logits: np.ndarray, function: str) -> np.ndarray:
+    if function == "sigmoid":
+        return 1.0 / (1.0 + np.exp(-logits))
+    if function == "softmax":
+        shifted = np.exp(logits - logits.max(axis=-1, keepdims=True))
+        return shifted / shifted.sum(axis=-1, keepdims=True)
+    return logits
+
+
+def model_labels(pipe) -> list[str]:
+    """Lower-cased label names in logit column order."""
+    id2label = pipe.model.config.id2label
+    return [str(id2label[i]).lower() for i in range(len(id2label))]
+
+
+def predict_proba(
+    pipe,
+    texts: list[str],
+    max_tokens: int | None = None,
+    max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+    tuner: BatchTuner | None = None,
+    stride: int | None = None,
+    pooling: str = "weighted",
+) -> np.ndarray:
+    """Class probabilities (N × num_labels) for ``texts``, in input order.
+
+    ``pipe`` is a loaded transformers pipeline; only its tokenizer and model are
+    used. Columns follow ``model_labels(pipe)``. With ``max_tokens`` unset the
+    padded-token budget is tuned as batches run (see ``BatchTuner``). A batch
+    that raises is split in half and retried; a single text that still fails is
+    left as NaN and logged, so callers can substitute fallbacks explicitly.
+
+    Texts longer than the context window are truncated unless ``stride`` is set:
+    then they are cut into ``MAX_LENGTH``-token windows overlapping by ``stride``
+    tokens, windows from all texts share the length-bucketed batches, and each
+    text's window scores are combined with ``pool`` (``pooling`` rule, weighted
+    by window length).
+    """
+    import torch
+
+    tokenizer, model = pipe.tokenizer, pipe.model
+    function = activation_for(model.config)
+    n_labels = model.config.num_labels
+    if not texts:
+        return np.full((0, n_labels), np.nan, dtype=np.float32)
+    if max_tokens is None and tuner is None:
+        tuner = BatchTuner(tuner_key(pipe))
+    if stride is not None and not getattr(tokenizer, "is_fast", False):
+        log.warning("Sliding windows need a fast tokenizer; truncating long texts instead")
+        stride = None
+
+    # Tokenize once, without padding — padding happens per batch
+    if stride is None:
+        encoded = tokenizer(list(texts), truncation=True, max_length=MAX_LENGTH)
+    else:
+        encoded = tokenizer(
+            list(texts),
+            truncation=True,
+            max_length=MAX_LENGTH,
+            stride=stride,
+            return_overflowing_tokens=True,
+        )
+        owners = np.asarray(encoded.pop("overflow_to_sample_mapping"))
+    keys = list(encoded.keys())
+    lengths = np.fromiter((len(ids) for ids in encoded["input_ids"]), dtype=np.int64)
+    probs = np.full((len(lengths), n_labels), np.nan, dtype=np.float32)  # One row per window
+
+    def run(batch: np.ndarray) -> int:
+        """Score one batch, splitting on failure. Returns the number of forward passes."""
+        width = max(int(lengths[batch[0]]), 1)
+        features = tokenizer.pad(
+            [{k: encoded[k][i] for k in keys} for i in batch], return_tensors="pt"
+        )
+        features = {k: v.to(pipe.device) for k, v in features.items()}
+        start = time.perf_counter()
+        try:
+            with torch.inference_mode():
+                logits = model(**features).logits
+        except Exception as e:
+            del features
+            if len(batch) == 1:
+                log.warning(f"Inference failed for one text ({width} tokens): {e}")
+                return 1
+            if is_oom(e) and tuner is not None:
+                tuner.on_oom(len(batch) * width)
+            log.warning(f"Inference batch error ({len(batch)} texts), splitting and retrying: {e}")
+            half = len(batch) // 2
+            return 1 + run(batch[:half]) + run(batch[half:])
+        probs[batch] = _activate(logits.float().cpu().numpy(), function)
+        if tuner is not None:
+            tuner.observe(len(batch) * width, time.perf_counter() - start)
+        return 1
+
+    # Longest first, as in plan_batches, but each batch is sized from the current budget
+    order = np.argsort(-lengths, kind="stable")
+    passes = padded = 0
+    start = 0
+    while start < len(order):
+        budget = tuner.max_tokens if tuner is not None else max_tokens
+        width = max(int(lengths[order[start]]), 1)
+        batch = order[start : start + min(max(budget // width, 1), max_batch_size)]
+        start += len(batch)
+        padded += len(batch) * width
+        passes += run(batch)
+
+    windows = ""
+    if stride is not None:
+        windows = f" in {len(lengths)} windows"
+        probs = pool(probs, np.bincount(owners, minlength=len(texts)), lengths, pooling)
+    failed = int(np.isnan(probs).any(axis=1).sum())
+    log.info(
+        f"{len(texts)} texts{windows} → {passes} forward passes "
+        f"({padded:,} padded tokens vs {len(lengths) * int(lengths.max()):,} unsorted worst case)"
+        + (f", {failed} unscored" if failed else "")
+    )
+    if tuner is not None:
+        log.info(f"Batch budget for {tuner.key}: {tuner.max_tokens:,} padded tokens")
+        tuner.save()
+    return probs
@@ -0,0 +1,334 @@
+"""
+Local model server — keeps VADER, RoBERTa, GoEmotions and the MiniLM embedder warm.
+
+Start it once (``make model-server``) and the scoring stages, topic modeling
+and the dashboard send batched requests to it instead of importing
+transformers and loading weights themselves. The server is opt-in: clients
+look for it at MODEL_SERVER_ADDRESS (a Unix socket path, or host:port on
+localhost) and load models in-process when nothing is listening. Set
+MODEL_SERVER=off to never use it.
+
+Requests are pickled dicts over multiprocessing.connection:
+``{"op": "ping" | "info" | "score" | "embed" | "shutdown", ...}``. Unpickling
+runs code, so every connection is authenticated: with MODEL_SERVER_AUTHKEY when
+set, otherwise with a random per-install key in data/processed/model_server.key
+(mode 0600, created on first use). A TCP address needs an explicit
+MODEL_SERVER_AUTHKEY, and the Unix socket is readable by its owner only.
+
+Usage:
+    python -m src.analysis.model_server                  # preload everything (torch)
+    python -m src.analysis.model_server --backend onnx --models roberta goemotions
+"""
+
+import argparse
+import os
+import secrets
+import socket
+import threading
+import time
+from dataclasses import dataclass, field
+from multiprocessing.connection import Client, Listener
+from types import SimpleNamespace
+
+import numpy as np
+
+from src.analysis.onnx_backend import BACKENDS, get_backend
+from src.utils.constants import PROJECT_ROOT
+from src.utils.logger import log
+
+MODELS = ("vader", "roberta", "goemotions", "embedder")
+DEFAULT_SOCKET = PROJECT_ROOT / "data" / "processed" / "model_server.sock"
+AUTHKEY_PATH = PROJECT_ROOT / "data" / "processed" / "model_server.key"
+DEFAULT_TCP = "127.0.0.1:8765"
+RETRY_SECONDS = 30  # How long a client remembers that no server was listening
+
+
+def server_address() -> tuple[str | tuple[str, int], str]:
+    """(address, family) from MODEL_SERVER_ADDRESS; a Unix socket by default where supported."""
+    raw = os.getenv("MODEL_SERVER_ADDRESS") or (
+        str(DEFAULT_SOCKET) if hasattr(socket, "AF_UNIX") else DEFAULT_TCP
+    )
+    host, sep, port = raw.rpartition(":")
+    if sep and port.isdigit() and "/" not in raw:
+        return (host or "127.0.0.1", int(port)), "AF_INET"
+    return raw, "AF_UNIX"
+
+
+def _authkey() -> bytes:
+    """MODEL_SERVER_AUTHKEY, else this install's random key (generated on first use)."""
+    if os.getenv("MODEL_SERVER_AUTHKEY"):
+        return os.environ["MODEL_SERVER_AUTHKEY"].encode()
+    if not AUTHKEY_PATH.exists():
+        AUTHKEY_PATH.parent.mkdir(parents=True, exist_ok=True)
+        tmp = AUTHKEY_PATH.with_name(f"{AUTHKEY_PATH.name}.{os.getpid()}.tmp")
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            f.write(secrets.token_hex(32))
+        try:
+            os.link(tmp, AUTHKEY_PATH)  # Atomic, and never replaces another process's key
+        except FileExistsError:
+            pass
+        finally:
+            tmp.unlink()
+    return AUTHKEY_PATH.read_text().strip().encode()
+
+
+# ── Server ───────────────────────────────────────────────────
+
+
+def _load(model: str, backend: str):
+    """Load (or fetch the already-loaded) in-process model."""
+    if model == "vader":
+        from src.analysis.sentiment import _get_vader
+
+        return _get_vader()
+    if model == "roberta":
+        from src.analysis.sentiment import _get_roberta
+
+        return _get_roberta(backend)
+    if model == "goemotions":
+        from src.analysis.emotions import _get_pipeline
+
+        return _get_pipeline(backend)
+    if model == "embedder":
+        from src.analysis.topics import _get_embedder
+
+        return _get_embedder()
+    raise ValueError(f"Unknown model '{model}'. Choose from: {', '.join(MODELS)}")
+
+
+class ModelServer:
+    """Serves requests for warm models; one thread per client connection."""
+
+    def __init__(self, backend: str | None = None):
+        os.environ["MODEL_SERVER"] = "off"  # Models load in this process, never via a client
+        self.backend = get_backend(backend)
+        self.locks = {m: threading.Lock() for m in MODELS}
+        self.requests = 0
+        self._stop = threading.Event()
+
+    def preload(self, models: list[str]) -> None:
+        for model in models:
+            start = time.perf_counter()
+            try:
+                _load(model, self.backend)
+                log.info(f"   {model} ready ({time.perf_counter() - start:.1f}s)")
+            except Exception as e:
+                log.warning(f"   {model} unavailable ({e}); requests for it will fail")
+
+    def handle(self, request: dict):
+        op = request.get("op")
+        model = request.get("model")
+        backend = get_backend(request.get("backend") or self.backend)
+        if op == "ping":
+            return {"backend": self.backend, "requests": self.requests}
+        if op == "info":
+            from src.analysis.inference import model_labels
+
+            pipe = _load(model, backend)
+            revision = getattr(pipe, "revision", None) or getattr(
+                pipe.model.config, "_commit_hash", None
+            )
+            return {
+                "labels": model_labels(pipe),
+                "revision": revision,
+                "name_or_path": pipe.model.config.name_or_path,
+            }
+        if op == "score":
+            texts = request["texts"]
+            with self.locks[model]:
+                if model == "vader":
+                    from src.analysis.sentiment import score_vader_matrix
+
+                    return score_vader_matrix(texts)
+                if model == "roberta":
+                    from src.analysis.sentiment import roberta_proba
+
+                    return roberta_proba(texts, backend=backend)
+                if model == "goemotions":
+                    from src.analysis.emotions import emotion_proba
+
+                    return emotion_proba(texts, backend=backend)
+            raise ValueError(f"'{model}' cannot score texts")
+        if op == "embed":
+            with self.locks["embedder"]:
+                embedder = _load("embedder", backend)
+                return np.asarray(embedder.encode(request["texts"]), dtype=np.float32)
+        if op == "shutdown":
+            self._stop.set()
+            return {"stopping": True}
+        raise ValueError(f"Unknown op '{op}'")
+
+    def _serve_connection(self, conn) -> None:
+        with conn:
+            while True:
+                try:
+                    request = conn.recv()
+                except (EOFError, OSError):
+                    return
+                self.requests += 1
+                try:
+                    conn.send({"ok": True, "result": self.handle(request)})
+                except Exception as e:
+                    log.warning(f"Model server request failed ({request.get('op')}): {e}")
+                    conn.send({"ok": False, "error": f"{type(e).__name__}: {e}"})
+                if self._stop.is_set():
+                    return
+
+    def serve_forever(self) -> None:
+        address, family = server_address()
+        if family == "AF_INET" and not os.getenv("MODEL_SERVER_AUTHKEY"):
+            raise RuntimeError(
+                f"Refusing to listen on {address[0]}:{address[1]} without MODEL_SERVER_AUTHKEY; "
+                "set a shared secret or use a Unix socket"
+            )
+        if family == "AF_UNIX":
+            if os.path.exists(address):
+                if ModelClient(address, family).ping():
+                    raise RuntimeError(f"A model server is already listening on {address}")
+                os.unlink(address)  # Stale socket from a server that did not exit cleanly
+            os.makedirs(os.path.dirname(address) or ".", exist_ok=True)
+        with Listener(address, family=family, authkey=_authkey()) as listener:
+            if family == "AF_UNIX":
+                os.chmod(address, 0o600)
+            log.info(f"🧠 Model server listening on {listener.address} ({self.backend} backend)")
+            threading.Thread(target=self._watch_stop, args=(address, family), daemon=True).start()
+            while not self._stop.is_set():
+                try:
+                    conn = listener.accept()
+                except OSError:
+                    if self._stop.is_set():
+                        break
+                    raise
+                except Exception as e:  # Failed handshake (wrong authkey) — keep serving
+                    log.warning(f"Rejected model server client: {e}")
+                    continue
+                threading.Thread(target=self._serve_connection, args=(conn,), daemon=True).start()
+        log.info(f"Model server stopped after {self.requests} requests")
+
+    def _watch_stop(self, address, family) -> None:
+        """Unblock accept() once a shutdown request arrives."""
+        self._stop.wait()
+        try:
+            Client(address, family=family, authkey=_authkey()).close()
+        except OSError:
+            pass
+
+
+# ── Client ───────────────────────────────────────────────────
+
+
+@dataclass
+class RemotePipeline:
+    """Stands in for a loaded pipeline: labels and revision come from the server.
+
+    ``src.analysis.inference.model_labels`` and ``score_cache.pipeline_revision``
+    work on it unchanged; ``proba`` replaces ``predict_proba``.
+    """
+
+    client: "ModelClient"
+    model_name: str
+    backend: str
+    revision: str | None = None
+    model: SimpleNamespace = field(default_factory=SimpleNamespace)
+
+    def proba(self, texts: list[str]) -> np.ndarray:
+        return self.client.score(self.model_name, texts, self.backend)
+
+
+class ModelClient:
+    """Connection to a running model server (thread-safe; reconnects on demand)."""
+
+    def __init__(self, address=None, family: str | None = None):
+        if address is None:
+            address, family = server_address()
+        self.address, self.family = address, family
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _request(self, op: str, **kwargs):
+        with self._lock:
+            if self._conn is None:
+                self._conn = Client(self.address, family=self.family, authkey=_authkey())
+            try:
+                self._conn.send({"op": op, **kwargs})
+                response = self._conn.recv()
+            except (EOFError, OSError):
+                self._conn = None
+                raise
+        if not response["ok"]:
+            raise RuntimeError(f"Model server: {response['error']}")
+        return response["result"]
+
+    def ping(self) -> bool:
+        try:
+            self._request("ping")
+            return True
+        except Exception:
+            return False
+
+    def score(self, model: str, texts: list[str], backend: str | None = None) -> np.ndarray:
+        return self._request("score", model=model, texts=list(texts), backend=backend)
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        return self._request("embed", texts=list(texts))
+
+    def pipeline(self, model: str, backend: str | None = None) -> RemotePipeline:
+        backend = get_backend(backend)
+        info = self._request("info", model=model, backend=backend)
+        config = SimpleNamespace(
+            id2label=dict(enumerate(info["labels"])),
+            num_labels=len(info["labels"]),
+            name_or_path=info["name_or_path"],
+            _commit_hash=info["revision"],
+        )
+        return RemotePipeline(
+            self, model, backend, revision=info["revision"], model=SimpleNamespace(config=config)
+        )
+
+    def shutdown(self) -> None:
+        self._request("shutdown")
+
+
+_client: ModelClient | None = None
+_last_miss: float | None = None  # monotonic time of the last failed ping
+
+
+def get_client() -> ModelClient | None:
+    """A connected client if a model server is listening (and MODEL_SERVER isn't 'off')."""
+    global _client, _last_miss
+    if os.getenv("MODEL_SERVER", "auto").lower() == "off":
+        return None
+    if _client is not None:
+        return _client
+    if _last_miss is not None and time.monotonic() - _last_miss < RETRY_SECONDS:
+        return None
+    client = ModelClient()
+    if client.ping():
+        log.info(f"Using model server at {client.address}")
+        _client = client
+        return client
+    _last_miss = time.monotonic()
+    return None
+
+
+def is_available() -> bool:
+    return get_client() is not None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Keep scoring models warm for other processes")
+    parser.add_argument("--backend", choices=BACKENDS, help="Inference backend (default: torch)")
+    parser.add_argument(
+        "--models", nargs="+", choices=MODELS, default=list(MODELS), help="Models to preload"
+    )
+    parser.add_argument("--stop", action="store_true", help="Stop a running server")
+    args = parser.parse_args()
+
+    if args.stop:
+        ModelClient().shutdown()
+    else:
+        server = ModelServer(args.backend)
+        log.info(f"Preloading {', '.join(args.models)}...")
+        server.preload(args.models)
+        server.serve_forever()
@@ -0,0 +1,250 @@
+"""
+ONNX Runtime inference backend for the sentiment and emotion models.
+
+Exports a Hugging Face sequence classifier to ONNX once, optionally applies
+dynamic int8 weight quantization, and caches the result under
+data/processed/onnx/. The loaded model is a drop-in for the PyTorch pipeline
+inside ``src.analysis.inference.predict_proba``.
+
+Backends: 'torch' (default), 'onnx', 'onnx-int8', and 'distilled' (the
+student model from ``src.analysis.distilled``). Select with the
+INFERENCE_BACKEND environment variable or the ``--backend`` CLI flag.
+"""
+
+import argparse
+import json
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+
+from src.analysis.inference import model_labels, predict_proba
+from src.utils.constants import PROJECT_ROOT
+from src.utils.logger import log
+
+ONNX_DIR = PROJECT_ROOT / "data" / "processed" / "onnx"
+BACKENDS = ("torch", "onnx", "onnx-int8", "distilled")
+OPSET_VERSION = 17
+EXPORT_VERSION = 2  # Bump to invalidate cached exports (and the scores cached from them)
+
+
+def get_backend(backend: str | None = None) -> str:
+    """Resolve the inference backend (argument → INFERENCE_BACKEND env → 'torch')."""
+    backend = (backend or os.environ.get("INFERENCE_BACKEND") or "torch").lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend: {backend} (expected one of {BACKENDS})")
+    return backend
+
+
+def _model_dir(model_name: str) -> Path:
+    return ONNX_DIR / model_name.replace("/", "__")
+
+
+def export_model(model, dummy: dict, path: Path) -> list[str]:
+    """Trace ``model`` on the ``dummy`` features into an ONNX file; return its input names.
+
+    The features go in as a positional tuple in ``forward``'s parameter order.
+    A dict argument is not bound to the named inputs by the TorchScript
+    exporter, which would freeze the dummy batch into the graph as constants.
+    """
+    import inspect
+
+    import torch
+
+    params = inspect.signature(model.forward).parameters
+    input_names = [name for name in params if name in dummy]
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(dummy[name] for name in input_names),
+            str(path),
+            input_names=input_names,
+            output_names=["logits"],
+            dynamic_axes={
+                **{name: {0: "batch", 1: "sequence"} for name in input_names},
+                "logits": {0: "batch"},
+            },
+            opset_version=OPSET_VERSION,
+            dynamo=False,
+        )
+    return input_names
+
+
+def export_onnx(model_name: str, quantize: bool = False, force: bool = False) -> Path:
+    """Export ``model_name`` to ONNX (and int8 if ``quantize``); return the .onnx path.
+
+    The tokenizer, config and upstream revision are saved alongside, so cached
+    exports load offline and score caches can tell exports apart.
+    """
+    out_dir = _model_dir(model_name)
+    fp32_path = out_dir / "model.onnx"
+    int8_path = out_dir / "model.int8.onnx"
+    target = int8_path if quantize else fp32_path
+    info_path = out_dir / "export_info.json"
+    info = json.loads(info_path.read_text()) if info_path.exists() else {}
+    if info.get("export_version") != EXPORT_VERSION:
+        force = True  # Made by an older exporter
+    if target.exists() and not force:
+        return target
+
+    if force or not fp32_path.exists():
+        from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+        log.info(f"Exporting {model_name} to ONNX")
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model = AutoModelForSequenceClassification.from_pretrained(model_name).eval()
+        dummy = tokenizer(
+            ["export sample", "a second export sample"], return_tensors="pt", padding=True
+        )
+        out_dir.mkdir(parents=True, exist_ok=True)
+        export_model(model, dict(dummy), fp32_path)
+        tokenizer.save_pretrained(out_dir)
+        model.config.save_pretrained(out_dir)
+        info = {
+            "model_name": model_name,
+            "revision": getattr(model.config, "_commit_hash", None),
+            "export_version": EXPORT_VERSION,
+        }
+        info_path.write_text(json.dumps(info, indent=2))
+        log.info(f"ONNX export saved to {fp32_path}")
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantize_dynamic(str(fp32_path), str(int8_path), weight_type=QuantType.QInt8)
+        log.info(f"int8 quantized model saved to {int8_path}")
+    return target
+
+
+class OnnxSequenceClassifier:
+    """ONNX Runtime session with the ``model(**features).logits`` call shape of a HF model."""
+
+    def __init__(self, path: Path, config):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        # Pool workers pin OMP_NUM_THREADS; 0 lets ONNX Runtime use every core
+        options.intra_op_num_threads = int(os.environ.get("OMP_NUM_THREADS") or 0)
+        self.session = ort.InferenceSession(str(path), options, providers=["CPUExecutionProvider"])
+        self.input_names = [i.name for i in self.session.get_inputs()]
+        self.config = config
+        self.name = path.name  # model.onnx or model.int8.onnx — keys the batch tuner
+
+    def __call__(self, **features):
+        import torch
+
+        feed = {name: features[name].cpu().numpy() for name in self.input_names}
+        logits = self.session.run(["logits"], feed)[0]
+        return SimpleNamespace(logits=torch.from_numpy(logits))
+
+
+@dataclass
+class OnnxPipeline:
+    """The parts of a transformers pipeline that ``predict_proba`` uses."""
+
+    tokenizer: object
+    model: OnnxSequenceClassifier
+    revision: str | None = None  # Upstream commit + exporter version the export was made with
+    device: str = "cpu"
+
+
+def load_onnx_pipeline(model_name: str, quantize: bool = False) -> OnnxPipeline:
+    """Load (exporting on first use) an ONNX Runtime pipeline for ``model_name``."""
+    from transformers import AutoConfig, AutoTokenizer
+
+    path = export_onnx(model_name, quantize=quantize)
+    tokenizer = AutoTokenizer.from_pretrained(path.parent)
+    config = AutoConfig.from_pretrained(path.parent)
+    info_path = path.parent / "export_info.json"
+    info = json.loads(info_path.read_text()) if info_path.exists() else {}
+    log.info(f"ONNX Runtime model loaded: {path.name} ({model_name})")
+    return OnnxPipeline(
+        tokenizer=tokenizer,
+        model=OnnxSequenceClassifier(path, config),
+        revision=f"{info.get('revision') or 'unversioned'}+export{info.get('export_version')}",
+    )
+
+
+def check_agreement(torch_pipe, onnx_pipe, texts: list[str]) -> dict:
+    """Compare ONNX scores against the PyTorch reference on ``texts``."""
+    import time
+
+    if not texts:
+        raise ValueError("Agreement check needs at least one text")
+
+    start = time.perf_counter()
+    ref = predict_proba(torch_pipe, texts)
+    torch_s = time.perf_counter() - start
+    start = time.perf_counter()
+    got = predict_proba(onnx_pipe, texts)
+    onnx_s = time.perf_counter() - start
+
+    diff = np.abs(ref - got)
+    report = {
+        "n_texts": len(texts),
+        "labels": model_labels(torch_pipe),
+        "max_abs_diff": float(diff.max()),
+        "mean_abs_diff": float(diff.mean()),
+        "top_label_agreement": float((ref.argmax(1) == got.argmax(1)).mean()),
+        "torch_seconds": torch_s,
+        "onnx_seconds": onnx_s,
+        "speedup": torch_s / onnx_s if onnx_s > 0 else float("nan"),
+    }
+    log.info(
+        f"Agreement on {report['n_texts']} texts: top-label {report['top_label_agreement']:.1%}, "
+        f"max |Δ| {report['max_abs_diff']:.4f}, mean |Δ| {report['mean_abs_diff']:.5f}, "
+        f"speedup {report['speedup']:.2f}×"
+    )
+    return report
+
+
+def run_agreement_check(backend: str = "onnx-int8", sample_size: int = 500) -> dict:
+    """Export both models for ``backend`` and check them against PyTorch on clean posts.
+
+    Both sides are loaded in this process: a model server's pipelines only score
+    through the server, so they never reach ``predict_proba`` here.
+    """
+    from src.analysis.emotions import _emotion_pipelines, _get_pipeline
+    from src.analysis.model_server import RemotePipeline
+    from src.analysis.sentiment import _get_roberta, _roberta_pipelines
+    from src.utils.db import get_connection
+
+    conn = get_connection()
+    texts = (
+        conn.execute(
+            "SELECT text_clean FROM posts_clean WHERE is_duplicate=false AND quality_flag='ok' "
+            f"USING SAMPLE {int(sample_size)} ROWS"
+        )
+        .fetchdf()["text_clean"]
+        .tolist()
+    )
+    conn.close()
+
+    for cache in (_roberta_pipelines, _emotion_pipelines):
+        for key in [k for k, pipe in cache.items() if isinstance(pipe, RemotePipeline)]:
+            del cache[key]
+    saved = os.environ.get("MODEL_SERVER")
+    os.environ["MODEL_SERVER"] = "off"
+    try:
+        reports = {}
+        for name, loader in [("roberta", _get_roberta), ("goemotions", _get_pipeline)]:
+            log.info(f"Checking {name}: torch vs {backend}")
+            reports[name] = check_agreement(loader("torch"), loader(backend), texts)
+    finally:
+        if saved is None:
+            os.environ.pop("MODEL_SERVER", None)
+        else:
+            os.environ["MODEL_SERVER"] = saved
+    return reports
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export models to ONNX and check agreement")
+    parser.add_argument("--backend", choices=["onnx", "onnx-int8"], default="onnx-int8")
+    parser.add_argument("--sample-size", type=int, default=500, help="Posts used for the check")
+    args = parser.parse_args()
+
+    run_agreement_check(backend=args.backend, sample_size=args.sample_size)
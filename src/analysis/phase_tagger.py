@@ -1,36 +1,88 @@
-"""Phase tagging — assigns temporal phases. Already done in cleaning; standalone re-run."""
+"""Phase tagging — assigns temporal phases. Already done in cleaning; standalone re-run.
+
+The phase calendar (settings.yaml ``phases``, falling back to constants.PHASES)
+is materialized as the ``phases`` dimension table, and every post is tagged
+by one range-join UPDATE inside DuckDB. Where two phases share a boundary
+day, the earlier phase wins, as in ``cleaning.detect_phase``. Posts dated
+outside every phase get 'out_of_window'; posts without a date get 'unknown'.
+"""
 
 import pandas as pd
 
 from src.utils.constants import PHASES
-from src.utils.db import get_connection
+from src.utils.db import bulk_insert, get_connection, init_database
 from src.utils.logger import log
+from src.utils.settings import get_setting
+
+OUT_OF_WINDOW = "out_of_window"
+UNDATED = "unknown"
+
+
+def phase_calendar() -> dict:
+    """Phase definitions: settings.yaml ``phases`` when present, else constants.PHASES."""
+    phases = get_setting("phases", default=None) or PHASES
+    if phases != PHASES:
+        log.info("Phase calendar from config/settings.yaml differs from constants.PHASES")
+    return phases
+
+
+def materialize_phases(conn, calendar: dict | None = None) -> int:
+    """Replace the ``phases`` dimension table with the current phase calendar."""
+    calendar = calendar or phase_calendar()
+    table = pd.DataFrame(
+        [
+            {
+                "phase": name,
+                "label": info.get("label", name),
+                "start_date": pd.Timestamp(info["start"]).date(),
+                "end_date": pd.Timestamp(info["end"]).date(),
+                "phase_order": order,
+            }
+            for order, (name, info) in enumerate(calendar.items())
+        ]
+    )
+    conn.execute("DELETE FROM phases")
+    return bulk_insert(conn, "phases", table)
+
+
+def tag_phases(conn) -> dict[str, int]:
+    """Tag every posts_clean row from the ``phases`` table in one UPDATE; returns phase counts."""
+    conn.execute(
+        f"""
+        UPDATE posts_clean SET phase = t.phase
+        FROM (
+            SELECT c.id,
+                   CASE WHEN c.dt_utc IS NULL THEN '{UNDATED}'
+                        ELSE coalesce(arg_min(p.phase, p.phase_order), '{OUT_OF_WINDOW}')
+                   END AS phase
+            FROM posts_clean c
+            LEFT JOIN phases p
+              ON CAST(timezone('UTC', c.dt_utc) AS DATE) BETWEEN p.start_date AND p.end_date
+            GROUP BY c.id, c.dt_utc
+        ) t
+        WHERE posts_clean.id = t.id
+        """
+    )
+    return dict(conn.execute("SELECT phase, COUNT(*) FROM posts_clean GROUP BY phase").fetchall())
 
 
 def run_phase_tagging():
     log.info("Running phase tagging pass")
+    init_database()
     conn = get_connection()
-    df = conn.execute("SELECT id, dt_utc FROM posts_clean").fetchdf()
-    if df.empty:
-        conn.close()
+    materialize_phases(conn)
+    dist = tag_phases(conn)
+    conn.close()
+    if not dist:
         return
 
-    for _, row in df.iterrows():
-        try:
-            dt = pd.Timestamp(row["dt_utc"])
-            date_str = dt.strftime("%Y-%m-%d")
-            phase = "out_of_window"
-            for pname, pinfo in PHASES.items():
-                if pinfo["start"] <= date_str <= pinfo["end"]:
-                    phase = pname
-                    break
-            conn.execute("UPDATE posts_clean SET phase=? WHERE id=?", [phase, row["id"]])
-        except Exception:
-            pass
-
-    dist = conn.execute("SELECT phase, COUNT(*) as n FROM posts_clean GROUP BY phase").fetchdf()
-    log.info(f"Phase distribution:\n{dist.to_string()}")
-    conn.close()
+    unmatched = dist.get(OUT_OF_WINDOW, 0) + dist.get(UNDATED, 0)
+    log.info(f"Phase distribution: {dist}")
+    if unmatched:
+        log.warning(
+            f"{unmatched} posts matched no phase "
+            f"({dist.get(OUT_OF_WINDOW, 0)} {OUT_OF_WINDOW}, {dist.get(UNDATED, 0)} undated)"
+        )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,146 @@
+"""
+Persistent model-score cache keyed by (model name, model revision, text hash).
+
+Raw model outputs (VADER's four scores, RoBERTa's and GoEmotions' per-label
+probabilities before any mapping) are stored in the ``score_cache`` table, so
+reruns only send texts the model has never seen through inference. A new
+model revision only misses (and prunes) that model's own entries.
+"""
+
+from importlib.metadata import PackageNotFoundError, version
+
+import numpy as np
+import pandas as pd
+
+from src.analysis.cleaning import compute_text_hash
+from src.analysis.inference import sliding_window
+from src.utils.db import bulk_upsert
+from src.utils.logger import log
+
+
+def text_hashes(df: pd.DataFrame) -> list[str]:
+    """posts_clean.text_hash per row, computed from text_clean where missing."""
+    if "text_hash" in df.columns:
+        hashes = df["text_hash"].astype(object)
+    else:
+        hashes = pd.Series(None, index=df.index, dtype=object)
+    missing = hashes.isna()
+    if missing.any():
+        hashes = hashes.copy()
+        hashes[missing] = df.loc[missing, "text_clean"].fillna("").map(compute_text_hash)
+    return hashes.tolist()
+
+
+def vader_revision() -> str:
+    """Cache revision for VADER: the installed vaderSentiment version."""
+    try:
+        return f"vaderSentiment-{version('vaderSentiment')}"
+    except PackageNotFoundError:
+        return "vaderSentiment-unknown"
+
+
+def cache_model_name(model_name: str, backend: str) -> str:
+    """Cache key for ``model_name``'s scores under ``backend``.
+
+    Each inference backend (and, for the transformer backends, the sliding-window
+    settings, which change long texts' scores) keeps its own entries, so a new
+    revision of one never prunes another's. The distilled student never shares
+    its teacher's.
+    """
+    if backend == "distilled":
+        return f"distilled:{model_name}"
+    window = sliding_window()
+    suffix = f"+window{window['stride']}-{window['pooling']}" if window else ""
+    return f"{model_name}+{backend}{suffix}"
+
+
+def pipeline_revision(pipe) -> str:
+    """Cache revision for a transformer pipeline: its upstream commit."""
+    revision = getattr(pipe, "revision", None) or getattr(pipe.model.config, "_commit_hash", None)
+    return revision or "unversioned"
+
+
+class ScoreCache:
+    """Score lookups and fills for one (model, revision) pair on a DuckDB connection."""
+
+    def __init__(self, conn, model_name: str, revision: str):
+        self.conn = conn
+        self.model_name = model_name
+        self.revision = revision
+        self.hits = 0
+        self.misses = 0
+
+    def prune_stale(self) -> int:
+        """Drop this model's entries from any other revision."""
+        n = self.conn.execute(
+            "SELECT COUNT(*) FROM score_cache WHERE model_name = ? AND model_revision <> ?",
+            [self.model_name, self.revision],
+        ).fetchone()[0]
+        if n:
+            self.conn.execute(
+                "DELETE FROM score_cache WHERE model_name = ? AND model_revision <> ?",
+                [self.model_name, self.revision],
+            )
+            log.info(f"Score cache: pruned {n} stale {self.model_name} entries")
+        return n
+
+    def lookup(self, hashes: list[str]) -> dict[str, np.ndarray]:
+        """Cached score vectors for the given text hashes."""
+        keys = pd.DataFrame({"text_hash": pd.unique(pd.Series(hashes, dtype=object))})
+        self.conn.register("cache_keys", keys)
+        rows = self.conn.execute(
+            """
+            SELECT c.text_hash, c.scores
+            FROM score_cache c JOIN cache_keys k ON c.text_hash = k.text_hash
+            WHERE c.model_name = ? AND c.model_revision = ?
+            """,
+            [self.model_name, self.revision],
+        ).fetchall()
+        self.conn.unregister("cache_keys")
+        return {h: np.asarray(s, dtype=np.float32) for h, s in rows}
+
+    def store(self, hashes: list[str], scores: np.ndarray) -> None:
+        """Insert score vectors; rows containing NaN (failed inference) are skipped."""
+        ok = ~np.isnan(scores).any(axis=1)
+        if not ok.any():
+            return
+        rows = pd.DataFrame(
+            {
+                "model_name": self.model_name,
+                "model_revision": self.revision,
+                "text_hash": np.asarray(hashes, dtype=object)[ok],
+                "scores": [row.tolist() for row in scores[ok]],
+            }
+        ).drop_duplicates("text_hash")
+        bulk_upsert(
+            self.conn, "score_cache", rows, key=["model_name", "model_revision", "text_hash"]
+        )
+
+    def get_or_score(self, hashes: list[str], texts: list[str], score_fn) -> np.ndarray:
+        """Score matrix for ``texts``: cache hits first, ``score_fn`` for unique misses.
+
+        ``hits`` and ``misses`` both count distinct text hashes.
+        """
+        if not hashes:
+            return np.zeros((0, 0), dtype=np.float32)
+        cached = self.lookup(hashes)
+        self.hits += len(cached)
+        miss_hashes, miss_texts = [], []
+        seen = set(cached)
+        for h, t in zip(hashes, texts):
+            if h not in seen:
+                seen.add(h)
+                miss_hashes.append(h)
+                miss_texts.append(t)
+
+        self.misses += len(miss_texts)
+        if miss_texts:
+            fresh = np.asarray(score_fn(miss_texts), dtype=np.float32)
+            self.store(miss_hashes, fresh)
+            cached.update(zip(miss_hashes, fresh))
+        return np.stack([cached[h] for h in hashes])
+
+    def report(self) -> str:
+        total = self.hits + self.misses
+        rate = self.hits / total if total else 0.0
+        return f"{self.model_name}: {self.hits} cached, {self.misses} scored ({rate:.0%} hit rate)"
@@ -0,0 +1,340 @@
+"""
+Single-pass scoring — VADER + RoBERTa + GoEmotions over one read of posts_clean.
+
+Replaces running src.analysis.sentiment and src.analysis.emotions back to back:
+the text column is streamed once, each chunk goes through all three scorers
+(VADER on a side thread while the transformers run), and every score column
+lands in posts_emotions with one set-based write per chunk.
+Texts already in the score cache for the current model revision skip inference.
+"""
+
+import argparse
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+from src.analysis.cascade import cascade_threshold, model_tier, settled_by_vader
+from src.analysis.emotions import (
+    EMOTION_COLUMNS,
+    EMOTION_DONE,
+    GOEMOTIONS_MODEL,
+    _get_pipeline,
+    emotion_frame,
+    emotion_matrix,
+    emotion_proba,
+    vader_emotion_matrix,
+)
+from src.analysis.inference import model_labels
+from src.analysis.onnx_backend import BACKENDS, get_backend
+from src.analysis.score_cache import (
+    ScoreCache,
+    cache_model_name,
+    pipeline_revision,
+    text_hashes,
+    vader_revision,
+)
+from src.analysis.sentences import SentenceCache, pooling_rule, sentence_mode
+from src.analysis.sentiment import (
+    ROBERTA_MODEL,
+    SENTIMENT_COLUMNS,
+    SENTIMENT_DONE,
+    _get_roberta,
+    _get_vader,
+    roberta_fallback,
+    roberta_matrix,
+    roberta_proba,
+    score_vader_matrix,
+    sentiment_frame,
+)
+from src.analysis.streaming import (
+    DEFAULT_CHUNK_SIZE,
+    DEFAULT_HALF_LIFE_HOURS,
+    ParquetAppender,
+    clean_post_batches,
+    count_clean_posts,
+    prefetch,
+    priority_sql,
+    score_schema,
+    scored_post_batches,
+)
+from src.analysis.worker_pool import InferencePool
+from src.utils.constants import PROJECT_ROOT
+from src.utils.db import bulk_insert, bulk_upsert, get_connection, init_database
+from src.utils.logger import log
+from src.utils.settings import get_setting
+
+SCORE_COLUMNS = SENTIMENT_COLUMNS + EMOTION_COLUMNS + ["score_tier"]
+SCORING_DONE = f"{SENTIMENT_DONE} AND {EMOTION_DONE}"  # posts_emotions rows --resume skips
+ANYTIME_CHUNK = 256  # Chunk size under a deadline: small enough to stop close to it
+
+
+def _load_models(backend: str) -> dict:
+    """Load VADER, RoBERTa and GoEmotions. Returns {model: loaded?}.
+
+    Runs on one background thread: transformers' lazy imports are not safe to
+    race from several threads, and the overlap that matters is with the read.
+    """
+    _get_vader()
+    available = {}
+    for name, loader in [("roberta", _get_roberta), ("goemotions", _get_pipeline)]:
+        try:
+            loader(backend)
+            available[name] = True
+        except Exception as e:
+            log.warning(f"{name} unavailable ({e}); using VADER-derived fallback")
+            available[name] = False
+    return available
+
+
+def _build_caches(conn, backend: str, available: dict) -> dict:
+    """One ScoreCache per loaded model, with stale revisions pruned."""
+    # VADER runs on a side thread, so its cache gets its own cursor
+    caches = {"vader": ScoreCache(conn.cursor(), "vader", vader_revision())}
+    if available["roberta"]:
+        rev = pipeline_revision(_get_roberta(backend))
+        caches["roberta"] = ScoreCache(conn, cache_model_name(ROBERTA_MODEL, backend), rev)
+    if available["goemotions"]:
+        rev = pipeline_revision(_get_pipeline(backend))
+        caches["goemotions"] = ScoreCache(conn, cache_model_name(GOEMOTIONS_MODEL, backend), rev)
+    for cache in caches.values():
+        cache.prune_stale()
+    return caches
+
+
+def score_chunk(
+    texts: list[str],
+    hashes: list[str],
+    backend: str,
+    caches: dict,
+    scorers: dict | None = None,
+    threshold: float | None = None,
+) -> pd.DataFrame:
+    """Every posts_emotions score column for one chunk of texts (cache hits skip inference).
+
+    ``scorers`` optionally maps 'roberta' / 'goemotions' to a function that scores
+    cache misses (e.g. an ``InferencePool``); the in-process model is the default.
+    With a cascade ``threshold``, posts VADER settles skip both transformers
+    (see ``src.analysis.cascade``); ``score_tier`` records which tier scored each post.
+    A model that fails on the chunk falls back to VADER like the per-model stages.
+    """
+    scorers = scorers or {}
+    roberta_fn = scorers.get("roberta", partial(roberta_proba, backend=backend))
+    emotion_fn = scorers.get("goemotions", partial(emotion_proba, backend=backend))
+    skip = np.zeros(len(texts), dtype=bool)
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        vader_future = pool.submit(caches["vader"].get_or_score, hashes, texts, score_vader_matrix)
+        if threshold is not None:
+            skip = settled_by_vader(vader_future.result(), threshold)  # The gate needs VADER first
+        run = np.flatnonzero(~skip)
+        run_texts, run_hashes = [texts[i] for i in run], [hashes[i] for i in run]
+        roberta = emotions = None
+        if "roberta" in caches and len(run):
+            try:
+                probs = caches["roberta"].get_or_score(run_hashes, run_texts, roberta_fn)
+                roberta = roberta_matrix(probs, model_labels(_get_roberta(backend)))
+            except Exception as e:
+                log.warning(f"RoBERTa failed on this chunk, using VADER only: {e}")
+        if "goemotions" in caches and len(run):
+            try:
+                probs = caches["goemotions"].get_or_score(run_hashes, run_texts, emotion_fn)
+                emotions = emotion_matrix(probs, model_labels(_get_pipeline(backend)))
+            except Exception as e:
+                log.error(f"GoEmotions failed on this chunk: {e}. Using VADER fallback.")
+        vader = vader_future.result()
+
+    # Cascade-settled posts keep NULL RoBERTa columns (VADER alone decides the label)
+    roberta_all = np.full((len(texts), 3), np.nan, dtype=np.float32)
+    roberta_all[run] = roberta if roberta is not None else roberta_fallback(len(run))
+    emotions_all = vader_emotion_matrix(vader[:, 0])
+    if emotions is not None:
+        emotions_all[run] = emotions
+
+    # One tier per post: any column group left to a VADER fallback makes it 'vader'
+    tier = model_tier(backend) if roberta is not None and emotions is not None else "vader"
+    tier = np.where(skip, "vader", tier).astype(object)
+    return pd.DataFrame(
+        {
+            **sentiment_frame(vader, roberta_all),
+            **emotion_frame(emotions_all),
+            "score_tier": tier,
+        }
+    )
+
+
+def run_scoring(
+    backend: str | None = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    workers: int = 1,
+    resume: bool = False,
+    cascade: float | None = None,
+    sentences: bool | None = None,
+    deadline: float | None = None,
+):
+    """Score every clean post with all three models and write posts_emotions in one pass.
+
+    Posts are streamed from DuckDB ``chunk_size`` at a time, the next chunk
+    read on a side thread while the current one is scored; each chunk is
+    upserted and appended to the Parquet exports as it finishes, so memory
+    stays flat and an interrupted run keeps its finished chunks.
+    ``resume`` skips posts that already have both sentiment and emotion scores.
+    With ``workers`` > 1 each transformer gets its own sharded process pool
+    (see ``src.analysis.worker_pool``), kept warm across chunks. ``cascade`` is the
+    VADER confidence above which posts skip the transformers (default: settings
+    ``cascade.threshold``; unset = every post runs every model). ``sentences``
+    scores the transformers per unique sentence and pools back to posts (default:
+    settings ``sentences.enabled``; see ``src.analysis.sentences``).
+
+    ``deadline`` (seconds) turns on anytime mode for fresh-data runs: unscored
+    posts are taken newest and most-engaged first (``priority_sql``) in small
+    chunks, each committed as it finishes, and the run stops before a chunk
+    that would overrun the deadline (at least one chunk always runs). The rest
+    are picked up by the next run, since anytime mode implies ``resume``.
+    """
+    started = time.monotonic()
+    backend = get_backend(backend)
+    threshold = cascade_threshold(cascade)
+    log.info(f"📊 Starting single-pass scoring (VADER + RoBERTa + GoEmotions, {backend} backend)")
+    if threshold is not None:
+        log.info(f"Cascade on: posts with VADER confidence ≥ {threshold:g} skip the transformers")
+
+    init_database()
+    conn = get_connection()
+
+    order_by = None
+    if deadline is not None:
+        resume = True
+        chunk_size = min(chunk_size, get_setting("anytime", "chunk_size", default=ANYTIME_CHUNK))
+        order_by = priority_sql(
+            get_setting("anytime", "half_life_hours", default=DEFAULT_HALF_LIFE_HOURS)
+        )
+        log.info(f"⏱️ Anytime mode: {deadline:g}s budget, highest-priority posts first")
+
+    # Models load on a worker thread while the posts to score are counted
+    skip_done = SCORING_DONE if resume else None
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        models_future = pool.submit(_load_models, backend)
+        total = count_clean_posts(conn, skip_done)
+        available = models_future.result()
+
+    if total == 0:
+        log.warning("No clean posts to score")
+        conn.close()
+        return
+
+    log.info(f"Scoring {total} posts in chunks of {chunk_size}")
+    caches = _build_caches(conn, backend, available)
+    if sentence_mode(sentences):
+        for model in ("roberta", "goemotions"):
+            if model in caches:
+                caches[model] = SentenceCache(caches[model], pooling_rule(model))
+        log.info("Sentence mode: transformers score each distinct sentence once")
+    out = PROJECT_ROOT / "data" / "processed"
+    label_counts, dominant_counts, tier_counts = Counter(), Counter(), Counter()
+    scored = 0
+    with ExitStack() as stack:
+        sentiment_out = stack.enter_context(
+            ParquetAppender(
+                out / "sentiment_scores.parquet",
+                score_schema(SENTIMENT_COLUMNS, ["sentiment_label"]),
+            )
+        )
+        emotion_out = stack.enter_context(
+            ParquetAppender(
+                out / "emotion_scores.parquet", score_schema(EMOTION_COLUMNS, ["dominant_emotion"])
+            )
+        )
+        scorers = {}
+        if workers > 1:
+            for model in ("roberta", "goemotions"):
+                if model in caches:
+                    pool = stack.enter_context(InferencePool(model, backend, workers))
+                    scorers[model] = partial(pool.score, conn)
+
+        if resume:
+            # A real table: the export below reads through another cursor (connection)
+            conn.execute("CREATE OR REPLACE TABLE scored_this_run (id VARCHAR)")
+
+        chunk_seconds = 0.0
+        # The next chunk is read on a side thread while this one is scored
+        for df in prefetch(clean_post_batches(conn, chunk_size, skip_done, order_by)):
+            elapsed = time.monotonic() - started
+            if deadline is not None and scored and elapsed + chunk_seconds > deadline:
+                log.info(f"⏱️ Deadline: stopping after {elapsed:.0f}s")
+                break
+            chunk_start = time.monotonic()
+            scores = score_chunk(
+                df["text_clean"].tolist(), text_hashes(df), backend, caches, scorers, threshold
+            )
+            scores.insert(0, "id", df["id"].values)
+            scores.insert(1, "text_clean", df["text_clean"].values)
+
+            # One set-based write for all score columns, then the same rows to both exports
+            bulk_upsert(conn, "posts_emotions", scores, key="id", columns=SCORE_COLUMNS)
+            sentiment_out.write(scores)
+            emotion_out.write(scores)
+            if resume:
+                bulk_insert(conn, "scored_this_run", scores[["id"]])
+
+            label_counts.update(scores["sentiment_label"])
+            dominant_counts.update(scores["dominant_emotion"].dropna())
+            tier_counts.update(scores["score_tier"])
+            scored += len(scores)
+            chunk_seconds = time.monotonic() - chunk_start
+            log.info(f"   {scored}/{total} posts scored")
+
+        # The exports are rewritten each run, so a resumed run adds the posts earlier
+        # runs scored. This happens after the deadline loop, outside its budget.
+        if resume:
+            earlier = f"{SCORING_DONE} AND e.id NOT IN (SELECT id FROM scored_this_run)"
+            for done in scored_post_batches(conn, SCORE_COLUMNS, earlier, DEFAULT_CHUNK_SIZE):
+                sentiment_out.write(done)
+                emotion_out.write(done)
+            conn.execute("DROP TABLE scored_this_run")
+
+    for cache in caches.values():
+        log.info(f"   Score cache — {cache.report()}")
+    log.info("✅ Scoring complete")
+    log.info(f"   Label distribution: {dict(label_counts.most_common())}")
+    log.info(f"   Dominant emotions: {dict(dominant_counts.most_common())}")
+    if threshold is not None:
+        log.info(f"   Cascade: {tier_counts['vader']}/{scored} posts settled by VADER alone")
+    if scored < total:
+        log.info(f"   {total - scored} posts left for the next run")
+    conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Single-pass VADER + RoBERTa + GoEmotions scoring")
+    parser.add_argument("--backend", choices=BACKENDS, help="Inference backend (default: torch)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes per model")
+    parser.add_argument("--resume", action="store_true", help="Skip posts already scored")
+    parser.add_argument(
+        "--cascade-threshold",
+        type=float,
+        help="VADER confidence at which posts skip the transformers (see src.analysis.cascade)",
+    )
+    parser.add_argument(
+        "--sentences", action="store_true", help="Score unique sentences, pool per post"
+    )
+    parser.add_argument(
+        "--deadline",
+        type=float,
+        help="Anytime mode: seconds to spend, newest/most-engaged unscored posts first",
+    )
+    args = parser.parse_args()
+
+    run_scoring(
+        backend=args.backend,
+        chunk_size=args.chunk_size,
+        workers=args.workers,
+        resume=args.resume,
+        cascade=args.cascade_threshold,
+        sentences=args.sentences or None,
+        deadline=args.deadline,
+    )
@@ -0,0 +1,96 @@
+"""
+Sentence-level scoring — each unique sentence goes through a model once.
+
+Posts repeat a lot of sentences: quoted parent comments, sign-offs like
+"stay safe everyone", syndicated news paragraphs. In sentence mode a post is
+split into sentences, every sentence is looked up in (or added to) the score
+cache by its own text hash, and the sentence scores are pooled back into one
+score row per post:
+
+- ``mean``: plain average over the post's sentences
+- ``weighted``: average weighted by sentence length in characters
+- ``max``: per-label maximum (an emotion counts if any sentence shows it)
+
+Sentence hashes use ``compute_text_hash``, the same hash as
+posts_clean.text_hash, so a one-sentence post and the identical sentence
+elsewhere share a cache entry. Enable with ``sentences.enabled`` in
+config/settings.yaml or ``--sentences`` on the scoring stages.
+"""
+
+import re
+
+import numpy as np
+
+from src.analysis.cleaning import compute_text_hash
+from src.analysis.inference import POOLING, pool
+from src.utils.settings import get_setting
+
+DEFAULT_POOLING = {"roberta": "weighted", "goemotions": "max"}
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\n+")
+
+
+def sentence_mode(enabled: bool | None = None) -> bool:
+    """Resolve sentence mode (argument → settings ``sentences.enabled``)."""
+    if enabled is None:
+        enabled = get_setting("sentences", "enabled", default=False)
+    return bool(enabled)
+
+
+def pooling_rule(model: str) -> str:
+    """Pooling rule for ``model`` from settings ``sentences.pooling``."""
+    rule = get_setting("sentences", "pooling", model, default=DEFAULT_POOLING.get(model, "mean"))
+    if rule not in POOLING:
+        raise ValueError(f"Unknown pooling rule '{rule}' for {model} (expected one of {POOLING})")
+    return rule
+
+
+def split_sentences(text: str) -> list[str]:
+    """Sentences of ``text`` (the whole text when it has no sentence breaks; [''] when empty)."""
+    if not text or not isinstance(text, str):
+        return [""]
+    parts = [s.strip() for s in _SENTENCE_END.split(text)]
+    return [s for s in parts if s] or [text.strip()]
+
+
+class SentenceCache:
+    """Drop-in for a ``ScoreCache`` that scores posts sentence by sentence.
+
+    ``get_or_score`` keeps the ``ScoreCache`` signature (post hashes are not
+    needed — sentences are keyed by their own hash), so stages swap it in
+    without changing how they call the cache.
+    """
+
+    def __init__(self, cache, pooling: str = "mean"):
+        if pooling not in POOLING:
+            raise ValueError(f"Unknown pooling rule '{pooling}' (expected one of {POOLING})")
+        self.cache = cache
+        self.pooling = pooling
+        self.posts = 0
+        self.sentences = 0
+        self.unique = 0
+
+    def __getattr__(self, name):
+        return getattr(self.cache, name)  # model_name, revision, prune_stale, hits, ...
+
+    def get_or_score(self, hashes: list[str], texts: list[str], score_fn) -> np.ndarray:
+        """Pooled score matrix for ``texts``; each distinct sentence is scored at most once."""
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        split = [split_sentences(t) for t in texts]
+        sentences = [s for parts in split for s in parts]
+        sentence_hashes = [compute_text_hash(s) for s in sentences]
+        self.posts += len(texts)
+        self.sentences += len(sentences)
+        self.unique += len(set(sentence_hashes))
+
+        scores = self.cache.get_or_score(sentence_hashes, sentences, score_fn)
+        counts = np.array([len(parts) for parts in split])
+        weights = np.array([max(len(s), 1) for s in sentences], dtype=np.float32)
+        return pool(scores, counts, weights, self.pooling).astype(np.float32)
+
+    def report(self) -> str:
+        return (
+            f"{self.cache.report()} — {self.posts} posts → {self.sentences} sentences "
+            f"({self.unique} distinct per chunk, {self.pooling} pooling)"
+        )
@@ -5,13 +5,62 @@ VADER: Fast, lexicon-based polarity scoring.
 RoBERTa: Transformer-based sentiment (positive/negative/neutral) fine-tuned on social media.
 """
 
+import argparse
+from collections import Counter
+from contextlib import ExitStack
+from functools import partial
+
+import numpy as np
+
+from src.analysis.cascade import model_tier
+from src.analysis.distilled import DistilledPipeline, load_distilled_pipeline
+from src.analysis.inference import (
+    DEFAULT_MAX_BATCH_SIZE,
+    model_labels,
+    predict_proba,
+    sliding_window,
+)
+from src.analysis.model_server import RemotePipeline, get_client
+from src.analysis.onnx_backend import BACKENDS, get_backend, load_onnx_pipeline
+from src.analysis.score_cache import (
+    ScoreCache,
+    cache_model_name,
+    pipeline_revision,
+    text_hashes,
+    vader_revision,
+)
+from src.analysis.sentences import SentenceCache, pooling_rule, sentence_mode
+from src.analysis.streaming import (
+    DEFAULT_CHUNK_SIZE,
+    ParquetAppender,
+    clean_post_batches,
+    count_clean_posts,
+    score_schema,
+    scored_post_batches,
+)
+from src.analysis.worker_pool import InferencePool
 from src.utils.constants import PROJECT_ROOT
-from src.utils.db import get_connection, init_database
+from src.utils.db import bulk_upsert, get_connection, init_database
 from src.utils.logger import log
+from src.utils.settings import get_setting
+
+ROBERTA_MODEL = "cardiffnlp/twitter-roberta-base-sentiment-latest"
+
+SENTIMENT_COLUMNS = [
+    "vader_compound",
+    "vader_positive",
+    "vader_negative",
+    "vader_neutral",
+    "roberta_positive",
+    "roberta_negative",
+    "roberta_neutral",
+    "sentiment_label",
+]
+SENTIMENT_DONE = "e.sentiment_label IS NOT NULL"  # posts_emotions rows --resume skips
 
 # Lazy imports for heavy ML libraries
 _vader_analyzer = None
-_roberta_pipeline = None
+_roberta_pipelines = {}  # backend → loaded pipeline
 
 
 def _get_vader():
@@ -25,22 +74,33 @@ def _get_vader():
     return _vader_analyzer
 
 
-def _get_roberta():
-    """Lazy-load RoBERTa sentiment pipeline."""
-    global _roberta_pipeline
-    if _roberta_pipeline is None:
-        from transformers import pipeline
-
-        _roberta_pipeline = pipeline(
-            "sentiment-analysis",
-            model="cardiffnlp/twitter-roberta-base-sentiment-latest",
-            tokenizer="cardiffnlp/twitter-roberta-base-sentiment-latest",
-            max_length=512,
-            truncation=True,
-            top_k=None,  # Return all labels with scores
-        )
-        log.info("RoBERTa sentiment pipeline loaded")
-    return _roberta_pipeline
+def _get_roberta(backend: str | None = None):
+    """Lazy-load RoBERTa sentiment pipeline for the selected inference backend."""
+    backend = get_backend(backend)
+    if backend not in _roberta_pipelines:
+        client = get_client()
+        if client is not None:
+            _roberta_pipelines[backend] = client.pipeline("roberta", backend)
+        elif backend == "distilled":
+            _roberta_pipelines[backend] = load_distilled_pipeline("sentiment")
+        elif backend == "torch":
+            from transformers import pipeline
+
+            _roberta_pipelines[backend] = pipeline(
+                "sentiment-analysis",
+                model=ROBERTA_MODEL,
+                tokenizer=ROBERTA_MODEL,
+                max_length=512,
+                truncation=True,
+                top_k=None,  # Return all labels with scores
+            )
+        else:
+            _roberta_pipelines[backend] = load_onnx_pipeline(
+                ROBERTA_MODEL, quantize=backend == "onnx-int8"
+            )
+        where = "model server" if client is not None else "in-process"
+        log.info(f"RoBERTa sentiment pipeline loaded ({backend}, {where})")
+    return _roberta_pipelines[backend]
 
 
 def score_vader(text: str) -> dict:
@@ -58,163 +118,235 @@ def score_vader(text: str) -> dict:
     }
 
 
-def score_roberta_batch(texts: list[str], batch_size: int = 32) -> list[dict]:
+VADER_KEYS = ["compound", "pos", "neg", "neu"]
+
+
+def score_vader_matrix(texts: list[str]) -> np.ndarray:
+    """VADER scores as an (N × 4) matrix in ``VADER_KEYS`` order."""
+    rows = [[s[k] for k in VADER_KEYS] for s in map(score_vader, texts)]
+    return np.asarray(rows, dtype=np.float32).reshape(-1, len(VADER_KEYS))
+
+
+def roberta_proba(
+    texts: list[str],
+    max_tokens: int | None = None,
+    max_batch_size: int | None = None,
+    backend: str | None = None,
+) -> np.ndarray:
+    """RoBERTa class probabilities (N × labels, ``model_labels`` order; NaN rows = failed text).
+
+    Texts are length-bucketed under a padded-token budget (see ``src.analysis.inference``);
+    leave ``max_tokens`` unset to use the budget tuned for this host.
+    """
+    pipe = _get_roberta(backend)
+    # Clean empty texts
+    texts_clean = [
+        t if t and isinstance(t, str) and len(t.strip()) > 0 else "neutral" for t in texts
+    ]
+    if isinstance(pipe, (RemotePipeline, DistilledPipeline)):
+        return pipe.proba(texts_clean)
+    if max_batch_size is None:
+        max_batch_size = get_setting(
+            "models", "roberta", "batch_size", default=DEFAULT_MAX_BATCH_SIZE
+        )
+    return predict_proba(pipe, texts_clean, max_tokens, max_batch_size, **sliding_window())
+
+
+ROBERTA_KEYS = ["positive", "negative", "neutral"]
+
+
+def roberta_matrix(probs: np.ndarray, labels: list[str]) -> np.ndarray:
+    """RoBERTa probabilities reordered to an (N × 3) matrix in ``ROBERTA_KEYS`` order.
+
+    Labels the model lacks score 0. Rows that failed inference stay NaN (NULL
+    in the database) rather than posing as neutral; ``sentiment_labels`` then
+    falls back to VADER alone.
+    """
+    probs = np.asarray(probs, dtype=np.float32).reshape(len(probs), -1)
+    out = np.zeros((len(probs), len(ROBERTA_KEYS)), dtype=np.float32)
+    for j, key in enumerate(ROBERTA_KEYS):
+        if key in labels:
+            out[:, j] = probs[:, labels.index(key)]
+    out[np.isnan(probs).any(axis=1)] = np.nan
+    return out
+
+
+def roberta_to_dicts(probs: np.ndarray, labels: list[str]) -> list[dict]:
+    """Per-text {positive, negative, neutral} dicts (see ``roberta_matrix``)."""
+    return [dict(zip(ROBERTA_KEYS, row)) for row in roberta_matrix(probs, labels).tolist()]
+
+
+def score_roberta_batch(
+    texts: list[str],
+    max_tokens: int | None = None,
+    max_batch_size: int | None = None,
+    backend: str | None = None,
+) -> list[dict]:
     """Score a batch of texts with RoBERTa. Returns list of {positive, negative, neutral}."""
-    pipe = _get_roberta()
-    results = []
-
-    for i in range(0, len(texts), batch_size):
-        batch = texts[i : i + batch_size]
-        # Clean empty texts
-        batch_clean = [
-            t if t and isinstance(t, str) and len(t.strip()) > 0 else "neutral" for t in batch
-        ]
-
-        try:
-            preds = pipe(batch_clean)
-            for pred in preds:
-                score_dict = {"positive": 0.0, "negative": 0.0, "neutral": 0.0}
-                if isinstance(pred, list):
-                    for item in pred:
-                        label = item["label"].lower()
-                        if label in score_dict:
-                            score_dict[label] = item["score"]
-                results.append(score_dict)
-        except Exception as e:
-            log.warning(f"RoBERTa batch error: {e}")
-            results.extend([{"positive": 0.0, "negative": 0.0, "neutral": 1.0}] * len(batch))
-
-    return results
+    probs = roberta_proba(texts, max_tokens, max_batch_size, backend)
+    return roberta_to_dicts(probs, model_labels(_get_roberta(backend)))
 
 
 def derive_sentiment_label(vader_compound: float, roberta_pos: float, roberta_neg: float) -> str:
     """Derive overall sentiment label from combined scores."""
-    # Weighted average approach
-    vader_signal = 1 if vader_compound > 0.05 else (-1 if vader_compound < -0.05 else 0)
-    roberta_signal = 1 if roberta_pos > roberta_neg else (-1 if roberta_neg > roberta_pos else 0)
+    return str(sentiment_labels([vader_compound], [roberta_pos], [roberta_neg])[0])
 
-    combined = vader_signal + roberta_signal
-    if combined > 0:
-        return "positive"
-    elif combined < 0:
-        return "negative"
-    return "neutral"
 
+def sentiment_labels(vader_compound, roberta_pos, roberta_neg) -> np.ndarray:
+    """Vectorized sentiment labels: sign(VADER signal + RoBERTa signal).
 
-def run_sentiment_analysis():
-    """Run full sentiment scoring on posts_clean → posts_emotions (partial)."""
-    log.info("📊 Starting sentiment analysis (VADER + RoBERTa)")
+    VADER votes ±1 outside ±0.05; RoBERTa votes for the larger of positive and
+    negative (no vote when they tie or the row is NaN).
+    """
+    compound = np.asarray(vader_compound, dtype=np.float64)
+    pos = np.asarray(roberta_pos, dtype=np.float64)
+    neg = np.asarray(roberta_neg, dtype=np.float64)
+    vader_signal = (compound > 0.05).astype(int) - (compound < -0.05)
+    roberta_signal = (pos > neg).astype(int) - (neg > pos)
+    combined = np.sign(vader_signal + roberta_signal)
+    return np.array(["negative", "neutral", "positive"], dtype=object)[combined + 1]
+
+
+def sentiment_frame(vader: np.ndarray, roberta: np.ndarray) -> dict:
+    """posts_emotions sentiment columns from VADER (N × 4) and RoBERTa (N × 3) matrices."""
+    columns = {
+        f"vader_{key}": vader[:, i]
+        for i, key in enumerate(["compound", "positive", "negative", "neutral"])
+    }
+    columns.update({f"roberta_{key}": roberta[:, i] for i, key in enumerate(ROBERTA_KEYS)})
+    columns["sentiment_label"] = sentiment_labels(vader[:, 0], roberta[:, 0], roberta[:, 1])
+    return columns
+
+
+def roberta_fallback(n: int) -> np.ndarray:
+    """RoBERTa matrix used when the model is unavailable: all neutral (VADER decides)."""
+    return np.tile(np.array([0.0, 0.0, 1.0], dtype=np.float32), (n, 1))
+
+
+def run_sentiment_analysis(
+    backend: str | None = None,
+    workers: int = 1,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    resume: bool = False,
+    sentences: bool | None = None,
+):
+    """Run full sentiment scoring on posts_clean → posts_emotions (partial).
+
+    Posts are streamed ``chunk_size`` at a time; each chunk is written to
+    posts_emotions and appended to sentiment_scores.parquet before the next is
+    read (see ``src.analysis.streaming``). ``resume`` skips posts that already
+    have a sentiment label. With ``workers`` > 1, RoBERTa runs in a sharded
+    process pool (see ``src.analysis.worker_pool``). ``sentences`` scores RoBERTa per
+    unique sentence and pools back to posts (see ``src.analysis.sentences``).
+    """
+    log.info(f"📊 Starting sentiment analysis (VADER + RoBERTa, {get_backend(backend)} backend)")
 
     init_database()
     conn = get_connection()
 
-    # Load clean posts
-    df = conn.execute("""
-        SELECT id, text_clean
-        FROM posts_clean
-        WHERE is_duplicate = false AND quality_flag = 'ok'
-    """).fetchdf()
-
-    if df.empty:
+    skip_done = SENTIMENT_DONE if resume else None
+    total = count_clean_posts(conn, skip_done)
+    if total == 0:
         log.warning("No clean posts to analyze")
         conn.close()
         return
+    log.info(f"Scoring {total} posts in chunks of {chunk_size}")
 
-    log.info(f"Scoring {len(df)} posts")
-
-    # VADER scoring
-    log.info("Running VADER...")
-    vader_scores = df["text_clean"].apply(score_vader)
-    df["vader_compound"] = vader_scores.apply(lambda x: x["compound"])
-    df["vader_positive"] = vader_scores.apply(lambda x: x["pos"])
-    df["vader_negative"] = vader_scores.apply(lambda x: x["neg"])
-    df["vader_neutral"] = vader_scores.apply(lambda x: x["neu"])
-
-    # RoBERTa scoring
-    log.info("Running RoBERTa...")
-    texts = df["text_clean"].tolist()
+    vader_cache = ScoreCache(conn, "vader", vader_revision())
+    vader_cache.prune_stale()
     try:
-        roberta_scores = score_roberta_batch(texts, batch_size=32)
-        df["roberta_positive"] = [s["positive"] for s in roberta_scores]
-        df["roberta_negative"] = [s["negative"] for s in roberta_scores]
-        df["roberta_neutral"] = [s["neutral"] for s in roberta_scores]
+        pipe = _get_roberta(backend)
+        roberta_cache = ScoreCache(
+            conn,
+            cache_model_name(ROBERTA_MODEL, get_backend(backend)),
+            pipeline_revision(pipe),
+        )
+        roberta_cache.prune_stale()
+        if sentence_mode(sentences):
+            roberta_cache = SentenceCache(roberta_cache, pooling_rule("roberta"))
+        labels = model_labels(pipe)
     except Exception as e:
         log.warning(f"RoBERTa failed, using VADER only: {e}")
-        df["roberta_positive"] = 0.0
-        df["roberta_negative"] = 0.0
-        df["roberta_neutral"] = 1.0
-
-    # Derive label
-    df["sentiment_label"] = df.apply(
-        lambda row: derive_sentiment_label(
-            row["vader_compound"], row["roberta_positive"], row["roberta_negative"]
-        ),
-        axis=1,
-    )
-
-    # Upsert to posts_emotions (sentiment columns only for now)
-    # First check if rows already exist
-    existing = conn.execute("SELECT id FROM posts_emotions").fetchdf()
-    existing_ids = set(existing["id"]) if not existing.empty else set()
-
-    for _, row in df.iterrows():
-        if row["id"] in existing_ids:
-            conn.execute(
-                """
-                UPDATE posts_emotions SET
-                    vader_compound = ?, vader_positive = ?, vader_negative = ?, vader_neutral = ?,
-                    roberta_positive = ?, roberta_negative = ?, roberta_neutral = ?,
-                    sentiment_label = ?
-                WHERE id = ?
-            """,
-                [
-                    row["vader_compound"],
-                    row["vader_positive"],
-                    row["vader_negative"],
-                    row["vader_neutral"],
-                    row["roberta_positive"],
-                    row["roberta_negative"],
-                    row["roberta_neutral"],
-                    row["sentiment_label"],
-                    row["id"],
-                ],
-            )
-        else:
-            conn.execute(
-                """
-                INSERT INTO posts_emotions (
-                    id, vader_compound, vader_positive, vader_negative, vader_neutral,
-                    roberta_positive, roberta_negative, roberta_neutral,
-                    sentiment_label
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-                [
-                    row["id"],
-                    row["vader_compound"],
-                    row["vader_positive"],
-                    row["vader_negative"],
-                    row["vader_neutral"],
-                    row["roberta_positive"],
-                    row["roberta_negative"],
-                    row["roberta_neutral"],
-                    row["sentiment_label"],
-                ],
+        roberta_cache = None
+
+    label_counts = Counter()
+    compound_sum = 0.0
+    scored = 0
+    out = PROJECT_ROOT / "data" / "processed" / "sentiment_scores.parquet"
+    with ExitStack() as stack:
+        writer = stack.enter_context(
+            ParquetAppender(out, score_schema(SENTIMENT_COLUMNS, ["sentiment_label"]))
+        )
+        if resume:
+            for done in scored_post_batches(conn, SENTIMENT_COLUMNS, SENTIMENT_DONE, chunk_size):
+                writer.write(done)
+
+        roberta_fn = partial(roberta_proba, backend=backend)
+        if workers > 1 and roberta_cache is not None:
+            pool = stack.enter_context(InferencePool("roberta", backend, workers))
+            roberta_fn = partial(pool.score, conn)
+
+        for df in clean_post_batches(conn, chunk_size, skip_done):
+            texts = df["text_clean"].tolist()
+            hashes = text_hashes(df)
+
+            # VADER scoring
+            vader = vader_cache.get_or_score(hashes, texts, score_vader_matrix)
+
+            # RoBERTa scoring
+            roberta = None
+            if roberta_cache is not None:
+                try:
+                    probs = roberta_cache.get_or_score(hashes, texts, roberta_fn)
+                    roberta = roberta_matrix(probs, labels)
+                except Exception as e:
+                    log.warning(f"RoBERTa failed on this chunk, using VADER only: {e}")
+            tier = model_tier(get_backend(backend))
+            if roberta is None:
+                roberta = roberta_fallback(len(df))
+                tier = "vader"
+
+            # Score columns + derived label
+            df = df.assign(**sentiment_frame(vader, roberta), score_tier=tier)
+
+            # Upsert to posts_emotions (sentiment columns + tier only), then export the chunk
+            bulk_upsert(
+                conn, "posts_emotions", df, key="id", columns=SENTIMENT_COLUMNS + ["score_tier"]
             )
+            writer.write(df)
 
-    # Export
-    processed_dir = PROJECT_ROOT / "data" / "processed"
-    processed_dir.mkdir(parents=True, exist_ok=True)
-    df.to_parquet(processed_dir / "sentiment_scores.parquet", index=False)
+            label_counts.update(df["sentiment_label"])
+            compound_sum += float(df["vader_compound"].sum())
+            scored += len(df)
+            log.info(f"   {scored}/{total} posts scored")
+
+    log.info(f"   Score cache — {vader_cache.report()}")
+    if roberta_cache is not None:
+        log.info(f"   Score cache — {roberta_cache.report()}")
 
     # Stats
-    label_dist = df["sentiment_label"].value_counts().to_dict()
-    avg_compound = df["vader_compound"].mean()
     log.info("✅ Sentiment analysis complete")
-    log.info(f"   Label distribution: {label_dist}")
-    log.info(f"   Mean VADER compound: {avg_compound:.3f}")
+    log.info(f"   Label distribution: {dict(label_counts)}")
+    log.info(f"   Mean VADER compound: {compound_sum / scored:.3f}")
 
     conn.close()
 
 
 if __name__ == "__main__":
-    run_sentiment_analysis()
+    parser = argparse.ArgumentParser(description="VADER + RoBERTa sentiment scoring")
+    parser.add_argument("--backend", choices=BACKENDS, help="Inference backend (default: torch)")
+    parser.add_argument("--workers", type=int, default=1, help="RoBERTa worker processes")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--resume", action="store_true", help="Skip posts already scored")
+    parser.add_argument(
+        "--sentences", action="store_true", help="Score unique sentences, pool per post"
+    )
+    args = parser.parse_args()
+
+    run_sentiment_analysis(
+        backend=args.backend,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        resume=args.resume,
+        sentences=args.sentences or None,
+    )
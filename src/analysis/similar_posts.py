@@ -0,0 +1,330 @@
+"""
+Similar-post search — an approximate nearest-neighbor index over post embeddings.
+
+The index covers the embedding store (src/analysis/embedding_store.py) that
+the topic stage fills, so it never embeds anything itself. Its item labels
+are store row numbers: after each topic run, ``update_index`` adds just the
+rows appended since the last update.
+
+Two CPU backends:
+
+- ``hnsw``: hnswlib's HNSW graph (cosine), used when hnswlib is installed
+- ``ivf``: numpy inverted-file index: spherical k-means centroids; a query
+  scans only the posts in its ``nprobe`` nearest lists, reading their
+  vectors straight from the store's memory map
+
+The IVF index retrains its centroids once the store has grown to
+``retrain_growth`` times the size they were trained on. Both persist under
+data/processed/ann_index/, next to the BERTopic model.
+
+Usage:
+    python -m src.analysis.similar_posts                     # build / update
+    python -m src.analysis.similar_posts --rebuild
+    python -m src.analysis.similar_posts --query "agents on 71st street"
+"""
+
+import argparse
+import json
+import math
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.analysis.embedding_store import EmbeddingStore
+from src.utils.constants import PROJECT_ROOT
+from src.utils.db import get_connection
+from src.utils.logger import log
+from src.utils.settings import get_setting
+
+INDEX_DIR = PROJECT_ROOT / "data" / "processed" / "ann_index"
+BACKENDS = ("auto", "hnsw", "ivf")
+DEFAULTS = {
+    "backend": "auto",
+    "nprobe": 8,  # IVF lists scanned per query
+    "retrain_growth": 4.0,  # Retrain IVF centroids once the store is this many times larger
+    "hnsw_m": 16,
+    "hnsw_ef_construction": 200,
+    "hnsw_ef": 64,
+}
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLE_PER_LIST = 64  # Training vectors per centroid
+ASSIGN_BATCH = 65536
+
+_index = None
+
+
+def index_settings() -> dict:
+    return DEFAULTS | (get_setting("similar_posts", default={}) or {})
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1.0, norms)
+
+
+def _resolve_backend(backend: str) -> str:
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown ANN backend '{backend}' (expected one of {BACKENDS})")
+    if backend != "auto":
+        return backend
+    try:
+        import hnswlib  # noqa: F401
+
+        return "hnsw"
+    except ImportError:
+        return "ivf"
+
+
+# ── IVF ─────────────────────────────────────────────────────
+
+
+class IVFIndex:
+    """Inverted-file index: each row lives in the list of its nearest centroid."""
+
+    def __init__(self, centroids: np.ndarray, lists: np.ndarray, trained_on: int):
+        self.centroids = centroids
+        self.lists = lists  # List number per indexed row
+        self.trained_on = trained_on
+        self._sort()
+
+    def _sort(self) -> None:
+        self.order = np.argsort(self.lists, kind="stable").astype(np.int64)
+        self.offsets = np.searchsorted(self.lists[self.order], np.arange(len(self.centroids) + 1))
+
+    def __len__(self) -> int:
+        return len(self.lists)
+
+    @classmethod
+    def train(cls, vectors: np.ndarray, seed: int = 42) -> "IVFIndex":
+        """Spherical k-means on a sample, then assign every row (~sqrt(n) lists)."""
+        n = len(vectors)
+        n_lists = max(1, min(4096, int(math.sqrt(n))))
+        rng = np.random.default_rng(seed)
+        sample = rng.choice(n, min(n, n_lists * KMEANS_SAMPLE_PER_LIST), replace=False)
+        train = _normalize(vectors[np.sort(sample)])
+        centroids = train[rng.choice(len(train), n_lists, replace=False)]
+        for _ in range(KMEANS_ITERATIONS):
+            nearest = (train @ centroids.T).argmax(axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, nearest, train)
+            empty = ~np.bincount(nearest, minlength=n_lists).astype(bool)
+            sums[empty] = centroids[empty]
+            centroids = _normalize(sums)
+        return cls(centroids, cls._assign(centroids, vectors), trained_on=n)
+
+    @staticmethod
+    def _assign(centroids: np.ndarray, vectors: np.ndarray) -> np.ndarray:
+        lists = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), ASSIGN_BATCH):
+            chunk = _normalize(vectors[start : start + ASSIGN_BATCH])
+            lists[start : start + ASSIGN_BATCH] = (chunk @ centroids.T).argmax(axis=1)
+        return lists
+
+    def add(self, vectors: np.ndarray) -> None:
+        """Append rows (labels continue from ``len(self)``) to their nearest lists."""
+        self.lists = np.concatenate([self.lists, self._assign(self.centroids, vectors)])
+        self._sort()
+
+    def query(self, matrix: np.ndarray, q: np.ndarray, k: int, nprobe: int):
+        """(rows, cosine similarities) of the ``k`` best rows in the ``nprobe`` nearest lists."""
+        probes = np.argsort(-(self.centroids @ q))[:nprobe]
+        candidates = np.concatenate(
+            [self.order[self.offsets[p] : self.offsets[p + 1]] for p in probes]
+        )
+        candidates.sort()  # Sequential reads from the memory map
+        sims = _normalize(matrix[candidates]) @ q
+        best = np.argsort(-sims)[:k]
+        return candidates[best], sims[best]
+
+    def save(self, path) -> None:
+        np.savez(path, centroids=self.centroids, lists=self.lists, trained_on=self.trained_on)
+
+    @classmethod
+    def load(cls, path) -> "IVFIndex":
+        data = np.load(path)
+        return cls(data["centroids"], data["lists"], int(data["trained_on"]))
+
+
+# ── Index ───────────────────────────────────────────────────
+
+
+class SimilarPostsIndex:
+    """ANN index over an embedding store's rows, persisted in ``directory``."""
+
+    def __init__(self, store: EmbeddingStore, directory=None, backend: str | None = None):
+        self.store = store
+        self.dir = directory or INDEX_DIR
+        self.settings = index_settings()
+        self.backend = _resolve_backend(backend or self.settings["backend"])
+        self.index = None
+        self.size = 0
+        self._load()
+
+    @property
+    def _meta_path(self):
+        return self.dir / "meta.json"
+
+    @property
+    def _index_path(self):
+        return self.dir / ("hnsw.bin" if self.backend == "hnsw" else "ivf.npz")
+
+    def _load(self) -> None:
+        if not self._meta_path.exists():
+            return
+        meta = json.loads(self._meta_path.read_text())
+        if meta.get("backend") != self.backend or meta.get("model") != self.store.model_name:
+            return
+        if meta["size"] > len(self.store) or not self._index_path.exists():
+            return  # Store was reset under the index
+        if self.backend == "hnsw":
+            import hnswlib
+
+            self.index = hnswlib.Index(space="cosine", dim=self.store.dim)
+            self.index.load_index(str(self._index_path), max_elements=meta["size"])
+            self.index.set_ef(self.settings["hnsw_ef"])
+        else:
+            self.index = IVFIndex.load(self._index_path)
+        self.size = meta["size"]
+
+    def _save(self) -> None:
+        self.dir.mkdir(parents=True, exist_ok=True)
+        if self.backend == "hnsw":
+            self.index.save_index(str(self._index_path))
+        else:
+            self.index.save(self._index_path)
+        meta = {"backend": self.backend, "model": self.store.model_name, "size": self.size}
+        self._meta_path.write_text(json.dumps(meta))
+
+    def update(self, rebuild: bool = False) -> int:
+        """Index store rows added since the last update (all rows with ``rebuild``)."""
+        matrix = self.store.matrix()
+        total = len(matrix)
+        if rebuild or self.index is None:
+            self.index, self.size = None, 0
+        elif self.backend == "ivf" and total >= self.settings["retrain_growth"] * max(
+            self.index.trained_on, 1
+        ):
+            log.info(f"Similar posts: store grew to {total} rows, retraining IVF centroids")
+            self.index, self.size = None, 0
+        added = total - self.size
+        if added <= 0:
+            return 0
+
+        start = time.perf_counter()
+        new = matrix[self.size : total]
+        if self.backend == "hnsw":
+            import hnswlib
+
+            if self.index is None:
+                self.index = hnswlib.Index(space="cosine", dim=self.store.dim)
+                self.index.init_index(
+                    max_elements=total,
+                    M=self.settings["hnsw_m"],
+                    ef_construction=self.settings["hnsw_ef_construction"],
+                )
+                self.index.set_ef(self.settings["hnsw_ef"])
+            else:
+                self.index.resize_index(total)
+            self.index.add_items(np.asarray(new, dtype=np.float32), np.arange(self.size, total))
+        elif self.index is None:
+            self.index = IVFIndex.train(matrix)
+        else:
+            self.index.add(new)
+        self.size = total
+        self._save()
+        log.info(
+            f"Similar posts: indexed {added} vectors ({total} total, {self.backend}) "
+            f"in {time.perf_counter() - start:.1f}s"
+        )
+        return added
+
+    def query(self, vector: np.ndarray, k: int = 10) -> tuple[np.ndarray, np.ndarray]:
+        """(store rows, cosine similarities) of the ``k`` nearest indexed vectors."""
+        if not self.size:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        q = _normalize(np.asarray(vector).reshape(1, -1))[0]
+        k = min(k, self.size)
+        if self.backend == "hnsw":
+            labels, distances = self.index.knn_query(q, k=k)
+            return labels[0].astype(np.int64), 1.0 - distances[0]
+        return self.index.query(self.store.matrix(), q, k, self.settings["nprobe"])
+
+
+# ── Query API ───────────────────────────────────────────────
+
+
+def get_index(model_name: str | None = None) -> SimilarPostsIndex:
+    """Process-wide index over the topic stage's embedding store (loaded once)."""
+    global _index
+    if _index is None:
+        from src.analysis.topics import EMBEDDING_MODEL
+
+        _index = SimilarPostsIndex(EmbeddingStore(model_name or EMBEDDING_MODEL))
+    return _index
+
+
+def update_index(rebuild: bool = False) -> int:
+    """Bring the on-disk index up to date with the embedding store."""
+    index = get_index()
+    index.store.reload()
+    return index.update(rebuild=rebuild)
+
+
+def similar_posts(
+    post_id: str | None = None, text: str | None = None, k: int = 10, conn=None
+) -> pd.DataFrame:
+    """Posts most similar to an existing post (by id) or to a free-text query.
+
+    Returns posts_full rows (id, text, phase, platform, topic) with a
+    ``similarity`` column, best first; posts sharing a text share a score.
+    """
+    if (post_id is None) == (text is None):
+        raise ValueError("Pass exactly one of post_id or text")
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection()
+    index = get_index()
+    try:
+        if post_id is not None:
+            row = conn.execute(
+                "SELECT text_hash FROM posts_clean WHERE id = ?", [post_id]
+            ).fetchone()
+            if row is None or row[0] not in index.store:
+                raise KeyError(f"No stored embedding for post {post_id}")
+            vector = index.store.get([row[0]])[0]
+        else:
+            from src.analysis.topics import embed_texts
+
+            vector = embed_texts([text])[0]
+
+        rows, sims = index.query(vector, k=k + 1)
+        hits = pd.DataFrame({"text_hash": index.store.hash_at(rows), "similarity": sims})
+        conn.register("similar_hits", hits)
+        out = conn.execute(
+            """
+            SELECT p.id, p.text_clean, p.phase, p.platform, p.topic_label, h.similarity
+            FROM similar_hits h JOIN posts_full p ON p.text_hash = h.text_hash
+            ORDER BY h.similarity DESC, p.id
+            """
+        ).fetchdf()
+        conn.unregister("similar_hits")
+    finally:
+        if own_conn:
+            conn.close()
+    if post_id is not None:
+        out = out[out["id"] != post_id]
+    return out.head(k).reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Similar-post ANN index")
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild instead of updating")
+    parser.add_argument("--query", help="Show the posts most similar to this text")
+    parser.add_argument("--post-id", help="Show the posts most similar to this post")
+    parser.add_argument("-k", type=int, default=10)
+    args = parser.parse_args()
+    update_index(rebuild=args.rebuild)
+    if args.query or args.post_id:
+        log.info(similar_posts(post_id=args.post_id, text=args.query, k=args.k).to_string())
@@ -0,0 +1,164 @@
+"""
+Streaming I/O for the scoring stages — DuckDB record batches in, Parquet chunks out.
+
+Stages read posts_clean ``chunk_size`` rows at a time through their own
+cursor, write each scored chunk to the database straight away and append it
+to a Parquet file, so memory stays flat as the corpus grows. A run that is
+interrupted keeps every chunk it wrote; rerunning with ``resume=True`` only
+scores posts whose posts_emotions row is not done yet. Anytime runs read
+unscored posts newest and most-engaged first (``priority_sql``) so a run cut
+short by its deadline has already covered the posts that matter most.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterator
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src.utils.logger import log
+
+DEFAULT_CHUNK_SIZE = 2000
+DEFAULT_HALF_LIFE_HOURS = 24.0  # Priority order: a day of age offsets a 2× engagement lead
+
+_CLEAN = "c.is_duplicate = false AND c.quality_flag = 'ok'"
+
+
+def _clean_posts_from(skip_done: str | None) -> str:
+    """FROM/WHERE over eligible posts; ``skip_done`` is a predicate on posts_emotions ``e``."""
+    if not skip_done:
+        return f"FROM posts_clean c WHERE {_CLEAN}"
+    return (
+        "FROM posts_clean c LEFT JOIN posts_emotions e ON c.id = e.id "
+        f"WHERE {_CLEAN} AND NOT coalesce({skip_done}, false)"
+    )
+
+
+def priority_sql(half_life_hours: float = DEFAULT_HALF_LIFE_HOURS) -> str:
+    """Hot-style rank for a posts_clean row ``c``: log engagement minus age decay.
+
+    Engagement is posts_raw score + reply_count; age is measured from the
+    newest post, and every ``half_life_hours`` of age costs as much as halving
+    the engagement. Posts without a timestamp sort last.
+    """
+    engagement = (
+        "(SELECT greatest(coalesce(r.score, 0), 0) + greatest(coalesce(r.reply_count, 0), 0) "
+        "FROM posts_raw r WHERE r.id = c.id)"
+    )
+    age_hours = "date_diff('second', c.dt_utc, (SELECT max(dt_utc) FROM posts_clean)) / 3600.0"
+    return (
+        f"ln(1 + coalesce({engagement}, 0)) - ln(2) * coalesce({age_hours}, 1e9) "
+        f"/ {float(half_life_hours)}"
+    )
+
+
+def stream_query(conn, sql: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    """Run ``sql`` on a fresh cursor and yield the result ``chunk_size`` rows at a time."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(sql)
+        # to_arrow_reader replaces fetch_record_batch in newer DuckDB releases
+        reader = getattr(cursor, "to_arrow_reader", cursor.fetch_record_batch)(chunk_size)
+        for batch in reader:
+            if batch.num_rows:
+                yield batch.to_pandas()
+    finally:
+        cursor.close()
+
+
+def prefetch(batches: Iterator[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+    """Yield from ``batches`` while a side thread reads the next chunk.
+
+    The read overlaps with whatever the caller does to the current chunk.
+    ``stream_query`` reads through its own cursor, so the side thread never
+    shares a cursor with the caller.
+    """
+    batches = iter(batches)
+    try:
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            pending = pool.submit(next, batches, None)
+            while (batch := pending.result()) is not None:
+                pending = pool.submit(next, batches, None)
+                yield batch
+    finally:
+        if hasattr(batches, "close"):
+            batches.close()  # Releases the cursor when the caller stops early
+
+
+def count_clean_posts(conn, skip_done: str | None = None) -> int:
+    """Number of posts a stage will score."""
+    return conn.execute(f"SELECT COUNT(*) {_clean_posts_from(skip_done)}").fetchone()[0]
+
+
+def clean_post_batches(
+    conn,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    skip_done: str | None = None,
+    order_by: str | None = None,
+) -> Iterator[pd.DataFrame]:
+    """(id, text_clean, text_hash) chunks of eligible posts, minus those matching ``skip_done``.
+
+    ``order_by`` is an SQL expression over ``c`` (e.g. ``priority_sql()``);
+    highest first. Without it rows come in storage order.
+    """
+    sql = f"SELECT c.id, c.text_clean, c.text_hash {_clean_posts_from(skip_done)}"
+    if order_by:
+        sql += f" ORDER BY {order_by} DESC, c.id"
+    yield from stream_query(conn, sql, chunk_size)
+
+
+def scored_post_batches(
+    conn, columns: list[str], done: str, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Iterator[pd.DataFrame]:
+    """(id, text_clean, *columns) chunks for posts already scored (``done`` on posts_emotions ``e``)."""
+    cols = ", ".join(f"e.{c}" for c in columns)
+    sql = (
+        f"SELECT c.id, c.text_clean, {cols} FROM posts_clean c "
+        f"JOIN posts_emotions e ON c.id = e.id WHERE {_CLEAN} AND {done}"
+    )
+    yield from stream_query(conn, sql, chunk_size)
+
+
+class ParquetAppender:
+    """Append DataFrame chunks to one Parquet file, one row group per chunk.
+
+    Rows go to ``<name>.partial`` and the file is renamed into place on a clean
+    exit, so an interrupted run never replaces a complete export with a
+    truncated one. Use as a context manager.
+    """
+
+    def __init__(self, path: Path, schema: pa.Schema):
+        self.path = Path(path)
+        self.partial = self.path.with_name(self.path.name + ".partial")
+        self.schema = schema
+        self.rows = 0
+        self._writer = None
+
+    def __enter__(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._writer = pq.ParquetWriter(self.partial, self.schema)
+        return self
+
+    def write(self, df: pd.DataFrame) -> None:
+        table = pa.Table.from_pandas(
+            df[self.schema.names], schema=self.schema, preserve_index=False
+        )
+        self._writer.write_table(table)
+        self.rows += len(df)
+
+    def __exit__(self, exc_type, exc, tb):
+        self._writer.close()
+        if exc_type is None:
+            self.partial.replace(self.path)
+            log.info(f"   Wrote {self.rows} rows to {self.path.name}")
+        else:
+            self.partial.unlink(missing_ok=True)
+
+
+def score_schema(columns: list[str], label_columns: list[str]) -> pa.Schema:
+    """Parquet schema for an export: id, text_clean, float32 scores, string labels."""
+    fields = [pa.field("id", pa.string()), pa.field("text_clean", pa.string())]
+    fields += [pa.field(c, pa.string() if c in label_columns else pa.float32()) for c in columns]
+    return pa.schema(fields)
@@ -0,0 +1,325 @@
+"""
+Topic-model hyperparameter sweep — embed once, reduce once per UMAP setting.
+
+A full ``run_topic_modeling`` per candidate setting repeats embedding, UMAP
+and HDBSCAN every time. The sweep instead:
+
+1. takes the corpus embeddings from the embedding store (embedded at most once)
+2. runs UMAP once per (n_neighbors, n_components, min_dist) and caches the
+   projection on disk, keyed by the corpus and the UMAP parameters
+3. fits HDBSCAN + c-TF-IDF for every (min_topic_size, nr_topics) variant on
+   the cached projections in a process pool
+4. scores every variant and upserts the metrics into the ``topic_sweep``
+   table (and data/exports/topic_sweep.csv):
+
+- ``outlier_rate``: share of posts left in topic -1
+- ``coherence_npmi``: mean NPMI of top-word pairs, from document co-occurrence
+- ``diversity``: unique words among all topics' top words / all top words
+
+Usage:
+    python -m src.analysis.topic_sweep                       # grid from settings
+    python -m src.analysis.topic_sweep --min-topic-size 5 10 20 --n-neighbors 10 15 30
+"""
+
+import argparse
+import hashlib
+import itertools
+import multiprocessing as mp
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from src.analysis.topics import corpus_embeddings, load_posts, stratified_sample
+from src.utils.constants import PROJECT_ROOT
+from src.utils.db import bulk_upsert, get_connection, init_database
+from src.utils.logger import log
+from src.utils.settings import get_setting
+
+CACHE_DIR = PROJECT_ROOT / "data" / "processed" / "topic_sweep"
+RESULTS_PATH = PROJECT_ROOT / "data" / "exports" / "topic_sweep.csv"
+TOP_N = 10  # Top words per topic for coherence and diversity
+UMAP_SEED = 42
+
+DEFAULT_GRID = {
+    "n_neighbors": [15],
+    "n_components": [5],
+    "min_dist": [0.0],
+    "min_topic_size": [5, 10, 20],
+    "nr_topics": ["auto", "none"],
+}
+UMAP_PARAMS = ("n_neighbors", "n_components", "min_dist")
+THREAD_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS", "NUMBA_NUM_THREADS")
+SUMMARY_COLUMNS = ["params_key", "n_topics", "outlier_rate", "coherence_npmi", "diversity"]
+
+_TOKEN = re.compile(r"(?u)\b\w\w+\b")  # CountVectorizer's default token pattern
+
+# Per-process state, set by _init_worker inside each worker
+_worker: dict = {}
+
+
+# ── Metrics ─────────────────────────────────────────────────
+
+
+def topic_diversity(topic_words: list[list[str]]) -> float:
+    """Unique words over all topics' top words (1.0 = no word shared between topics)."""
+    words = [w for ws in topic_words for w in ws]
+    return len(set(words)) / len(words) if words else 0.0
+
+
+def npmi_coherence(topic_words: list[list[str]], doc_tokens: list[set[str]]) -> float:
+    """Mean normalized PMI over each topic's top-word pairs, from document co-occurrence."""
+    vocab = sorted({w for ws in topic_words for w in ws})
+    if not vocab or not doc_tokens:
+        return 0.0
+    column = {w: i for i, w in enumerate(vocab)}
+    present = np.zeros((len(doc_tokens), len(vocab)), dtype=np.float32)
+    for row, tokens in enumerate(doc_tokens):
+        present[row, [column[w] for w in tokens & column.keys()]] = 1.0
+    p = present.mean(axis=0)
+    p_joint = (present.T @ present) / len(doc_tokens)
+
+    scores = []
+    for ws in topic_words:
+        idx = [column[w] for w in ws]
+        for i, j in itertools.combinations(idx, 2):
+            if p_joint[i, j] == 0:
+                scores.append(-1.0)
+            elif p_joint[i, j] == 1:
+                scores.append(1.0)
+            else:
+                pmi = np.log(p_joint[i, j] / (p[i] * p[j]))
+                scores.append(float(pmi / -np.log(p_joint[i, j])))
+    return float(np.mean(scores)) if scores else 0.0
+
+
+# ── Grid ────────────────────────────────────────────────────
+
+
+def sweep_grid(overrides: dict | None = None) -> dict:
+    """Sweep axes: defaults ← settings ``models.bertopic.sweep`` ← ``overrides``."""
+    grid = dict(DEFAULT_GRID)
+    grid.update(get_setting("models", "bertopic", "sweep", default={}) or {})
+    grid.update({k: v for k, v in (overrides or {}).items() if v})
+    grid["nr_topics"] = [str(v).lower() for v in grid["nr_topics"]]
+    return grid
+
+
+def umap_key(params: dict) -> str:
+    return f"nn{params['n_neighbors']}-nc{params['n_components']}-md{params['min_dist']}"
+
+
+def params_key(params: dict, sample_size: int | None = None) -> str:
+    """Row key in ``topic_sweep``; sampled sweeps never overwrite full-corpus metrics."""
+    key = f"{umap_key(params)}-mts{params['min_topic_size']}-nr{params['nr_topics']}"
+    return f"{key}-s{sample_size}" if sample_size else key
+
+
+def _nr_topics(value: str):
+    return None if value == "none" else ("auto" if value == "auto" else int(value))
+
+
+# ── Reductions ──────────────────────────────────────────────
+
+
+def corpus_digest(hashes: list[str]) -> str:
+    """Short digest of the posts a projection was computed for."""
+    return hashlib.sha1("\n".join(hashes).encode()).hexdigest()[:12]
+
+
+def reduce_embeddings(embeddings: np.ndarray, params: dict, digest: str) -> np.ndarray:
+    """UMAP projection of ``embeddings``, cached on disk per corpus digest and UMAP setting."""
+    path = CACHE_DIR / f"{digest}-{umap_key(params)}.npy"
+    if path.exists():
+        log.info(f"Sweep: cached UMAP projection {path.name}")
+        return np.load(path)
+    from umap import UMAP
+
+    start = time.perf_counter()
+    reduced = UMAP(
+        n_neighbors=params["n_neighbors"],
+        n_components=params["n_components"],
+        min_dist=params["min_dist"],
+        metric="cosine",
+        random_state=UMAP_SEED,
+    ).fit_transform(embeddings)
+    log.info(f"Sweep: UMAP {umap_key(params)} in {time.perf_counter() - start:.1f}s")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    np.save(path, reduced.astype(np.float32))
+    return reduced
+
+
+# ── Workers ─────────────────────────────────────────────────
+
+
+@contextmanager
+def worker_threads(threads: int):
+    """Thread-pool limits for processes spawned inside the block.
+
+    BLAS/OpenMP read these when numpy is first imported, which in a spawned
+    worker happens before its initializer runs, so they must already be in
+    the environment the worker inherits. The parent's pools are unaffected.
+    """
+    saved = {var: os.environ.get(var) for var in THREAD_VARS}
+    os.environ.update({var: str(threads) for var in THREAD_VARS})
+    try:
+        yield
+    finally:
+        for var, value in saved.items():
+            if value is None:
+                os.environ.pop(var, None)
+            else:
+                os.environ[var] = value
+
+
+def _init_worker(
+    texts: list[str], projections: dict[str, np.ndarray], sample_size: int | None
+) -> None:
+    """Keep the corpus and projections in the worker for every variant it fits."""
+    _worker.update(
+        texts=texts,
+        sample_size=sample_size,
+        projections=projections,
+        doc_tokens=[set(_TOKEN.findall(t.lower())) for t in texts],
+    )
+
+
+def fit_variant(params: dict) -> dict:
+    """HDBSCAN + c-TF-IDF on a cached projection; returns the variant's metrics row."""
+    from bertopic import BERTopic
+    from bertopic.dimensionality import BaseDimensionalityReduction
+    from hdbscan import HDBSCAN
+
+    texts = _worker["texts"]
+    start = time.perf_counter()
+    model = BERTopic(
+        umap_model=BaseDimensionalityReduction(),  # Embeddings are already reduced
+        hdbscan_model=HDBSCAN(
+            min_cluster_size=params["min_topic_size"],
+            metric="euclidean",
+            cluster_selection_method="eom",
+            prediction_data=True,
+        ),
+        nr_topics=_nr_topics(params["nr_topics"]),
+        top_n_words=TOP_N,
+    )
+    topics, _ = model.fit_transform(texts, embeddings=_worker["projections"][umap_key(params)])
+    fit_seconds = time.perf_counter() - start
+
+    topics = np.asarray(topics)
+    topic_words = [
+        [w for w, _ in model.get_topic(t)[:TOP_N]] for t in sorted(set(topics)) if t != -1
+    ]
+    return {
+        "params_key": params_key(params, _worker["sample_size"]),
+        **params,
+        "n_posts": len(texts),
+        "n_topics": len(topic_words),
+        "outlier_rate": float((topics == -1).mean()),
+        "coherence_npmi": npmi_coherence(topic_words, _worker["doc_tokens"]),
+        "diversity": topic_diversity(topic_words),
+        "fit_seconds": fit_seconds,
+    }
+
+
+# ── Sweep ───────────────────────────────────────────────────
+
+
+def run_sweep(
+    grid: dict | None = None, workers: int | None = None, sample_size: int | None = None
+) -> pd.DataFrame:
+    """Fit every grid variant and store its metrics in the ``topic_sweep`` table."""
+    grid = grid or sweep_grid()
+    workers = workers or max(1, (os.cpu_count() or 2) // 2)
+    init_database()
+    conn = get_connection()
+    df = load_posts(conn)
+    if sample_size and sample_size < len(df):
+        df = df.loc[stratified_sample(df, sample_size)]
+    else:
+        sample_size = None  # The whole corpus
+    if df.empty:
+        log.warning("No posts")
+        conn.close()
+        return pd.DataFrame()
+
+    embeddings = corpus_embeddings(df)
+    digest = corpus_digest(df["text_hash"].tolist())
+    umap_settings = [
+        dict(zip(UMAP_PARAMS, values))
+        for values in itertools.product(*(grid[k] for k in UMAP_PARAMS))
+    ]
+    projections = {umap_key(p): reduce_embeddings(embeddings, p, digest) for p in umap_settings}
+    variants = [
+        {**u, "min_topic_size": mts, "nr_topics": nr}
+        for u in umap_settings
+        for mts in grid["min_topic_size"]
+        for nr in grid["nr_topics"]
+    ]
+    log.info(
+        f"Sweep: {len(variants)} variants over {len(projections)} UMAP projections "
+        f"of {len(df)} posts, {workers} workers"
+    )
+
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    rows = []
+    with (
+        worker_threads(threads),
+        ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=mp.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(df["text_clean"].tolist(), projections, sample_size),
+        ) as pool,
+    ):
+        futures = {pool.submit(fit_variant, v): params_key(v, sample_size) for v in variants}
+        for future in as_completed(futures):
+            try:
+                rows.append(future.result())
+            except Exception as e:
+                log.warning(f"Sweep: {futures[future]} failed ({e})")
+            else:
+                log.info(f"Sweep: {futures[future]} done ({len(rows)}/{len(variants)})")
+
+    results = pd.DataFrame(rows)
+    if results.empty:
+        conn.close()
+        return results
+    results["run_at"] = datetime.now(timezone.utc).replace(tzinfo=None)
+    bulk_upsert(conn, "topic_sweep", results, key="params_key")
+    conn.close()
+
+    results = results.sort_values(["coherence_npmi", "diversity"], ascending=False)
+    RESULTS_PATH.parent.mkdir(parents=True, exist_ok=True)
+    results.to_csv(RESULTS_PATH, index=False)
+    log.info(
+        f"Sweep results written to {RESULTS_PATH}:\n{results[SUMMARY_COLUMNS].head(10).to_string(index=False)}"
+    )
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Topic-model hyperparameter sweep")
+    parser.add_argument("--min-topic-size", type=int, nargs="+")
+    parser.add_argument("--nr-topics", nargs="+", help="'auto', 'none' or topic counts")
+    parser.add_argument("--n-neighbors", type=int, nargs="+")
+    parser.add_argument("--n-components", type=int, nargs="+")
+    parser.add_argument("--min-dist", type=float, nargs="+")
+    parser.add_argument("--workers", type=int, default=None, help="Variant-fitting processes")
+    parser.add_argument(
+        "--sample-size", type=int, default=None, help="Sweep on a stratified sample of posts"
+    )
+    args = parser.parse_args()
+    overrides = {
+        "min_topic_size": args.min_topic_size,
+        "nr_topics": args.nr_topics,
+        "n_neighbors": args.n_neighbors,
+        "n_components": args.n_components,
+        "min_dist": args.min_dist,
+    }
+    run_sweep(sweep_grid(overrides), workers=args.workers, sample_size=args.sample_size)
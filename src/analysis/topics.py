@@ -1,10 +1,50 @@
-"""BERTopic — Dynamic topic modeling with keyword fallback."""
+"""BERTopic — Dynamic topic modeling with keyword fallback.
+
+``fit`` mode refits on every post; ``assign`` mode tags only new posts with
+the saved model so topic ids stay stable between runs, refitting only when
+the new posts stop fitting the model (too many outliers, or drift).
+
+Embeddings come from the on-disk embedding store (src/analysis/embedding_store.py),
+so only texts never embedded before go through MiniLM and refits with other
+hyperparameters skip embedding altogether.
+"""
+
+import argparse
+import re
+import shutil
+import time
 
 import numpy as np
+import pandas as pd
 
+from src.analysis.cleaning import LANGUAGE_STOPWORDS
+from src.analysis.embedding_store import EmbeddingStore
+from src.analysis.model_server import get_client
+from src.analysis.score_cache import text_hashes
+from src.analysis.similar_posts import update_index
 from src.utils.constants import PROJECT_ROOT
-from src.utils.db import get_connection, init_database
+from src.utils.db import bulk_upsert, get_connection, init_database
 from src.utils.logger import log
+from src.utils.settings import get_setting
+
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+MODEL_DIR = PROJECT_ROOT / "data" / "processed" / "bertopic_model"
+TOPIC_COLUMNS = ["id", "topic_id", "topic_label", "topic_prob", "top_terms"]
+MODES = ("fit", "assign")
+EXPORTS_DIR = PROJECT_ROOT / "data" / "exports"
+AGREEMENT_PATH = EXPORTS_DIR / "topic_sample_agreement.csv"
+SLICE_TERMS = 5  # c-TF-IDF terms kept per topic × phase / topic × day slice
+
+# Sample fit (overridable in settings models.bertopic.sample)
+TRANSFORM_BATCH = 20_000  # Posts per transform batch outside the fitted sample
+SAMPLE_SEED = 42
+
+# Assign-mode refit triggers (overridable in settings models.bertopic.assign)
+ASSIGN_MIN_POSTS = 50  # Fewer new posts than this never trigger a refit
+MAX_OUTLIER_SHARE = 0.35
+MAX_DRIFT = 0.25
+
+_embedder = None
 
 KEYWORD_TOPICS = {
     0: {
@@ -69,88 +109,476 @@ KEYWORD_TOPICS = {
 }
 
 
-def _fallback_topic(text: str) -> tuple:
-    tl = (text or "").lower()
-    best_id, best_score = -1, 0
-    for tid, info in KEYWORD_TOPICS.items():
-        score = sum(1 for k in info["kw"] if k in tl)
-        if score > best_score:
-            best_score, best_id = score, tid
-    if best_id >= 0:
-        i = KEYWORD_TOPICS[best_id]
-        return best_id, min(best_score / 5, 1.0), i["kw"][:5], i["label"]
-    return -1, 0.0, ["outlier"], "Outlier"
+def _get_embedder():
+    """Lazy-load the MiniLM sentence embedder."""
+    global _embedder
+    if _embedder is None:
+        from sentence_transformers import SentenceTransformer
 
+        _embedder = SentenceTransformer(EMBEDDING_MODEL)
+        log.info(f"Sentence embedder loaded ({EMBEDDING_MODEL})")
+    return _embedder
 
-def run_topic_modeling(min_topic_size: int = 5, nr_topics: str = "auto"):
-    log.info("Starting BERTopic topic modeling")
-    init_database()
-    conn = get_connection()
-    df = conn.execute(
-        "SELECT id, text_clean, phase, platform FROM posts_clean "
-        "WHERE is_duplicate=false AND quality_flag='ok' AND word_count>=5"
-    ).fetchdf()
-    if df.empty:
-        log.warning("No posts")
-        conn.close()
-        return
 
-    try:
-        from bertopic import BERTopic
-        from sentence_transformers import SentenceTransformer
+def _keyword_matcher() -> tuple[re.Pattern, pd.Series]:
+    """One word-bounded regex over all topic keywords, plus each keyword's expansion.
+
+    The regex reports only the longest keyword at a position, so a multi-word
+    keyword also counts for the keywords inside it ("know your rights" → "rights").
+    """
+    keywords = [k for info in KEYWORD_TOPICS.values() for k in info["kw"]]
+    alternation = "|".join(re.escape(k) for k in sorted(keywords, key=len, reverse=True))
+    pattern = re.compile(rf"\b(?:{alternation})\b")
+
+    def inside(k: str) -> list[str]:
+        return [sub for sub in keywords if sub != k and re.search(rf"\b{re.escape(sub)}\b", k)]
+
+    return pattern, pd.Series({k: [k, *inside(k)] for k in keywords})
+
+
+_KEYWORD_RE, _KEYWORD_EXPANDS = _keyword_matcher()
+_KEYWORD_TOPIC = {k: tid for tid, info in KEYWORD_TOPICS.items() for k in info["kw"]}
+
+
+def keyword_topics(texts: pd.Series) -> pd.DataFrame:
+    """Keyword topic per text: the topic with most distinct keyword hits (earliest on ties).
+
+    Returns topic_id / topic_prob / top_terms / topic_label columns aligned with
+    ``texts``; texts without a hit are outliers (-1).
+    """
+    texts = texts.reset_index(drop=True)
+    hits = texts.fillna("").astype(str).str.lower().str.findall(_KEYWORD_RE).explode().dropna()
+    hits = hits.map(_KEYWORD_EXPANDS).explode()
+    pairs = pd.DataFrame({"row": hits.index, "kw": hits.to_numpy()}).drop_duplicates()
+
+    topic_ids = np.array(list(KEYWORD_TOPICS))
+    column = {tid: i for i, tid in enumerate(topic_ids)}
+    scores = np.zeros((len(texts), len(topic_ids)), dtype=np.int32)
+    np.add.at(scores, (pairs["row"].to_numpy(), pairs["kw"].map(_KEYWORD_TOPIC).map(column)), 1)
+
+    best = scores.max(axis=1)
+    topic = np.where(best > 0, topic_ids[scores.argmax(axis=1)], -1)
+    terms = {tid: info["kw"][:5] for tid, info in KEYWORD_TOPICS.items()} | {-1: ["outlier"]}
+    labels = {tid: info["label"] for tid, info in KEYWORD_TOPICS.items()} | {-1: "Outlier"}
+    return pd.DataFrame(
+        {
+            "topic_id": topic,
+            "topic_prob": np.minimum(best / 5, 1.0),
+            "top_terms": [terms[t] for t in topic],
+            "topic_label": [labels[t] for t in topic],
+        }
+    )
+
 
-        model = BERTopic(
-            embedding_model=SentenceTransformer("all-MiniLM-L6-v2"),
-            min_topic_size=min_topic_size,
-            verbose=True,
-            calculate_probabilities=True,
+def embed_texts(texts: list[str]) -> np.ndarray:
+    """MiniLM embeddings, from the warm model server when one is running."""
+    client = get_client()
+    if client is not None:
+        return client.embed(texts)
+    return np.asarray(_get_embedder().encode(texts), dtype=np.float32)
+
+
+def corpus_embeddings(df, store: EmbeddingStore | None = None) -> np.ndarray:
+    """Embeddings for ``df.text_clean``, embedding only texts missing from the store."""
+    own_store = store is None
+    if own_store:
+        store = EmbeddingStore(EMBEDDING_MODEL)
+    embeddings = store.get_or_embed(text_hashes(df), df["text_clean"].tolist(), embed_texts)
+    if own_store:
+        log.info(store.report())
+    return embeddings
+
+
+def stratified_sample(df: pd.DataFrame, size: int, seed: int = SAMPLE_SEED) -> pd.Index:
+    """Labels of about ``size`` rows of ``df``, drawn proportionally per phase × platform.
+
+    Every stratum keeps at least one post, so rare phase/platform combinations
+    still shape the topics.
+    """
+    if len(df) <= size:
+        return df.index
+    rng = np.random.default_rng(seed)
+    frac = size / len(df)
+    picked = [
+        rng.choice(labels, max(1, round(len(labels) * frac)), replace=False)
+        for labels in df.groupby(["phase", "platform"], dropna=False).groups.values()
+    ]
+    return pd.Index(np.concatenate(picked)).sort_values()
+
+
+def transform_batches(model, df: pd.DataFrame, store: EmbeddingStore, batch_size: int):
+    """``model.transform`` over ``df`` in batches of ``batch_size`` posts (topics, probs)."""
+    topics, probs = [], []
+    for start in range(0, len(df), batch_size):
+        part = df.iloc[start : start + batch_size]
+        t, p = model.transform(
+            part["text_clean"].tolist(), embeddings=corpus_embeddings(part, store)
         )
-        topics, probs = model.fit_transform(df["text_clean"].tolist())
-        df["topic_id"] = topics
-        df["topic_prob"] = [
-            float(p.max()) if isinstance(p, np.ndarray) else float(p) for p in probs
-        ]
-        term_map = {}
-        for t in set(topics):
-            if t == -1:
-                term_map[-1] = ["outlier"]
-                continue
-            terms = model.get_topic(t)
-            term_map[t] = [x[0] for x in terms[:10]] if terms else ["unknown"]
-        df["top_terms"] = df["topic_id"].map(lambda t: term_map.get(t, []))
-        df["topic_label"] = df["topic_id"].map(
-            lambda t: f"Topic_{t}: {', '.join(term_map.get(t, [])[:3])}"
+        topics.extend(t)
+        probs.extend(p)
+    return topics, probs
+
+
+def adjusted_rand_index(a, b) -> float:
+    """Adjusted Rand index between two labelings of the same posts (1.0 = identical)."""
+    table = pd.crosstab(np.asarray(a), np.asarray(b)).to_numpy().astype(float)
+    pairs = lambda x: (x * (x - 1) / 2).sum()  # noqa: E731
+    together = pairs(table)
+    rows, cols, total = pairs(table.sum(axis=1)), pairs(table.sum(axis=0)), pairs(table.sum())
+    expected = rows * cols / total if total else 0.0
+    best = (rows + cols) / 2
+    return 1.0 if best == expected else float((together - expected) / (best - expected))
+
+
+def topic_drift(new_topics, old_topics) -> float:
+    """Total variation distance between two topic-share distributions (outliers excluded)."""
+    new = pd.Series(new_topics)
+    old = pd.Series(old_topics)
+    new, old = new[new != -1], old[old != -1]
+    if new.empty or old.empty:
+        return 0.0
+    shares = pd.concat(
+        [new.value_counts(normalize=True), old.value_counts(normalize=True)], axis=1
+    ).fillna(0.0)
+    return float(0.5 * (shares.iloc[:, 0] - shares.iloc[:, 1]).abs().sum())
+
+
+def needs_refit(new_topics, old_topics, thresholds: dict | None = None) -> str | None:
+    """Why a full refit is due after assigning ``new_topics`` (None when assignment holds up)."""
+    thresholds = thresholds or get_setting("models", "bertopic", "assign", default={}) or {}
+    new = np.asarray(new_topics)
+    if len(new) < thresholds.get("min_posts", ASSIGN_MIN_POSTS):
+        return None
+    outliers = float((new == -1).mean())
+    max_outliers = thresholds.get("max_outlier_share", MAX_OUTLIER_SHARE)
+    if outliers > max_outliers:
+        return f"outlier share {outliers:.0%} > {max_outliers:.0%}"
+    drift = topic_drift(new, old_topics)
+    max_drift = thresholds.get("max_drift", MAX_DRIFT)
+    if drift > max_drift:
+        return f"topic drift {drift:.2f} > {max_drift:.2f}"
+    return None
+
+
+def _label_bertopic(df: pd.DataFrame, model, topics, probs) -> None:
+    df["topic_id"] = topics
+    df["topic_prob"] = [float(p.max()) if isinstance(p, np.ndarray) else float(p) for p in probs]
+    term_map = {}
+    for t in set(topics):
+        if t == -1:
+            term_map[-1] = ["outlier"]
+            continue
+        terms = model.get_topic(t)
+        term_map[t] = [x[0] for x in terms[:10]] if terms else ["unknown"]
+    df["top_terms"] = df["topic_id"].map(lambda t: term_map.get(t, []))
+    df["topic_label"] = df["topic_id"].map(
+        lambda t: f"Topic_{t}: {', '.join(term_map.get(t, [])[:3])}"
+    )
+
+
+def _label_keywords(df: pd.DataFrame) -> None:
+    results = keyword_topics(df["text_clean"])
+    for col in results.columns:
+        df[col] = results[col].to_numpy()
+
+
+def sample_settings() -> dict:
+    """Sample-fit settings (``models.bertopic.sample``); size None means fit on everything."""
+    cfg = get_setting("models", "bertopic", "sample", default={}) or {}
+    return {
+        "size": cfg.get("size"),
+        "batch_size": cfg.get("batch_size", TRANSFORM_BATCH),
+        "seed": cfg.get("seed", SAMPLE_SEED),
+    }
+
+
+def fit_bertopic(df: pd.DataFrame, min_topic_size: int, sample_size: int | None = None):
+    """Fit BERTopic on ``df`` or a stratified sample of it; the rest is assigned in batches.
+
+    Returns (model, topics, probs, timings) with topics/probs in ``df`` row order.
+    """
+    from bertopic import BERTopic
+
+    cfg = sample_settings()
+    store = EmbeddingStore(EMBEDDING_MODEL)
+    sample = stratified_sample(df, sample_size, cfg["seed"]) if sample_size else df.index
+    fitted, rest = df.loc[sample], df.drop(index=sample)
+    model = BERTopic(
+        embedding_model=None,
+        min_topic_size=min_topic_size,
+        verbose=True,
+        calculate_probabilities=True,
+    )
+    start = time.perf_counter()
+    topics, probs = model.fit_transform(
+        fitted["text_clean"].tolist(), embeddings=corpus_embeddings(fitted, store)
+    )
+    timings = {"fit_seconds": time.perf_counter() - start, "fit_posts": len(fitted)}
+    start = time.perf_counter()
+    rest_topics, rest_probs = transform_batches(model, rest, store, cfg["batch_size"])
+    timings |= {"assign_seconds": time.perf_counter() - start, "assign_posts": len(rest)}
+    log.info(store.report())
+
+    by_label = dict(zip(fitted.index, zip(topics, probs))) | dict(
+        zip(rest.index, zip(rest_topics, rest_probs))
+    )
+    ordered = [by_label[label] for label in df.index]
+    return model, [t for t, _ in ordered], [p for _, p in ordered], timings
+
+
+def fit_topics(df: pd.DataFrame, min_topic_size: int, sample_size: int | None = None) -> None:
+    """Fit BERTopic on ``df`` (keyword fallback if that fails) and save the model.
+
+    With ``sample_size`` the model is fit on a stratified sample and every
+    other post is assigned with ``transform`` in streamed batches.
+    """
+    try:
+        model, topics, probs, timings = fit_bertopic(df, min_topic_size, sample_size)
+        log.info(
+            f"Topic fit on {timings['fit_posts']} posts: {timings['fit_seconds']:.1f}s; "
+            f"{timings['assign_posts']} more assigned in {timings['assign_seconds']:.1f}s"
         )
-        model.save(str(PROJECT_ROOT / "data/processed/bertopic_model"))
+        _label_bertopic(df, model, topics, probs)
+        model.save(str(MODEL_DIR))
     except Exception as e:
         log.warning(f"BERTopic failed ({e}), using keyword fallback")
-        results = df["text_clean"].apply(_fallback_topic)
-        df["topic_id"] = results.apply(lambda x: x[0])
-        df["topic_prob"] = results.apply(lambda x: x[1])
-        df["top_terms"] = results.apply(lambda x: x[2])
-        df["topic_label"] = results.apply(lambda x: x[3])
-
-    conn.execute("DELETE FROM posts_topics")
-    for _, r in df.iterrows():
-        conn.execute(
-            "INSERT INTO posts_topics VALUES (?,?,?,?,?)",
-            [
-                r["id"],
-                int(r["topic_id"]),
-                r["topic_label"],
-                float(r["topic_prob"]),
-                r["top_terms"] if isinstance(r["top_terms"], list) else [],
-            ],
-        )
+        _label_keywords(df)
+        # A model saved by an earlier fit no longer matches the stored topics
+        if MODEL_DIR.is_dir():
+            shutil.rmtree(MODEL_DIR)
+        else:
+            MODEL_DIR.unlink(missing_ok=True)
+
+
+def compare_sample_fit(df: pd.DataFrame, min_topic_size: int, sample_size: int) -> pd.DataFrame:
+    """Timings and topic agreement (adjusted Rand index) of a sample fit against a full fit."""
+    _, sample_topics, _, sampled = fit_bertopic(df, min_topic_size, sample_size)
+    _, full_topics, _, full = fit_bertopic(df, min_topic_size)
+    sample_topics, full_topics = np.asarray(sample_topics), np.asarray(full_topics)
+    report = pd.DataFrame(
+        [
+            {
+                "n_posts": len(df),
+                "sample_size": sampled["fit_posts"],
+                "sample_fit_seconds": round(sampled["fit_seconds"], 2),
+                "sample_assign_seconds": round(sampled["assign_seconds"], 2),
+                "full_fit_seconds": round(full["fit_seconds"], 2),
+                "adjusted_rand_index": round(adjusted_rand_index(sample_topics, full_topics), 4),
+                "outlier_agreement": round(
+                    float(((sample_topics == -1) == (full_topics == -1)).mean()), 4
+                ),
+            }
+        ]
+    )
+    AGREEMENT_PATH.parent.mkdir(parents=True, exist_ok=True)
+    report.to_csv(AGREEMENT_PATH, index=False)
+    log.info(f"Sample-fit agreement written to {AGREEMENT_PATH}:\n{report.T.to_string()}")
+    return report
+
+
+def assign_topics(df: pd.DataFrame) -> None:
+    """Assign ``df`` to the saved model's topics (``MODEL_DIR`` must exist)."""
+    from bertopic import BERTopic
+
+    model = BERTopic.load(str(MODEL_DIR))
+    store = EmbeddingStore(EMBEDDING_MODEL)
+    topics, probs = transform_batches(model, df, store, sample_settings()["batch_size"])
+    log.info(store.report())
+    _label_bertopic(df, model, topics, probs)
+
+
+_TERM = re.compile(r"[a-z][a-z']+")
+# Function words that would otherwise top every slice's term list
+_STOPWORDS = LANGUAGE_STOPWORDS["en"] | set(
+    "a i me my our us your he she him his her them their its it's i'm don't can will would "
+    "could should there here all if as do does did been being had than then when who "
+    "one get got like more no out up how why into over some only also very".split()
+)
+
+
+def ctfidf_terms(docs: pd.DataFrame, keys: list[str], top_n: int = SLICE_TERMS) -> pd.Series:
+    """Top c-TF-IDF terms per class, i.e. per group of ``docs`` sharing ``keys``.
+
+    BERTopic's class-based weighting: a term's frequency within the class times
+    log(1 + average class size in words / the term's frequency over all classes).
+    """
+    docs = docs.reset_index(drop=True)
+    tokens = docs["text_clean"].fillna("").str.lower().str.findall(_TERM).explode().dropna()
+    tokens = tokens[~tokens.isin(_STOPWORDS)]
+    if tokens.empty:
+        return pd.Series(dtype=object)
+    counts = (
+        docs.loc[tokens.index, keys]
+        .assign(term=tokens.to_numpy())
+        .groupby([*keys, "term"], dropna=False)
+        .size()
+        .rename("n")
+        .reset_index()
+    )
+    class_words = counts.groupby(keys, dropna=False)["n"].transform("sum")
+    term_words = counts.groupby("term")["n"].transform("sum")
+    avg_words = counts["n"].sum() / counts.groupby(keys, dropna=False).ngroups
+    counts["weight"] = counts["n"] / class_words * np.log1p(avg_words / term_words)
+    top = counts.sort_values(["weight", "term"], ascending=[False, True])
+    return top.groupby(keys, dropna=False).head(top_n).groupby(keys, dropna=False)["term"].agg(list)
+
+
+def topic_slices(df: pd.DataFrame, by: str) -> pd.DataFrame:
+    """Topic × ``by`` counts, each topic's share of the slice's posts, and slice c-TF-IDF terms."""
+    counts = (
+        df.groupby(["topic_id", "topic_label", by], dropna=False)
+        .size()
+        .rename("n_posts")
+        .reset_index()
+    )
+    counts["share"] = counts["n_posts"] / counts.groupby(by, dropna=False)["n_posts"].transform(
+        "sum"
+    )
+    terms = ctfidf_terms(df, ["topic_id", by]).rename("terms").reset_index()
+    out = counts.merge(terms, on=["topic_id", by], how="left")
+    out["terms"] = out["terms"].map(lambda t: t if isinstance(t, list) else [])
+    return out.sort_values([by, "n_posts"], ascending=[True, False]).reset_index(drop=True)
+
+
+def export_topics_over_time(conn) -> None:
+    """Write topic × phase and topic × day aggregates for the dashboard's Themes tab."""
+    df = conn.execute(
+        """
+        SELECT t.topic_id, t.topic_label, c.phase,
+               CAST(timezone('UTC', c.dt_utc) AS DATE) AS date, c.text_clean
+        FROM posts_topics t JOIN posts_clean c ON c.id = t.id
+        """
+    ).fetchdf()
+    if df.empty:
+        return
+    EXPORTS_DIR.mkdir(parents=True, exist_ok=True)
+    by_phase = topic_slices(df, "phase")
+    by_day = topic_slices(df.dropna(subset=["date"]), "date")
+    by_phase.to_parquet(EXPORTS_DIR / "topics_over_time_phase.parquet", index=False)
+    by_day.to_parquet(EXPORTS_DIR / "topics_over_time_day.parquet", index=False)
+    log.info(f"Topics over time: {len(by_phase)} topic × phase and {len(by_day)} topic × day rows")
+
+
+def _write_topics(conn, df: pd.DataFrame, replace: bool) -> None:
+    df["topic_id"] = df["topic_id"].astype(int)
+    df["topic_prob"] = df["topic_prob"].astype(float)
+    df["top_terms"] = df["top_terms"].map(lambda t: t if isinstance(t, list) else [])
+    if replace:
+        conn.execute("DELETE FROM posts_topics")
+    bulk_upsert(conn, "posts_topics", df, columns=TOPIC_COLUMNS)
 
     out = PROJECT_ROOT / "data/processed"
     out.mkdir(parents=True, exist_ok=True)
-    df[["id", "topic_id", "topic_label", "topic_prob", "top_terms"]].to_parquet(
-        out / "topics.parquet", index=False
-    )
+    conn.execute(
+        f"SELECT {', '.join(TOPIC_COLUMNS)} FROM posts_topics ORDER BY id"
+    ).fetchdf().to_parquet(out / "topics.parquet", index=False)
+    export_topics_over_time(conn)
+    try:
+        update_index()
+    except Exception as e:
+        log.warning(f"Similar-posts index not updated ({e})")
+
+
+def load_posts(conn, untagged_only: bool = False) -> pd.DataFrame:
+    """Posts eligible for topic modeling (optionally only those without a topic yet)."""
+    where = "WHERE is_duplicate=false AND quality_flag='ok' AND word_count>=5"
+    if untagged_only:
+        where += " AND id NOT IN (SELECT id FROM posts_topics)"
+    return conn.execute(
+        f"SELECT id, text_clean, text_hash, phase, platform FROM posts_clean {where}"
+    ).fetchdf()
+
+
+def run_topic_modeling(
+    min_topic_size: int = 5,
+    nr_topics: str = "auto",
+    mode: str | None = None,
+    sample_size: int | None = None,
+    compare_full: bool = False,
+):
+    """Topic-tag posts.
+
+    ``mode='fit'`` refits BERTopic on every eligible post and replaces posts_topics.
+    ``mode='assign'`` tags only posts without a posts_topics row using the saved
+    model, so existing topic ids and labels stay put; it falls back to a full
+    refit when there is no usable saved model, or when the new posts' outlier
+    share or topic drift passes the ``models.bertopic.assign`` thresholds.
+
+    ``sample_size`` (default ``models.bertopic.sample.size``) fits on a stratified
+    sample of that many posts and assigns the rest in batches; ``compare_full``
+    only writes the sample-vs-full-fit timing and agreement report.
+    """
+    mode = mode or get_setting("models", "bertopic", "mode", default="fit")
+    sample_size = sample_size or sample_settings()["size"]
+    if mode not in MODES:
+        raise ValueError(f"Unknown topic mode '{mode}' (expected one of {MODES})")
+    log.info(f"Starting BERTopic topic modeling ({mode})")
+    init_database()
+    conn = get_connection()
+    df = load_posts(conn, untagged_only=mode == "assign")
+    if df.empty:
+        log.warning("No posts" if mode == "fit" else "No untagged posts")
+        conn.close()
+        return
+
+    if mode == "assign":
+        old_topics = conn.execute("SELECT topic_id FROM posts_topics").fetchdf()["topic_id"]
+        if not MODEL_DIR.exists():
+            reason = "no saved model"
+        else:
+            try:
+                assign_topics(df)
+                reason = needs_refit(df["topic_id"], old_topics)
+            except Exception as e:
+                reason = f"saved model unusable ({e})"
+        if reason is None:
+            _write_topics(conn, df, replace=False)
+            log.info(f"Topic assignment complete: {len(df)} new posts tagged")
+            conn.close()
+            return
+        log.warning(f"Topic assignment: {reason}, refitting")
+        conn.close()
+        return run_topic_modeling(min_topic_size, nr_topics, mode="fit", sample_size=sample_size)
+
+    if compare_full:
+        if not sample_size:
+            raise ValueError("compare_full needs a sample size")
+        compare_sample_fit(df, min_topic_size, sample_size)
+        conn.close()
+        return
+
+    fit_topics(df, min_topic_size, sample_size)
+    _write_topics(conn, df, replace=True)
     log.info(f"Topic modeling complete: {df['topic_label'].value_counts().head(5).to_dict()}")
     conn.close()
 
 
 if __name__ == "__main__":
-    run_topic_modeling()
+    parser = argparse.ArgumentParser(description="BERTopic topic modeling")
+    parser.add_argument("--min-topic-size", type=int, default=5)
+    parser.add_argument(
+        "--mode",
+        choices=MODES,
+        default=None,
+        help="fit: refit on all posts; assign: tag only new posts with the saved model "
+        "(default: models.bertopic.mode in settings)",
+    )
+    parser.add_argument(
+        "--sample-size",
+        type=int,
+        default=None,
+        help="Fit on a stratified phase x platform sample of this many posts, "
+        "assign the rest in batches (default: models.bertopic.sample.size)",
+    )
+    parser.add_argument(
+        "--compare-full",
+        action="store_true",
+        help="Only report sample-fit vs full-fit timings and topic agreement",
+    )
+    args = parser.parse_args()
+    run_topic_modeling(
+        min_topic_size=args.min_topic_size,
+        mode=args.mode,
+        sample_size=args.sample_size,
+        compare_full=args.compare_full,
+    )
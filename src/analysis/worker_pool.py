@@ -0,0 +1,189 @@
+"""
+Sharded multi-process inference — one hot model copy per worker process.
+
+Texts are split into shards over contiguous ranges of their sorted key (the
+text hash), and the pool's task queue hands each shard to whichever worker
+is free. Workers are spawned processes that pin torch (and ONNX Runtime) to
+a fixed number of intra-op threads, load the model once in their
+initializer and keep it for every shard. The parent writes each finished
+shard to its own staging table and merges them when all shards are in. On
+the ONNX backends the parent exports the model before spawning, so workers
+only ever load the cached export.
+
+Spawn rather than fork keeps workers independent of the parent's torch and
+OpenMP thread pools. Rule of thumb: workers × threads_per_worker = physical
+cores, with 4–8 threads per worker on a large box.
+"""
+
+import math
+import multiprocessing as mp
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from src.analysis.cleaning import compute_text_hash
+from src.analysis.onnx_backend import export_onnx, get_backend
+from src.utils.db import bulk_insert
+from src.utils.logger import log
+
+MODELS = ("roberta", "goemotions")
+SHARDS_PER_WORKER = 4  # More shards than workers keeps the queue busy until the end
+MIN_SHARD_SIZE = 64
+
+# Per-process state, set by _init_worker inside each worker
+_worker: dict = {}
+
+
+def _model_fns(model: str):
+    """(loader, proba) functions for a model name."""
+    if model == "roberta":
+        from src.analysis.sentiment import _get_roberta, roberta_proba
+
+        return _get_roberta, roberta_proba
+    if model == "goemotions":
+        from src.analysis.emotions import _get_pipeline, emotion_proba
+
+        return _get_pipeline, emotion_proba
+    raise ValueError(f"Unknown model '{model}'. Choose from: {', '.join(MODELS)}")
+
+
+def _model_name(model: str) -> str:
+    """Hugging Face model id behind a pool model name."""
+    if model == "roberta":
+        from src.analysis.sentiment import ROBERTA_MODEL
+
+        return ROBERTA_MODEL
+    from src.analysis.emotions import GOEMOTIONS_MODEL
+
+    return GOEMOTIONS_MODEL
+
+
+def _init_worker(model: str, backend: str, threads: int) -> None:
+    """Pin thread counts, then load the model once for the life of the worker."""
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    import torch
+
+    torch.set_num_threads(threads)
+    torch.set_num_interop_threads(1)
+    loader, proba = _model_fns(model)
+    loader(backend)
+    _worker.update(proba=proba, backend=backend)
+
+
+def _score_shard(shard_no: int, texts: list[str]) -> tuple[int, np.ndarray]:
+    return shard_no, _worker["proba"](texts, backend=_worker["backend"])
+
+
+def default_threads(workers: int) -> int:
+    """Intra-op threads per worker so that the pool covers every core once."""
+    return max(1, (os.cpu_count() or 1) // workers)
+
+
+def plan_shards(keys: list[str], shard_size: int) -> list[np.ndarray]:
+    """Positions of ``keys`` split into contiguous ranges of the sorted keys."""
+    order = np.argsort(np.asarray(keys, dtype=object), kind="stable")
+    return [order[i : i + shard_size] for i in range(0, len(order), shard_size)]
+
+
+class InferencePool:
+    """Process pool of ``workers`` model copies. Use as a context manager."""
+
+    def __init__(
+        self,
+        model: str,
+        backend: str | None = None,
+        workers: int = 2,
+        threads_per_worker: int | None = None,
+    ):
+        _model_fns(model)  # Validate the name before spawning anything
+        self.model = model
+        self.backend = get_backend(backend)
+        self.workers = workers
+        self.threads = threads_per_worker or default_threads(workers)
+        self._executor = None
+
+    def __enter__(self):
+        if self.backend in ("onnx", "onnx-int8"):
+            # Once here, not once per worker racing on the same files
+            export_onnx(_model_name(self.model), quantize=self.backend == "onnx-int8")
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=mp.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.model, self.backend, self.threads),
+        )
+        log.info(
+            f"Inference pool: {self.workers} {self.model} workers × "
+            f"{self.threads} threads ({self.backend})"
+        )
+        return self
+
+    def __exit__(self, *exc):
+        self._executor.shutdown()
+        self._executor = None
+
+    def _staging_tables(self, conn) -> list[str]:
+        return [
+            r[0]
+            for r in conn.execute(
+                "SELECT table_name FROM information_schema.tables WHERE table_name LIKE ?",
+                [f"staging_{self.model}_%"],
+            ).fetchall()
+        ]
+
+    def _drop_staging(self, conn) -> None:
+        for table in self._staging_tables(conn):
+            conn.execute(f"DROP TABLE {table}")
+
+    def score(
+        self,
+        conn,
+        texts: list[str],
+        keys: list[str] | None = None,
+        shard_size: int | None = None,
+    ) -> np.ndarray:
+        """Probabilities for ``texts`` (input order), scored shard by shard across the pool.
+
+        ``keys`` (default: text hashes) define the shard ranges and key the
+        staging tables in ``conn``; the staging tables are dropped after the merge.
+        """
+        if self._executor is None:
+            raise RuntimeError("InferencePool must be entered (with InferencePool(...) as pool)")
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        keys = keys or [compute_text_hash(t) for t in texts]
+        if shard_size is None:
+            shard_size = max(
+                MIN_SHARD_SIZE, math.ceil(len(texts) / (self.workers * SHARDS_PER_WORKER))
+            )
+        shards = plan_shards(keys, shard_size)
+
+        self._drop_staging(conn)  # Leftovers from an interrupted run
+        futures = [
+            self._executor.submit(_score_shard, n, [texts[i] for i in idx])
+            for n, idx in enumerate(shards)
+        ]
+        for done, future in enumerate(as_completed(futures), 1):
+            shard_no, probs = future.result()
+            idx = shards[shard_no]
+            table = f"staging_{self.model}_{shard_no:04d}"
+            conn.execute(f"CREATE TABLE {table} (key VARCHAR, scores FLOAT[])")
+            bulk_insert(
+                conn,
+                table,
+                pd.DataFrame(
+                    {"key": [keys[i] for i in idx], "scores": [r.tolist() for r in probs]}
+                ),
+            )
+            log.info(f"   {self.model} shard {done}/{len(shards)} staged ({len(idx)} texts)")
+
+        # Merge every staged shard back into input order
+        merged = conn.execute(
+            " UNION ALL ".join(f"SELECT key, scores FROM {t}" for t in self._staging_tables(conn))
+        ).fetchall()
+        self._drop_staging(conn)
+        by_key = {k: s for k, s in merged}
+        return np.asarray([by_key[k] for k in keys], dtype=np.float32)
@@ -0,0 +1,103 @@
+"""
+Write-path benchmarks — row-by-row statements vs the set-based helpers in src.utils.db.
+
+Usage:
+    python -m src.utils.benchmarks --rows 20000
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.utils.constants import TARGET_EMOTIONS
+from src.utils.db import bulk_update, bulk_upsert, get_connection, init_database
+from src.utils.logger import log
+
+EMOTION_COLUMNS = [f"emo_{e}" for e in TARGET_EMOTIONS]
+
+
+def _synthetic_scores(n_rows: int, seed: int = 42) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame(rng.random((n_rows, len(EMOTION_COLUMNS))), columns=EMOTION_COLUMNS)
+    df.insert(0, "id", [f"bench_{i}" for i in range(n_rows)])
+    df["dominant_emotion"] = rng.choice(TARGET_EMOTIONS, n_rows)
+    return df
+
+
+def _row_by_row_upsert(conn, df: pd.DataFrame, cols: list[str]) -> None:
+    """The per-row UPDATE/INSERT pattern the analysis stages used before bulk writes."""
+    existing = set(conn.execute("SELECT id FROM posts_emotions").fetchdf()["id"])
+    for _, r in df.iterrows():
+        vals = [r[c] for c in cols]
+        if r["id"] in existing:
+            conn.execute(
+                f"UPDATE posts_emotions SET {', '.join(f'{c}=?' for c in cols)} WHERE id=?",
+                vals + [r["id"]],
+            )
+        else:
+            conn.execute(
+                f"INSERT INTO posts_emotions (id, {', '.join(cols)}) VALUES (?{', ?' * len(cols)})",
+                [r["id"]] + vals,
+            )
+
+
+def _row_by_row_update(conn, df: pd.DataFrame) -> None:
+    for _, r in df.iterrows():
+        conn.execute("UPDATE posts_clean SET phase=? WHERE id=?", [r["phase"], r["id"]])
+
+
+def benchmark_bulk_writes(n_rows: int = 20000) -> pd.DataFrame:
+    """Rows/sec for inserting, re-upserting and updating ``n_rows`` rows, per write method."""
+    df = _synthetic_scores(n_rows)
+    cols = EMOTION_COLUMNS + ["dominant_emotion"]
+    phases = pd.DataFrame({"id": df["id"], "phase": "post_week1"})
+
+    methods = {
+        "row_by_row": (
+            lambda conn: _row_by_row_upsert(conn, df, cols),
+            lambda conn: _row_by_row_update(conn, phases),
+        ),
+        "bulk": (
+            lambda conn: bulk_upsert(conn, "posts_emotions", df, key="id", columns=cols),
+            lambda conn: bulk_update(conn, "posts_clean", phases, key="id"),
+        ),
+    }
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, (upsert, update) in methods.items():
+            db = Path(tmp) / f"{name}.duckdb"
+            init_database(db)
+            conn = get_connection(db)
+            conn.execute("INSERT INTO posts_clean (id) SELECT id FROM df")
+
+            for step, fn in [("insert", upsert), ("upsert_existing", upsert), ("update", update)]:
+                start = time.perf_counter()
+                fn(conn)
+                elapsed = time.perf_counter() - start
+                rows.append(
+                    {
+                        "method": name,
+                        "step": step,
+                        "rows": n_rows,
+                        "seconds": round(elapsed, 3),
+                        "rows_per_sec": round(n_rows / elapsed),
+                    }
+                )
+            conn.close()
+
+    result = pd.DataFrame(rows)
+    log.info(f"Bulk write benchmark ({n_rows} rows):\n{result.to_string(index=False)}")
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark row-by-row vs set-based writes")
+    parser.add_argument("--rows", type=int, default=20000, help="Rows written per step")
+    args = parser.parse_args()
+
+    benchmark_bulk_writes(args.rows)
@@ -3,6 +3,7 @@ DuckDB connection manager and schema initialization.
 """
 
 import os
+import uuid
 from pathlib import Path
 
 import duckdb
@@ -25,6 +26,7 @@ POSTS_CLEAN_COLUMNS = [
     ("dt_utc", "TIMESTAMP WITH TIME ZONE"),
     ("text_original", "VARCHAR"),
     ("text_clean", "VARCHAR"),
+    ("text_hash", "VARCHAR"),
     ("text_tokens", "VARCHAR[]"),
     ("text_lemmas", "VARCHAR[]"),
     ("word_count", "INTEGER"),
@@ -35,29 +37,40 @@ POSTS_CLEAN_COLUMNS = [
     ("quality_flag", "VARCHAR DEFAULT 'ok'"),
 ]
 
+# Columns added to posts_emotions after its first release
+POSTS_EMOTIONS_COLUMNS = [
+    ("score_tier", "VARCHAR"),
+]
 
-def _ensure_posts_clean_columns(conn: duckdb.DuckDBPyConnection) -> None:
-    """Add missing columns to posts_clean for DBs created with an older schema."""
+
+def _ensure_columns(conn: duckdb.DuckDBPyConnection, table: str, columns: list) -> None:
+    """Add missing ``columns`` to ``table`` for DBs created with an older schema."""
     try:
         existing = set(
             row[0]
             for row in conn.execute(
-                "SELECT column_name FROM information_schema.columns WHERE table_name = 'posts_clean'"
+                "SELECT column_name FROM information_schema.columns WHERE table_name = ?",
+                [table],
             ).fetchall()
         )
     except Exception:
         return
-    for col_name, col_def in POSTS_CLEAN_COLUMNS:
+    for col_name, col_def in columns:
         if col_name in existing:
             continue
         try:
             # PRIMARY KEY only on initial CREATE; use plain type when adding
             spec = col_def.replace(" PRIMARY KEY", "") if "PRIMARY KEY" in col_def else col_def
-            conn.execute(f"ALTER TABLE posts_clean ADD COLUMN {col_name} {spec}")
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {col_name} {spec}")
         except Exception:
             pass
 
 
+def _ensure_posts_clean_columns(conn: duckdb.DuckDBPyConnection) -> None:
+    """Add missing columns to posts_clean for DBs created with an older schema."""
+    _ensure_columns(conn, "posts_clean", POSTS_CLEAN_COLUMNS)
+
+
 def get_connection(db_path: Path | str | None = None) -> duckdb.DuckDBPyConnection:
     """Get a DuckDB connection. Opens read-only on Streamlit Cloud."""
     path = Path(db_path) if db_path else DB_PATH
@@ -110,6 +123,7 @@ def init_database(db_path: Path | str | None = None) -> None:
             dt_utc          TIMESTAMP WITH TIME ZONE,
             text_original   VARCHAR,
             text_clean      VARCHAR,                  -- normalized text
+            text_hash       VARCHAR,                  -- SHA-256 prefix of text_clean
             text_tokens     VARCHAR[],                -- tokenized
             text_lemmas     VARCHAR[],                -- lemmatized
             word_count      INTEGER,
@@ -145,7 +159,8 @@ def init_database(db_path: Path | str | None = None) -> None:
             -- Derived
             dominant_emotion    VARCHAR,
             emotion_confidence  FLOAT,
-            sentiment_label     VARCHAR                -- 'positive' | 'negative' | 'neutral'
+            sentiment_label     VARCHAR,               -- 'positive' | 'negative' | 'neutral'
+            score_tier          VARCHAR                -- 'vader' (cascade) | 'distilled' | 'transformer'
         );
     """)
 
@@ -159,8 +174,47 @@ def init_database(db_path: Path | str | None = None) -> None:
         );
     """)
 
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS score_cache (
+            model_name      VARCHAR,                  -- e.g. HF model id or 'vader'
+            model_revision  VARCHAR,                  -- upstream commit / package version + backend
+            text_hash       VARCHAR,                  -- posts_clean.text_hash
+            scores          FLOAT[],                  -- raw model outputs, model label order
+            PRIMARY KEY (model_name, model_revision, text_hash)
+        );
+    """)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS phases (
+            phase           VARCHAR PRIMARY KEY,
+            label           VARCHAR,
+            start_date      DATE,                     -- inclusive, UTC calendar day
+            end_date        DATE,                     -- inclusive
+            phase_order     INTEGER                   -- earlier phase wins where ranges touch
+        );
+    """)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS topic_sweep (
+            params_key      VARCHAR PRIMARY KEY,      -- e.g. nn15-nc5-md0.0-mts10-nrauto[-s5000]
+            n_neighbors     INTEGER,                  -- UMAP
+            n_components    INTEGER,
+            min_dist        FLOAT,
+            min_topic_size  INTEGER,                  -- HDBSCAN min_cluster_size
+            nr_topics       VARCHAR,                  -- 'auto', 'none' or a topic count
+            n_posts         INTEGER,
+            n_topics        INTEGER,
+            outlier_rate    FLOAT,
+            coherence_npmi  FLOAT,                    -- mean NPMI of top-word pairs, -1..1
+            diversity       FLOAT,                    -- unique top words / all top words
+            fit_seconds     FLOAT,                    -- HDBSCAN + c-TF-IDF only
+            run_at          TIMESTAMP
+        );
+    """)
+
     # Migrate posts_clean if it was created with an older schema (missing is_duplicate, quality_flag, etc.)
     _ensure_posts_clean_columns(conn)
+    _ensure_columns(conn, "posts_emotions", POSTS_EMOTIONS_COLUMNS)
 
     # Convenience view joining all tables
     conn.execute("""
@@ -171,7 +225,7 @@ def init_database(db_path: Path | str | None = None) -> None:
             e.roberta_positive, e.roberta_negative, e.roberta_neutral,
             e.emo_fear, e.emo_anger, e.emo_sadness, e.emo_joy,
             e.emo_surprise, e.emo_disgust, e.emo_gratitude, e.emo_pride,
-            e.dominant_emotion, e.emotion_confidence, e.sentiment_label,
+            e.dominant_emotion, e.emotion_confidence, e.sentiment_label, e.score_tier,
             t.topic_id, t.topic_label, t.topic_prob, t.top_terms
         FROM posts_clean c
         LEFT JOIN posts_emotions e ON c.id = e.id
@@ -193,6 +247,89 @@ def query_df(sql: str, db_path: Path | str | None = None):
         conn.close()
 
 
+def _key_list(key: str | list[str]) -> list[str]:
+    return [key] if isinstance(key, str) else list(key)
+
+
+def _register_frame(conn: duckdb.DuckDBPyConnection, data) -> str:
+    """Register a DataFrame / Arrow table under a unique view name."""
+    name = f"_bulk_{uuid.uuid4().hex[:12]}"
+    conn.register(name, data)
+    return name
+
+
+def bulk_insert(
+    conn: duckdb.DuckDBPyConnection, table: str, data, columns: list[str] | None = None
+) -> int:
+    """Append all rows of ``data`` (DataFrame or Arrow table) to ``table`` in one statement."""
+    cols = list(columns or data.columns)
+    if len(data) == 0:
+        return 0
+    view = _register_frame(conn, data)
+    try:
+        col_sql = ", ".join(cols)
+        conn.execute(f"INSERT INTO {table} ({col_sql}) SELECT {col_sql} FROM {view}")
+    finally:
+        conn.unregister(view)
+    return len(data)
+
+
+def bulk_upsert(
+    conn: duckdb.DuckDBPyConnection,
+    table: str,
+    data,
+    key: str | list[str] = "id",
+    columns: list[str] | None = None,
+) -> int:
+    """Insert-or-update rows of ``data`` into ``table`` in one set-based statement.
+
+    ``key`` must be the table's primary key. Existing rows get only ``columns``
+    updated (other columns keep their values); missing rows are inserted.
+    """
+    keys = _key_list(key)
+    cols = [c for c in (columns or data.columns) if c not in keys]
+    if len(data) == 0:
+        return 0
+    view = _register_frame(conn, data)
+    try:
+        all_cols = ", ".join(keys + cols)
+        action = (
+            "DO UPDATE SET " + ", ".join(f"{c} = excluded.{c}" for c in cols)
+            if cols
+            else "DO NOTHING"
+        )
+        conn.execute(
+            f"INSERT INTO {table} ({all_cols}) SELECT {all_cols} FROM {view} "
+            f"ON CONFLICT ({', '.join(keys)}) {action}"
+        )
+    finally:
+        conn.unregister(view)
+    return len(data)
+
+
+def bulk_update(
+    conn: duckdb.DuckDBPyConnection,
+    table: str,
+    data,
+    key: str | list[str] = "id",
+    columns: list[str] | None = None,
+) -> int:
+    """Set-based ``UPDATE table ... FROM data`` for existing rows (no primary key needed)."""
+    keys = _key_list(key)
+    cols = [c for c in (columns or data.columns) if c not in keys]
+    if len(data) == 0 or not cols:
+        return 0
+    view = _register_frame(conn, data)
+    try:
+        conn.execute(
+            f"UPDATE {table} SET {', '.join(f'{c} = s.{c}' for c in cols)} "
+            f"FROM {view} s WHERE {' AND '.join(f'{table}.{k} = s.{k}' for k in keys)}"
+        )
+    finally:
+        conn.unregister(view)
+    return len(data)
+
+
 def execute(sql: str, params=None, db_path: Path | str | None = None):
     """Execute SQL statement."""
     if IS_STREAMLIT_CLOUD:
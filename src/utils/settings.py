@@ -0,0 +1,38 @@
+"""
+Settings Loader — Loads config/settings.yaml for modules that need tunables.
+"""
+
+from typing import Optional
+
+import yaml
+
+from src.utils.constants import CONFIG_DIR
+from src.utils.logger import log
+
+_CACHE: Optional[dict] = None
+
+
+def load_settings() -> dict:
+    """Load the central YAML configuration (empty dict if the file is missing)."""
+    global _CACHE
+    if _CACHE is not None:
+        return _CACHE
+
+    settings_path = CONFIG_DIR / "settings.yaml"
+    if not settings_path.exists():
+        log.warning(f"Settings file not found: {settings_path}")
+        return {}
+
+    with open(settings_path, "r", encoding="utf-8") as f:
+        _CACHE = yaml.safe_load(f) or {}
+    return _CACHE
+
+
+def get_setting(*keys: str, default=None):
+    """Nested lookup, e.g. ``get_setting("models", "roberta", "batch_size", default=32)``."""
+    node = load_settings()
+    for key in keys:
+        if not isinstance(node, dict) or key not in node:
+            return default
+        node = node[key]
+    return node
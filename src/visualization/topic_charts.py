@@ -21,9 +21,15 @@ def create_topic_distribution_chart(topic_df: pd.DataFrame) -> go.Figure:
 
 
 def create_topic_phase_heatmap(df: pd.DataFrame) -> go.Figure:
+    """Topic share per phase, from post rows or the precomputed topic × phase export."""
     if "phase" not in df.columns or "topic_label" not in df.columns:
         return go.Figure()
-    ct = pd.crosstab(df["topic_label"], df["phase"], normalize="columns")
+    if "share" in df.columns:
+        ct = df.pivot_table(
+            index="topic_label", columns="phase", values="share", aggfunc="sum", fill_value=0
+        )
+    else:
+        ct = pd.crosstab(df["topic_label"], df["phase"], normalize="columns")
     top_topics = ct.sum(axis=1).nlargest(10).index
     ct = ct.loc[ct.index.isin(top_topics)]
     fig = go.Figure(
@@ -34,3 +40,32 @@ def create_topic_phase_heatmap(df: pd.DataFrame) -> go.Figure:
     fig.update_layout(title="Topic Prevalence by Phase", template="plotly_dark", height=450)
     fig.update_traces(hoverlabel=dict(bgcolor="#0e1117", font_color="white", bordercolor="#333"))
     return fig
+
+
+def create_topic_timeline(by_day: pd.DataFrame, top_n: int = 8) -> go.Figure:
+    """Daily share of the ``top_n`` largest topics, from the topic × day export."""
+    if by_day.empty or "date" not in by_day.columns:
+        return go.Figure()
+    top = by_day.groupby("topic_label")["n_posts"].sum().nlargest(top_n).index
+    fig = go.Figure()
+    for label in top:
+        series = by_day[by_day["topic_label"] == label].sort_values("date")
+        fig.add_trace(
+            go.Scatter(
+                x=series["date"],
+                y=series["share"],
+                name=label,
+                mode="lines",
+                stackgroup="share",
+                customdata=series["terms"].map(lambda t: ", ".join(t)),
+                hovertemplate="%{x|%b %d}: %{y:.0%}<br>%{customdata}<extra>%{fullData.name}</extra>",
+            )
+        )
+    fig.update_layout(
+        title="Topic Share by Day",
+        template="plotly_dark",
+        height=450,
+        yaxis=dict(title="Share of posts", tickformat=".0%"),
+    )
+    fig.update_traces(hoverlabel=dict(bgcolor="#0e1117", font_color="white", bordercolor="#333"))
+    return fig
@@ -0,0 +1,58 @@
+"""
+Tests for the VADER → transformer cascade.
+"""
+
+import numpy as np
+import pandas as pd
+
+from src.analysis.cascade import calibration_report, settled_by_vader, vader_confidence
+from src.utils.db import bulk_insert, get_connection, init_database
+
+# compound, pos, neg, neu
+VADER = np.array(
+    [
+        [0.90, 0.70, 0.00, 0.30],  # strongly positive
+        [0.00, 0.00, 0.00, 1.00],  # plainly neutral
+        [-0.30, 0.20, 0.35, 0.45],  # mixed
+        [0.02, 0.25, 0.25, 0.50],  # near zero, but not neutral text
+    ],
+    dtype=np.float32,
+)
+
+
+class TestGate:
+    def test_confidence(self):
+        assert np.allclose(vader_confidence(VADER), [0.9, 1.0, 0.3, 0.5])
+
+    def test_threshold(self):
+        assert list(settled_by_vader(VADER, 0.8)) == [True, True, False, False]
+
+    def test_off(self):
+        assert not settled_by_vader(VADER, None).any()
+
+
+class TestCalibration:
+    def test_report(self, tmp_path):
+        db = tmp_path / "cascade.duckdb"
+        init_database(db)
+        conn = get_connection(db)
+        ids = [f"p{i}" for i in range(len(VADER))]
+        bulk_insert(conn, "posts_clean", pd.DataFrame({"id": ids, "word_count": [5, 5, 20, 10]}))
+        scores = pd.DataFrame(
+            VADER, columns=["vader_" + k for k in ("compound", "positive", "negative", "neutral")]
+        )
+        scores["id"] = ids
+        scores["roberta_positive"] = 0.5
+        scores["sentiment_label"] = ["positive", "negative", "negative", "neutral"]
+        scores["dominant_emotion"] = ["joy", "neutral", "fear", "neutral"]
+        bulk_insert(conn, "posts_emotions", scores)
+
+        report = calibration_report(conn, (0.8, 1.1)).set_index("threshold")
+        conn.close()
+
+        assert report.loc[0.8, "n_skipped"] == 2
+        assert report.loc[0.8, "words_saved"] == 10 / 40
+        # The neutral post's stored label was 'negative', so one of two skipped posts disagrees
+        assert report.loc[0.8, "skipped_label_agreement"] == 0.5
+        assert report.loc[0.8, "label_agreement"] == 0.75
+        assert report.loc[1.1, "n_skipped"] == 0
@@ -2,13 +2,16 @@
 Tests for the cleaning pipeline.
 """
 
+import pandas as pd
+
 from src.analysis.cleaning import (
     clean_text,
-    detect_neighborhoods,
     detect_phase,
     flag_quality,
+    flag_quality_column,
     tokenize_simple,
 )
+from src.analysis.geo_tagger import detect_neighborhoods
 
 
 class TestCleanText:
@@ -56,7 +59,10 @@ class TestDetectPhase:
         assert detect_phase("2025-10-03T12:00:00+00:00") == "post_week1"
 
     def test_out_of_window(self):
-        assert detect_phase("2025-12-01T12:00:00+00:00") == "out_of_window"
+        assert detect_phase("2026-01-05T12:00:00+00:00") == "out_of_window"
+
+    def test_boundary_day_goes_to_earlier_phase(self):
+        assert detect_phase("2025-09-29T23:00:00+00:00") == "pre"
 
 
 class TestDetectNeighborhoods:
@@ -82,3 +88,27 @@ class TestFlagQuality:
 
     def test_spam(self):
         assert flag_quality("Buy now http://a http://b http://c http://d", 6) == "spam"
+
+    def test_repetition_spam(self):
+        assert flag_quality("lol lol lol lol lol lol lol lol lol lol", 10) == "spam"
+
+    def test_letter_mashing_spam(self):
+        assert flag_quality("aaaaaaaaaaaaaaaaaaaaaaa zzzzzzzzzzzzzzzzzz ok", 3) == "spam"
+
+    def test_emphasis_is_not_spam(self):
+        for text in [
+            "Nooooooooooo they took our neighbors this morning",
+            "They raided the whole building!!!!!!!!!!",
+            "Update from the tenants meeting ---------- rent strike starts Monday",
+            "Stay safe everyone 😭😭😭😭😭😭😭😭😭😭",
+        ]:
+            assert flag_quality(text, len(text.split())) == "ok", text
+
+    def test_non_english(self):
+        text = "La policía entró en el edificio y los vecinos están muy asustados"
+        assert flag_quality(text, 12) == "non_english"
+
+    def test_column_matches_scalar(self):
+        texts = pd.Series(["This is a normal post about the community", "Hi"])
+        flags = flag_quality_column(texts, pd.Series([8, 1]))
+        assert flags.tolist() == ["ok", "short"]
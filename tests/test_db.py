@@ -0,0 +1,44 @@
+"""
+Tests for the DuckDB bulk write helpers.
+"""
+
+import pandas as pd
+
+from src.utils.db import bulk_insert, bulk_update, bulk_upsert, get_connection, init_database
+
+
+def _conn(tmp_path):
+    db = tmp_path / "bulk.duckdb"
+    init_database(db)
+    return get_connection(db)
+
+
+class TestBulkWrites:
+    def test_upsert_inserts_then_updates_listed_columns(self, tmp_path):
+        conn = _conn(tmp_path)
+        first = pd.DataFrame({"id": ["a", "b"], "emo_fear": [0.1, 0.2], "emo_joy": [0.5, 0.6]})
+        bulk_upsert(conn, "posts_emotions", first)
+        second = pd.DataFrame({"id": ["b", "c"], "emo_fear": [0.9, 0.3]})
+        bulk_upsert(conn, "posts_emotions", second, columns=["emo_fear"])
+
+        rows = conn.execute(
+            "SELECT id, round(emo_fear::DOUBLE, 2), round(emo_joy::DOUBLE, 2) "
+            "FROM posts_emotions ORDER BY id"
+        ).fetchall()
+        assert rows == [("a", 0.1, 0.5), ("b", 0.9, 0.6), ("c", 0.3, None)]
+        conn.close()
+
+    def test_update_touches_only_matching_rows(self, tmp_path):
+        conn = _conn(tmp_path)
+        bulk_insert(conn, "posts_clean", pd.DataFrame({"id": ["a", "b"], "phase": ["pre", "pre"]}))
+        bulk_update(conn, "posts_clean", pd.DataFrame({"id": ["b"], "phase": ["event"]}))
+
+        rows = conn.execute("SELECT id, phase FROM posts_clean ORDER BY id").fetchall()
+        assert rows == [("a", "pre"), ("b", "event")]
+        conn.close()
+
+    def test_empty_frame_is_noop(self, tmp_path):
+        conn = _conn(tmp_path)
+        empty = pd.DataFrame({"id": pd.Series([], dtype=object), "emo_fear": []})
+        assert bulk_upsert(conn, "posts_emotions", empty) == 0
+        conn.close()
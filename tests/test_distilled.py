@@ -0,0 +1,89 @@
+"""
+Tests for the distilled hashed n-gram scorer.
+"""
+
+import numpy as np
+
+from src.analysis.distilled import DistilledModel, featurize, fit, load_teacher_scores
+from src.utils.db import get_connection, init_database
+
+
+class TestFeaturize:
+    def test_rows_are_normalized_and_never_empty(self):
+        indptr, cols, vals = featurize(["", "fear fear anger", "Hello there"], 1024)
+        assert len(indptr) == 4
+        assert (np.diff(indptr) > 0).all()
+        for i in range(3):
+            row = vals[indptr[i] : indptr[i + 1]]
+            assert np.isclose(np.linalg.norm(row), 1.0)
+        assert cols.max() < 1024
+
+    def test_hashing_is_stable(self):
+        assert np.array_equal(featurize(["same text"], 4096)[1], featurize(["same text"], 4096)[1])
+
+
+class TestFit:
+    def test_learns_teacher_and_round_trips(self, tmp_path):
+        # Teacher: 'love' posts positive + joy, 'scared' posts negative + fear
+        texts = [f"i love this block {i}" for i in range(40)] + [
+            f"we are scared tonight {i}" for i in range(40)
+        ]
+        targets = np.zeros((80, 11), dtype=np.float32)
+        targets[:40, 0], targets[40:, 1] = 1.0, 1.0  # positive / negative
+        targets[:40, 3 + 3], targets[40:, 3 + 0] = 0.9, 0.9  # joy / fear
+
+        student = fit(texts, targets, n_features=4096, epochs=5)
+        sentiment, emotions = student.predict(["love it", "so scared"])
+        assert sentiment.shape == (2, 3) and emotions.shape == (2, 8)
+        assert np.allclose(sentiment.sum(axis=1), 1.0, atol=1e-5)
+        assert sentiment[0].argmax() == 0 and sentiment[1].argmax() == 1
+        assert emotions[0, 3] > emotions[0, 0] and emotions[1, 0] > emotions[1, 3]
+
+        path = tmp_path / "model.npz"
+        student.save(path)
+        loaded = DistilledModel.load(path)
+        assert loaded.revision == student.revision
+        assert np.allclose(loaded.predict(["love it"])[0], sentiment[:1])
+
+
+class TestDistilledBackend:
+    def test_stage_output_is_not_teacher_data(self, tmp_path, monkeypatch):
+        import src.analysis.distilled as distilled
+        import src.analysis.emotions as emotions
+        from src.analysis.emotions import GOEMOTIONS_MODEL
+        from src.analysis.score_cache import ScoreCache
+
+        db = tmp_path / "distilled.duckdb"
+        init_database(db)
+        conn = get_connection(db)
+        conn.execute(
+            "INSERT INTO posts_clean (id, text_clean, text_hash) VALUES "
+            "('a', 'i love this block', 'ha'), ('b', 'we are scared tonight', 'hb')"
+        )
+        # Both posts start out with teacher scores
+        conn.execute(
+            "INSERT INTO posts_emotions (id, roberta_positive, emotion_confidence, score_tier) "
+            "VALUES ('a', 0.9, 0.8, 'transformer'), ('b', 0.1, 0.7, 'transformer')"
+        )
+        ScoreCache(conn, GOEMOTIONS_MODEL, "teacher-rev").store(["ha"], np.ones((1, 28)))
+        assert len(load_teacher_scores(conn)) == 2
+        conn.close()
+
+        student = fit(["i love this", "we are scared"], np.full((2, 11), 0.5), n_features=256)
+        student.save(tmp_path / "model.npz")
+        monkeypatch.setattr(distilled, "_model", student)
+        monkeypatch.setattr(emotions, "_emotion_pipelines", {})
+        monkeypatch.setattr(emotions, "PROJECT_ROOT", tmp_path)
+        monkeypatch.setattr(emotions, "init_database", lambda: init_database(db))
+        monkeypatch.setattr(emotions, "get_connection", lambda: get_connection(db))
+        monkeypatch.setenv("MODEL_SERVER", "off")
+        emotions.run_emotion_analysis(backend="distilled")
+
+        conn = get_connection(db)
+        tiers = conn.execute("SELECT DISTINCT score_tier FROM posts_emotions").fetchall()
+        assert tiers == [("distilled",)]
+        assert load_teacher_scores(conn).empty
+        # The teacher's cached scores survive; the student's are keyed apart
+        models = conn.execute("SELECT DISTINCT model_name FROM score_cache ORDER BY 1").fetchall()
+        assert models == [(f"distilled:{GOEMOTIONS_MODEL}",), (GOEMOTIONS_MODEL,)]
+        conn.close()
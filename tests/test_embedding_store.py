@@ -0,0 +1,53 @@
+"""
+Tests for the memory-mapped embedding store.
+"""
+
+import numpy as np
+import pytest
+
+from src.analysis.embedding_store import EmbeddingStore
+
+
+def _embed(calls):
+    def embed_fn(texts):
+        calls.extend(texts)
+        return np.array([[len(t), 1.0, -0.5] for t in texts], dtype=np.float32)
+
+    return embed_fn
+
+
+class TestEmbeddingStore:
+    def test_embeds_each_text_once_across_runs(self, tmp_path):
+        calls = []
+        store = EmbeddingStore("mini", tmp_path)
+        vecs = store.get_or_embed(["a", "b", "a"], ["raid", "rally!", "raid"], _embed(calls))
+        assert calls == ["raid", "rally!"]
+        assert vecs.dtype == np.float32 and vecs.shape == (3, 3)
+        assert np.allclose(vecs[:, 0], [4, 6, 4])
+
+        # A fresh store on the same directory only embeds the new text
+        calls.clear()
+        store = EmbeddingStore("mini", tmp_path)
+        vecs = store.get_or_embed(["b", "c"], ["rally!", "hotline"], _embed(calls))
+        assert calls == ["hotline"]
+        assert np.allclose(vecs[:, 0], [6, 7])
+        assert store.hashes() == ["a", "b", "c"]
+        assert store.matrix().dtype == np.float16
+
+    def test_other_model_resets(self, tmp_path):
+        EmbeddingStore("mini", tmp_path).add(["a"], np.ones((1, 3)))
+        store = EmbeddingStore("mpnet", tmp_path)
+        assert len(store) == 0
+        store.add(["a"], np.ones((1, 3)))
+        with pytest.raises(ValueError):
+            store.add(["b"], np.ones((1, 4)))
+
+    def test_unindexed_rows_are_overwritten(self, tmp_path):
+        store = EmbeddingStore("mini", tmp_path)
+        store.add(["a"], np.full((1, 3), 1.0))
+        # Simulate an interrupted append: vectors written, index never updated
+        with open(store._vectors_path, "ab") as f:
+            f.write(np.full((1, 3), 9.0, dtype=np.float16).tobytes())
+        store = EmbeddingStore("mini", tmp_path)
+        store.add(["b"], np.full((1, 3), 2.0))
+        assert np.allclose(EmbeddingStore("mini", tmp_path).get(["a", "b"])[:, 0], [1.0, 2.0])
@@ -0,0 +1,38 @@
+"""
+Tests for GoEmotions → target emotion mapping.
+"""
+
+import numpy as np
+
+from src.analysis.emotions import dominant_emotions, emotion_matrix, vader_emotion_fallback
+from src.utils.constants import TARGET_EMOTIONS
+
+
+class TestEmotionMatrix:
+    def test_max_reduces_mapped_labels(self):
+        labels = ["anger", "annoyance", "joy", "neutral"]
+        probs = np.array([[0.2, 0.7, 0.1, 0.9]], dtype=np.float32)
+        row = dict(zip(TARGET_EMOTIONS, emotion_matrix(probs, labels)[0]))
+        assert row["anger"] == np.float32(0.7)
+        assert row["joy"] == np.float32(0.1)
+        assert row["fear"] == 0.0
+
+    def test_failed_row_stays_nan(self):
+        probs = np.array([[np.nan, np.nan], [0.4, 0.5]], dtype=np.float32)
+        matrix = emotion_matrix(probs, ["fear", "joy"])
+        assert np.isnan(matrix[0]).all() and not np.isnan(matrix[1]).any()
+
+
+class TestDominantEmotions:
+    def test_argmax_threshold_and_nan(self):
+        matrix = np.zeros((3, len(TARGET_EMOTIONS)), dtype=np.float32)
+        matrix[0, TARGET_EMOTIONS.index("fear")] = 0.8
+        matrix[1, TARGET_EMOTIONS.index("joy")] = 0.2
+        matrix[2] = np.nan
+        labels, confidence = dominant_emotions(matrix)
+        assert labels.tolist() == ["fear", "neutral", None]
+        assert np.isclose(confidence[0], 0.8) and np.isnan(confidence[2])
+
+    def test_vader_fallback_profile(self):
+        scores = vader_emotion_fallback(-0.8)
+        assert np.isclose(scores["fear"], 0.4) and scores["joy"] == 0.0
@@ -0,0 +1,51 @@
+"""
+Tests for the compiled neighborhood gazetteer matcher.
+"""
+
+import pandas as pd
+
+from src.analysis.geo_tagger import detect_neighborhoods, tag_neighborhoods
+from src.utils.db import get_connection, init_database
+
+
+class TestDetect:
+    def test_word_bounded(self):
+        assert detect_neighborhoods("Agents at 75th and Cottage Grove") == [
+            "Woodlawn",
+            "Greater Grand Crossing",
+        ]
+        assert detect_neighborhoods("Traffic on 175th again, and 1063rd") == []
+
+    def test_case_insensitive_and_longest_term(self):
+        assert detect_neighborhoods("WOODLAWN and south shore drive") == ["South Shore", "Woodlawn"]
+
+    def test_no_match(self):
+        assert detect_neighborhoods("Random text with no neighborhood") == []
+        assert detect_neighborhoods(None) == []
+
+
+class TestTagColumn:
+    def test_aligned_with_index(self):
+        texts = pd.Series(["near 71st", None, "Avalon Park meeting"], index=[10, 4, 7])
+        tags = tag_neighborhoods(texts)
+        assert tags.index.tolist() == [10, 4, 7]
+        assert tags.tolist() == [["South Shore"], [], ["Avalon Park"]]
+
+    def test_run_updates_every_row(self, tmp_path, monkeypatch):
+        import src.analysis.geo_tagger as geo
+
+        db = tmp_path / "geo.duckdb"
+        init_database(db)
+        conn = get_connection(db)
+        conn.execute(
+            "INSERT INTO posts_clean (id, text_clean, neighborhoods, has_geo) VALUES "
+            "('a', 'raid near 71st', NULL, false), ('b', 'no place named', ['Woodlawn'], true)"
+        )
+        conn.close()
+        monkeypatch.setattr(geo, "get_connection", lambda: get_connection(db))
+        geo.run_geo_tagging()
+
+        conn = get_connection(db)
+        rows = conn.execute("SELECT id, neighborhoods, has_geo FROM posts_clean ORDER BY id")
+        assert rows.fetchall() == [("a", ["South Shore"], True), ("b", [], False)]
+        conn.close()
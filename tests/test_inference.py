@@ -0,0 +1,162 @@
+"""
+Tests for batched transformer inference.
+"""
+
+import json
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from src.analysis.inference import BatchTuner, plan_batches, predict_proba
+
+
+class TestPlanBatches:
+    def test_covers_every_index_once(self):
+        lengths = np.array([5, 400, 12, 7, 300, 9, 3])
+        batches = plan_batches(lengths, max_tokens=600, max_batch_size=4)
+        flat = np.concatenate(batches)
+        assert sorted(flat.tolist()) == list(range(len(lengths)))
+
+    def test_respects_token_budget(self):
+        lengths = np.array([10] * 50 + [500] * 3)
+        for batch in plan_batches(lengths, max_tokens=1000, max_batch_size=64):
+            assert len(batch) == 1 or len(batch) * lengths[batch].max() <= 1000
+
+    def test_oversized_item_gets_own_batch(self):
+        batches = plan_batches(np.array([2000, 5, 5]), max_tokens=512)
+        assert batches[0].tolist() == [0]
+
+    def test_long_items_not_mixed_with_short(self):
+        lengths = np.array([5, 500, 6, 510, 4])
+        batches = plan_batches(lengths, max_tokens=1100, max_batch_size=8)
+        assert set(batches[0].tolist()) == {1, 3}
+
+
+class TestBatchTuner:
+    def _tuner(self, tmp_path, **kwargs):
+        kwargs.setdefault("memory_limit_mb", float("inf"))
+        return BatchTuner("model:torch@cpu", path=tmp_path / "tuning.json", **kwargs)
+
+    def test_grows_while_throughput_holds(self, tmp_path):
+        tuner = self._tuner(tmp_path, max_tokens=1000)
+        tuner.observe(1000, 1.0)
+        tuner.observe(tuner.max_tokens, 1.0)
+        assert tuner.max_tokens > 1250
+
+    def test_shrinks_over_memory_limit(self, tmp_path):
+        tuner = self._tuner(tmp_path, max_tokens=4000, memory_limit_mb=0.0)
+        tuner.observe(4000, 1.0)
+        assert tuner.max_tokens == 3000
+
+    def test_oom_halves_and_caps_growth(self, tmp_path):
+        tuner = self._tuner(tmp_path, max_tokens=8000)
+        tuner.on_oom(8000)
+        assert tuner.max_tokens == 4000
+        for _ in range(10):
+            tuner.observe(tuner.max_tokens, 0.001)
+        assert tuner.max_tokens <= 6000
+
+    def test_budget_persists_per_host(self, tmp_path):
+        tuner = self._tuner(tmp_path, max_tokens=2000)
+        tuner.observe(2000, 1.0)
+        tuner.save()
+        assert self._tuner(tmp_path).max_tokens == 2000
+
+    def test_saves_merge_and_replace_atomically(self, tmp_path):
+        path = tmp_path / "tuning.json"
+        first = BatchTuner("a:torch@cpu", path=path, max_tokens=2000, memory_limit_mb=1e9)
+        second = BatchTuner("b:onnx@cpu", path=path, max_tokens=3000, memory_limit_mb=1e9)
+        first.save()
+        second.save()
+        saved = json.loads(path.read_text())[first.host]
+        assert saved["a:torch@cpu"]["max_tokens"] == 2000
+        assert saved["b:onnx@cpu"]["max_tokens"] == 3000
+        assert [p.name for p in tmp_path.iterdir()] == ["tuning.json"]
+
+
+class TestPredictProbaBackoff:
+    def test_oom_batch_is_split_and_retried(self, tmp_path):
+        torch = pytest.importorskip("torch")
+
+        class Tokenizer:
+            def __call__(self, texts, **kwargs):
+                return {"input_ids": [[1] * len(t.split()) for t in texts]}
+
+            def pad(self, rows, return_tensors):
+                width = max(len(r["input_ids"]) for r in rows)
+                ids = [r["input_ids"] + [0] * (width - len(r["input_ids"])) for r in rows]
+                return {"input_ids": torch.tensor(ids)}
+
+        class Model:
+            config = SimpleNamespace(
+                problem_type="single_label_classification", num_labels=2, name_or_path="fake"
+            )
+
+            def __call__(self, input_ids):
+                if len(input_ids) > 2:
+                    raise RuntimeError("CPU out of memory")
+                return SimpleNamespace(logits=torch.zeros(len(input_ids), 2))
+
+        pipe = SimpleNamespace(tokenizer=Tokenizer(), model=Model(), device="cpu")
+        tuner = BatchTuner("fake", path=tmp_path / "tuning.json", max_tokens=1000)
+        probs = predict_proba(pipe, ["a b", "c d e", "f", "g h", "i"], tuner=tuner)
+        np.testing.assert_allclose(probs, 0.5)
+        assert tuner.ooms > 0
+
+
+class TestSlidingWindow:
+    def test_long_text_is_scored_whole(self, tmp_path):
+        torch = pytest.importorskip("torch")
+        from src.analysis.inference import MAX_LENGTH
+
+        class Tokenizer:
+            is_fast = True
+
+            def __call__(self, texts, max_length, stride=0, return_overflowing_tokens=False, **kw):
+                ids, owners = [], []
+                for i, text in enumerate(texts):
+                    tokens = [2 if w == "calm" else 1 for w in text.split()]
+                    step = max_length - stride if return_overflowing_tokens else len(tokens)
+                    start = 0
+                    while True:
+                        ids.append(tokens[start : start + max_length])
+                        owners.append(i)
+                        if start + max_length >= len(tokens) or not return_overflowing_tokens:
+                            break
+                        start += step
+                encoded = {"input_ids": ids}
+                if return_overflowing_tokens:
+                    encoded["overflow_to_sample_mapping"] = owners
+                return encoded
+
+            def pad(self, rows, return_tensors):
+                width = max(len(r["input_ids"]) for r in rows)
+                ids = [r["input_ids"] + [0] * (width - len(r["input_ids"])) for r in rows]
+                return {"input_ids": torch.tensor(ids)}
+
+        class Model:
+            config = SimpleNamespace(
+                problem_type="single_label_classification", num_labels=2, name_or_path="fake"
+            )
+            widths = []
+
+            def __call__(self, input_ids):
+                self.widths.append(input_ids.shape[1])
+                # Logit per class = share of 'scared' (1) vs 'calm' (2) tokens, times 10
+                scared = (input_ids == 1).float().sum(1, keepdim=True)
+                calm = (input_ids == 2).float().sum(1, keepdim=True)
+                return SimpleNamespace(logits=10 * torch.cat([scared, calm], 1) / (scared + calm))
+
+        pipe = SimpleNamespace(tokenizer=Tokenizer(), model=Model(), device="cpu")
+        texts = [" ".join(["scared"] * 600 + ["calm"] * 600), "calm calm"]
+        kwargs = dict(max_tokens=4096)
+
+        truncated = predict_proba(pipe, texts, **kwargs)
+        assert truncated[0, 0] > 0.99  # Only the first 512 tokens were seen
+
+        Model.widths.clear()
+        windowed = predict_proba(pipe, texts, stride=128, **kwargs)
+        assert max(Model.widths) <= MAX_LENGTH
+        assert 0.3 < windowed[0, 0] < 0.7  # Both halves count
+        np.testing.assert_allclose(windowed[1], truncated[1])
@@ -0,0 +1,72 @@
+"""
+Tests for the local model server transport.
+"""
+
+import threading
+
+import pytest
+
+
+class TestServerAddress:
+    def test_tcp(self, monkeypatch):
+        from src.analysis.model_server import server_address
+
+        monkeypatch.setenv("MODEL_SERVER_ADDRESS", "127.0.0.1:9000")
+        assert server_address() == (("127.0.0.1", 9000), "AF_INET")
+
+    def test_unix_socket(self, monkeypatch, tmp_path):
+        from src.analysis.model_server import server_address
+
+        path = str(tmp_path / "models.sock")
+        monkeypatch.setenv("MODEL_SERVER_ADDRESS", path)
+        assert server_address() == (path, "AF_UNIX")
+
+
+class TestAuthKey:
+    def test_random_per_install_key(self, monkeypatch, tmp_path):
+        import src.analysis.model_server as ms
+
+        monkeypatch.delenv("MODEL_SERVER_AUTHKEY", raising=False)
+        monkeypatch.setattr(ms, "AUTHKEY_PATH", tmp_path / "model_server.key")
+        key = ms._authkey()
+        assert len(key) == 64 and ms._authkey() == key
+        assert (tmp_path / "model_server.key").stat().st_mode & 0o777 == 0o600
+
+        monkeypatch.setenv("MODEL_SERVER_AUTHKEY", "shared-secret")
+        assert ms._authkey() == b"shared-secret"
+
+    def test_tcp_requires_explicit_key(self, monkeypatch):
+        from src.analysis.model_server import ModelServer
+
+        monkeypatch.delenv("MODEL_SERVER_AUTHKEY", raising=False)
+        monkeypatch.setenv("MODEL_SERVER_ADDRESS", "127.0.0.1:0")
+        monkeypatch.setenv("MODEL_SERVER", "off")
+        with pytest.raises(RuntimeError, match="MODEL_SERVER_AUTHKEY"):
+            ModelServer("torch").serve_forever()
+
+
+class TestModelServer:
+    def test_score_and_shutdown(self, monkeypatch, tmp_path):
+        import src.analysis.model_server as ms
+        from src.analysis.model_server import ModelClient, ModelServer
+
+        monkeypatch.setattr(ms, "AUTHKEY_PATH", tmp_path / "model_server.key")
+        monkeypatch.setenv("MODEL_SERVER_ADDRESS", str(tmp_path / "models.sock"))
+        monkeypatch.setenv("MODEL_SERVER", "off")  # Restored after the server overrides it
+        server = ModelServer("torch")
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+
+        client = ModelClient()
+        for _ in range(50):
+            if (tmp_path / "models.sock").exists() and client.ping():
+                break
+            thread.join(0.1)
+        scores = client.score("vader", ["I love this community!", "This is horrible."])
+        assert scores.shape == (2, 4)
+        assert scores[0, 0] > 0 > scores[1, 0]
+        assert (tmp_path / "models.sock").stat().st_mode & 0o777 == 0o600
+
+        client.shutdown()
+        thread.join(5)
+        assert not thread.is_alive()
@@ -0,0 +1,45 @@
+"""
+Tests for the ONNX export of the sequence classifiers.
+"""
+
+import numpy as np
+import pytest
+
+from src.analysis.onnx_backend import OnnxSequenceClassifier, export_model
+
+
+def test_export_matches_torch_on_new_inputs(tmp_path):
+    torch = pytest.importorskip("torch")
+    transformers = pytest.importorskip("transformers")
+    pytest.importorskip("onnxruntime")
+
+    torch.manual_seed(0)
+    config = transformers.BertConfig(
+        vocab_size=100,
+        hidden_size=16,
+        num_hidden_layers=1,
+        num_attention_heads=2,
+        intermediate_size=32,
+        num_labels=3,
+    )
+    model = transformers.BertForSequenceClassification(config).eval()
+
+    def features(ids):
+        ids = torch.tensor(ids)
+        return {
+            "input_ids": ids,
+            "token_type_ids": torch.zeros_like(ids),
+            "attention_mask": (ids != 0).long(),
+        }
+
+    path = tmp_path / "model.onnx"
+    export_model(model, features([[1, 5, 7, 2], [1, 9, 2, 0]]), path)
+    onnx_model = OnnxSequenceClassifier(path, config)
+
+    # Different values, batch size and sequence length from the export batch
+    for ids in ([[1, 42, 17, 33, 2]], [[1, 3, 2, 0, 0, 0], [1, 88, 61, 24, 50, 2]]):
+        batch = features(ids)
+        with torch.no_grad():
+            expected = model(**batch).logits.numpy()
+        got = onnx_model(**batch).logits.numpy()
+        np.testing.assert_allclose(got, expected, atol=1e-4)
@@ -0,0 +1,36 @@
+"""
+Tests for the SQL phase tagger.
+"""
+
+from src.utils.db import get_connection, init_database
+
+
+def test_run_tags_from_phase_table(tmp_path, monkeypatch):
+    import src.analysis.phase_tagger as tagger
+
+    db = tmp_path / "phases.duckdb"
+    init_database(db)
+    conn = get_connection(db)
+    conn.execute(
+        "INSERT INTO posts_clean (id, dt_utc, phase) VALUES "
+        "('boundary', '2025-09-28 23:30:00-05:00', NULL), "  # 2025-09-29 in UTC
+        "('event', '2025-09-30 02:00:00+00', NULL), "
+        "('late', '2026-01-05 12:00:00+00', 'displacement'), "
+        "('undated', NULL, 'pre')"
+    )
+    conn.close()
+    monkeypatch.setattr(tagger, "init_database", lambda: init_database(db))
+    monkeypatch.setattr(tagger, "get_connection", lambda: get_connection(db))
+    tagger.run_phase_tagging()
+
+    conn = get_connection(db)
+    rows = conn.execute("SELECT id, phase FROM posts_clean ORDER BY id").fetchall()
+    assert rows == [
+        ("boundary", "pre"),
+        ("event", "event"),
+        ("late", "out_of_window"),
+        ("undated", "unknown"),
+    ]
+    phases = conn.execute("SELECT phase FROM phases ORDER BY phase_order").fetchall()
+    assert [p for (p,) in phases] == list(tagger.phase_calendar())
+    conn.close()
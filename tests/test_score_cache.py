@@ -0,0 +1,67 @@
+"""
+Tests for the persistent model-score cache.
+"""
+
+import numpy as np
+
+from src.analysis.score_cache import ScoreCache, cache_model_name
+from src.utils.db import get_connection, init_database
+
+
+def _conn(tmp_path):
+    db = tmp_path / "cache.duckdb"
+    init_database(db)
+    return get_connection(db)
+
+
+class TestScoreCache:
+    def test_misses_are_scored_once(self, tmp_path):
+        conn = _conn(tmp_path)
+        calls = []
+
+        def score(texts):
+            calls.append(list(texts))
+            return np.array([[len(t), 1.0] for t in texts])
+
+        cache = ScoreCache(conn, "m", "r1")
+        first = cache.get_or_score(["a", "b", "a"], ["x", "yy", "x"], score)
+        again = ScoreCache(conn, "m", "r1").get_or_score(["b", "a"], ["yy", "x"], score)
+
+        assert calls == [["x", "yy"]]
+        assert first[:, 0].tolist() == [1.0, 2.0, 1.0]
+        assert again[:, 0].tolist() == [2.0, 1.0]
+        assert (cache.hits, cache.misses) == (0, 2)
+
+        repeat = ScoreCache(conn, "m", "r1")
+        repeat.get_or_score(["a", "b", "a"], ["x", "yy", "x"], score)
+        assert (repeat.hits, repeat.misses) == (2, 0)  # Distinct hashes, like misses
+        conn.close()
+
+    def test_new_revision_prunes_only_that_model(self, tmp_path):
+        conn = _conn(tmp_path)
+        ScoreCache(conn, "m", "r1").store(["a"], np.array([[1.0]]))
+        ScoreCache(conn, "other", "r1").store(["a"], np.array([[1.0]]))
+
+        assert ScoreCache(conn, "m", "r2").prune_stale() == 1
+        remaining = conn.execute("SELECT model_name FROM score_cache").fetchall()
+        assert remaining == [("other",)]
+        conn.close()
+
+    def test_backends_keep_their_own_entries(self, tmp_path):
+        conn = _conn(tmp_path)
+        names = [cache_model_name("m", b) for b in ("torch", "onnx", "distilled")]
+        assert len(set(names)) == 3
+        ScoreCache(conn, names[0], "r1").store(["a"], np.array([[1.0]]))
+        ScoreCache(conn, names[1], "r1+export1").store(["a"], np.array([[1.0]]))
+
+        assert ScoreCache(conn, names[0], "r2").prune_stale() == 1
+        remaining = conn.execute("SELECT model_name FROM score_cache").fetchall()
+        assert remaining == [(names[1],)]
+        conn.close()
+
+    def test_failed_rows_not_cached(self, tmp_path):
+        conn = _conn(tmp_path)
+        cache = ScoreCache(conn, "m", "r1")
+        cache.store(["a", "b"], np.array([[1.0], [np.nan]]))
+        assert set(cache.lookup(["a", "b"])) == {"a"}
+        conn.close()
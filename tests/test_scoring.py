@@ -0,0 +1,151 @@
+"""
+Tests for single-pass scoring with stubbed transformer pipelines.
+"""
+
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import src.analysis.scoring as scoring
+from src.analysis.cascade import vader_confidence
+from src.analysis.score_cache import ScoreCache
+from src.analysis.sentiment import score_vader_matrix
+from src.utils.db import get_connection, init_database
+
+ROBERTA_LABELS = ["negative", "neutral", "positive"]
+GOEMOTIONS_LABELS = ["anger", "fear", "joy", "neutral"]
+
+POSTS = [
+    ("p1", "I love this wonderful community so much, amazing neighbors!"),
+    ("p2", "The meeting is on Tuesday at the library"),
+    ("p3", "Agents came at dawn, it was awful but people helped"),
+]
+
+
+def _pipe(labels):
+    config = SimpleNamespace(id2label=dict(enumerate(labels)), name_or_path="stub")
+    return SimpleNamespace(revision="stub-rev", model=SimpleNamespace(config=config))
+
+
+@pytest.fixture
+def stubbed(tmp_path, monkeypatch):
+    """Scoring module wired to a temp DB and stub pipelines; returns the texts each model saw."""
+    seen = {"roberta": [], "goemotions": []}
+
+    def roberta_proba(texts, backend=None):
+        seen["roberta"].extend(texts)
+        return np.tile([0.1, 0.2, 0.7], (len(texts), 1)).astype(np.float32)
+
+    def emotion_proba(texts, backend=None):
+        seen["goemotions"].extend(texts)
+        return np.tile([0.1, 0.6, 0.2, 0.1], (len(texts), 1)).astype(np.float32)
+
+    db = tmp_path / "scoring.duckdb"
+    init_database(db)
+    monkeypatch.setattr(scoring, "_get_roberta", lambda backend=None: _pipe(ROBERTA_LABELS))
+    monkeypatch.setattr(scoring, "_get_pipeline", lambda backend=None: _pipe(GOEMOTIONS_LABELS))
+    monkeypatch.setattr(scoring, "roberta_proba", roberta_proba)
+    monkeypatch.setattr(scoring, "emotion_proba", emotion_proba)
+    monkeypatch.setattr(scoring, "init_database", lambda: init_database(db))
+    monkeypatch.setattr(scoring, "get_connection", lambda: get_connection(db))
+    monkeypatch.setattr(scoring, "PROJECT_ROOT", tmp_path)
+    return SimpleNamespace(db=db, seen=seen, out=tmp_path / "data" / "processed")
+
+
+def _insert_posts(db, posts):
+    conn = get_connection(db)
+    conn.executemany(
+        "INSERT INTO posts_clean (id, text_clean, text_hash) VALUES (?, ?, ?)",
+        [(i, t, f"h-{i}") for i, t in posts],
+    )
+    conn.close()
+
+
+class TestScoreChunk:
+    def test_cascade_gate_and_tiers(self, stubbed):
+        texts = [t for _, t in POSTS]
+        confidence = vader_confidence(score_vader_matrix(texts))
+        threshold = float(np.median(confidence))
+        settled = confidence >= threshold
+        assert settled.any() and not settled.all()
+
+        conn = get_connection(stubbed.db)
+        caches = {
+            "vader": ScoreCache(conn.cursor(), "vader", "v"),
+            "roberta": ScoreCache(conn, "roberta", "r"),
+            "goemotions": ScoreCache(conn, "goemotions", "g"),
+        }
+        hashes = [f"h-{i}" for i, _ in POSTS]
+        scores = scoring.score_chunk(texts, hashes, "torch", caches, threshold=threshold)
+        conn.close()
+
+        expected_tier = np.where(settled, "vader", "transformer")
+        assert scores["score_tier"].tolist() == expected_tier.tolist()
+        assert stubbed.seen["roberta"] == [t for t, s in zip(texts, settled) if not s]
+        assert stubbed.seen["goemotions"] == stubbed.seen["roberta"]
+        # Settled posts keep NULL RoBERTa columns; the rest carry the stub's scores
+        assert scores.loc[settled, "roberta_positive"].isna().all()
+        assert np.allclose(scores.loc[~settled, "roberta_positive"], 0.7)
+        assert (scores.loc[~settled, "dominant_emotion"] == "fear").all()
+
+    def test_distilled_backend_tier(self, stubbed):
+        conn = get_connection(stubbed.db)
+        caches = {
+            "vader": ScoreCache(conn.cursor(), "vader", "v"),
+            "roberta": ScoreCache(conn, "roberta", "r"),
+            "goemotions": ScoreCache(conn, "goemotions", "g"),
+        }
+        scores = scoring.score_chunk(["some text here"], ["h"], "distilled", caches)
+        conn.close()
+        assert scores["score_tier"].tolist() == ["distilled"]
+
+    def test_failed_model_falls_back_to_vader_tier(self, stubbed, monkeypatch):
+        def emotion_proba(texts, backend=None):
+            raise RuntimeError("model crashed")
+
+        monkeypatch.setattr(scoring, "emotion_proba", emotion_proba)
+        texts = [t for _, t in POSTS]
+        conn = get_connection(stubbed.db)
+        caches = {
+            "vader": ScoreCache(conn.cursor(), "vader", "v"),
+            "roberta": ScoreCache(conn, "roberta", "r"),
+            "goemotions": ScoreCache(conn, "goemotions", "g"),
+        }
+        scores = scoring.score_chunk(texts, [f"h-{i}" for i, _ in POSTS], "torch", caches)
+        conn.close()
+
+        # RoBERTa still scored the chunk; the emotion columns are VADER-derived
+        assert np.allclose(scores["roberta_positive"], 0.7)
+        assert (scores["dominant_emotion"] != "fear").any()
+        assert scores["score_tier"].tolist() == ["vader"] * len(texts)
+
+
+class TestRunScoring:
+    def test_resume_scores_only_new_posts_and_exports_all(self, stubbed):
+        _insert_posts(stubbed.db, POSTS[:2])
+        scoring.run_scoring(chunk_size=1, sentences=False, cascade=None)
+        assert len(stubbed.seen["roberta"]) == 2
+
+        _insert_posts(stubbed.db, POSTS[2:])
+        stubbed.seen["roberta"].clear()
+        scoring.run_scoring(chunk_size=1, resume=True, sentences=False, cascade=None)
+        assert stubbed.seen["roberta"] == [POSTS[2][1]]
+
+        conn = get_connection(stubbed.db)
+        rows = conn.execute("SELECT id, score_tier FROM posts_emotions ORDER BY id").fetchall()
+        conn.close()
+        assert rows == [("p1", "transformer"), ("p2", "transformer"), ("p3", "transformer")]
+        for name in ("sentiment_scores.parquet", "emotion_scores.parquet"):
+            exported = pd.read_parquet(stubbed.out / name)
+            assert sorted(exported["id"]) == ["p1", "p2", "p3"]
+
+    def test_deadline_stops_between_chunks(self, stubbed):
+        _insert_posts(stubbed.db, POSTS)
+        scoring.run_scoring(chunk_size=1, sentences=False, cascade=None, deadline=0)
+
+        conn = get_connection(stubbed.db)
+        scored = conn.execute("SELECT COUNT(*) FROM posts_emotions").fetchone()[0]
+        conn.close()
+        assert scored == 1  # At least one chunk always runs
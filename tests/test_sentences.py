@@ -0,0 +1,66 @@
+"""
+Tests for sentence-level scoring.
+"""
+
+import numpy as np
+
+from src.analysis.score_cache import ScoreCache
+from src.analysis.sentences import SentenceCache, pool, split_sentences
+from src.utils.db import get_connection, init_database
+
+
+class TestSplit:
+    def test_splits_on_sentence_ends_and_newlines(self):
+        text = "ICE was on 71st. What are we supposed to do?\nStay safe everyone!"
+        assert split_sentences(text) == [
+            "ICE was on 71st.",
+            "What are we supposed to do?",
+            "Stay safe everyone!",
+        ]
+
+    def test_no_breaks_and_empty(self):
+        assert split_sentences("no punctuation here") == ["no punctuation here"]
+        assert split_sentences("") == [""]
+
+
+class TestPool:
+    scores = np.array([[0.2, 0.8], [0.6, 0.4], [1.0, 0.0]], dtype=np.float32)
+    counts = np.array([2, 1])
+    weights = np.array([1.0, 3.0, 5.0], dtype=np.float32)
+
+    def test_rules(self):
+        assert np.allclose(pool(self.scores, self.counts, self.weights, "mean")[0], [0.4, 0.6])
+        assert np.allclose(pool(self.scores, self.counts, self.weights, "max")[0], [0.6, 0.8])
+        assert np.allclose(pool(self.scores, self.counts, self.weights, "weighted")[0], [0.5, 0.5])
+        assert np.allclose(pool(self.scores, self.counts, self.weights, "max")[1], [1.0, 0.0])
+
+    def test_failed_sentence_fails_post(self):
+        scores = self.scores.copy()
+        scores[1] = np.nan
+        pooled = pool(scores, self.counts, self.weights, "mean")
+        assert np.isnan(pooled[0]).all() and not np.isnan(pooled[1]).any()
+
+
+class TestSentenceCache:
+    def test_each_distinct_sentence_scored_once(self, tmp_path):
+        db = tmp_path / "sentences.duckdb"
+        init_database(db)
+        conn = get_connection(db)
+        calls = []
+
+        def score_fn(texts):
+            calls.extend(texts)
+            return np.array([[len(t), 1.0] for t in texts], dtype=np.float32)
+
+        cache = SentenceCache(ScoreCache(conn, "test-model", "r1"), pooling="mean")
+        texts = ["Raid on 71st. Stay safe everyone.", "So scared. Stay safe everyone."]
+        scores = cache.get_or_score(["h1", "h2"], texts, score_fn)
+        assert sorted(calls) == ["Raid on 71st.", "So scared.", "Stay safe everyone."]
+        assert np.allclose(scores[:, 0], [(13 + 19) / 2, (10 + 19) / 2])
+
+        # A second chunk repeating known sentences needs no model calls at all
+        calls.clear()
+        cache.get_or_score(["h3"], ["Stay safe everyone. So scared."], score_fn)
+        assert calls == []
+        assert cache.sentences == 6
+        conn.close()
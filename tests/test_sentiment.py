@@ -44,3 +44,19 @@ class TestSentimentLabel:
         from src.analysis.sentiment import derive_sentiment_label
 
         assert derive_sentiment_label(0.0, 0.4, 0.4) == "neutral"
+
+    def test_vectorized_labels(self):
+        from src.analysis.sentiment import sentiment_labels
+
+        compound = [0.5, -0.5, 0.0, 0.04, 0.3]
+        pos = [0.8, 0.1, 0.4, 0.2, 0.1]
+        neg = [0.1, 0.8, 0.4, 0.6, 0.7]
+        expected = ["positive", "negative", "neutral", "negative", "neutral"]
+        assert list(sentiment_labels(compound, pos, neg)) == expected
+
+    def test_failed_roberta_row_falls_back_to_vader(self):
+        import numpy as np
+
+        from src.analysis.sentiment import sentiment_labels
+
+        assert sentiment_labels([-0.6], [np.nan], [np.nan])[0] == "negative"
@@ -0,0 +1,43 @@
+"""
+Tests for the similar-posts ANN index (numpy IVF backend).
+"""
+
+import numpy as np
+
+from src.analysis.embedding_store import EmbeddingStore
+from src.analysis.similar_posts import SimilarPostsIndex
+
+
+def _clustered(n_per: int, seed: int) -> np.ndarray:
+    """Points around four orthogonal directions in 8 dimensions."""
+    rng = np.random.default_rng(seed)
+    centers = np.eye(8)[:4] * 5
+    return np.concatenate([c + rng.normal(size=(n_per, 8)) * 0.3 for c in centers])
+
+
+class TestIVFIndex:
+    def test_queries_find_own_cluster_and_updates_are_incremental(self, tmp_path):
+        store = EmbeddingStore("mini", tmp_path / "store")
+        vectors = _clustered(50, seed=0)
+        store.add([f"h{i}" for i in range(len(vectors))], vectors)
+
+        index = SimilarPostsIndex(store, tmp_path / "ann", backend="ivf")
+        assert index.update() == 200
+        rows, sims = index.query(vectors[10], k=5)
+        assert rows[0] == 10 and np.isclose(sims[0], 1.0, atol=1e-2)
+        assert (rows < 50).all() and (np.diff(sims) <= 0).all()
+
+        # New rows are added to the persisted index without retraining
+        more = _clustered(5, seed=1)
+        store.add([f"n{i}" for i in range(len(more))], more)
+        reloaded = SimilarPostsIndex(store, tmp_path / "ann", backend="ivf")
+        assert reloaded.size == 200
+        assert reloaded.update() == 20
+        assert reloaded.index.trained_on == 200
+        rows, _ = reloaded.query(more[17], k=1)
+        assert store.hash_at(rows) == ["n17"]
+
+    def test_empty_store(self, tmp_path):
+        index = SimilarPostsIndex(EmbeddingStore("mini", tmp_path), tmp_path / "ann", "ivf")
+        assert index.update() == 0
+        assert len(index.query(np.ones(8), k=3)[0]) == 0
@@ -0,0 +1,124 @@
+"""
+Tests for streaming reads and chunked Parquet exports.
+"""
+
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from src.analysis.streaming import (
+    ParquetAppender,
+    clean_post_batches,
+    count_clean_posts,
+    prefetch,
+    priority_sql,
+)
+from src.utils.db import bulk_insert, bulk_upsert, get_connection, init_database
+
+
+def _conn(tmp_path):
+    db = tmp_path / "stream.duckdb"
+    init_database(db)
+    conn = get_connection(db)
+    posts = pd.DataFrame(
+        {
+            "id": [f"p{i}" for i in range(10)],
+            "text_clean": [f"post number {i}" for i in range(10)],
+            "quality_flag": ["ok"] * 9 + ["spam"],
+        }
+    )
+    bulk_insert(conn, "posts_clean", posts)
+    return conn
+
+
+class TestCleanPostBatches:
+    def test_chunks_cover_eligible_posts(self, tmp_path):
+        conn = _conn(tmp_path)
+        chunks = list(clean_post_batches(conn, chunk_size=4))
+        assert max(len(c) for c in chunks) <= 4
+        assert sorted(pd.concat(chunks)["id"]) == [f"p{i}" for i in range(9)]
+        conn.close()
+
+    def test_skip_done_excludes_scored_posts(self, tmp_path):
+        conn = _conn(tmp_path)
+        done = pd.DataFrame({"id": ["p0", "p1"], "sentiment_label": ["positive", "neutral"]})
+        bulk_upsert(conn, "posts_emotions", done)
+        skip = "e.sentiment_label IS NOT NULL"
+        assert count_clean_posts(conn, skip) == 7
+        ids = pd.concat(clean_post_batches(conn, chunk_size=4, skip_done=skip))["id"]
+        assert "p0" not in set(ids) and len(ids) == 7
+        conn.close()
+
+    def test_priority_order_favours_fresh_engaged_posts(self, tmp_path):
+        db = tmp_path / "priority.duckdb"
+        init_database(db)
+        conn = get_connection(db)
+        dt = pd.to_datetime(
+            ["2025-10-01 12:00", "2025-10-01 11:00", "2025-09-22 12:00", "2025-10-01 12:00", None],
+            utc=True,
+        )
+        ids = ["fresh_quiet", "fresh_busy", "old_viral", "fresh_mid", "undated"]
+        bulk_insert(conn, "posts_clean", pd.DataFrame({"id": ids, "text_clean": ids, "dt_utc": dt}))
+        raw = pd.DataFrame(
+            {
+                "id": ids,
+                "platform": "reddit",
+                "score": [0, 40, 1000, 3, 500],
+                "reply_count": [0, 10, 200, 0, 0],
+            }
+        )
+        bulk_insert(conn, "posts_raw", raw)
+
+        ordered = pd.concat(clean_post_batches(conn, 2, order_by=priority_sql(24)))["id"]
+        assert ordered.tolist() == [
+            "fresh_busy",
+            "fresh_mid",
+            "old_viral",
+            "fresh_quiet",
+            "undated",
+        ]
+        conn.close()
+
+
+class TestPrefetch:
+    def test_yields_every_chunk_in_order(self, tmp_path):
+        conn = _conn(tmp_path)
+        direct = [b["id"].tolist() for b in clean_post_batches(conn, chunk_size=4)]
+        ahead = [b["id"].tolist() for b in prefetch(clean_post_batches(conn, chunk_size=4))]
+        assert ahead == direct and len(ahead) == 3
+        conn.close()
+
+    def test_early_stop_closes_source(self):
+        closed = []
+
+        def source():
+            try:
+                yield from range(5)
+            finally:
+                closed.append(True)
+
+        for item in prefetch(source()):
+            if item == 1:
+                break
+        assert closed == [True]
+
+
+class TestParquetAppender:
+    schema = pa.schema([("id", pa.string()), ("score", pa.float32())])
+
+    def test_chunks_land_in_one_file(self, tmp_path):
+        path = tmp_path / "scores.parquet"
+        with ParquetAppender(path, self.schema) as writer:
+            writer.write(pd.DataFrame({"id": ["a", "b"], "score": [0.1, 0.2]}))
+            writer.write(pd.DataFrame({"id": ["c"], "score": [0.3]}))
+        assert pd.read_parquet(path)["id"].tolist() == ["a", "b", "c"]
+
+    def test_interrupted_run_keeps_previous_export(self, tmp_path):
+        path = tmp_path / "scores.parquet"
+        pd.DataFrame({"id": ["old"], "score": [1.0]}).to_parquet(path)
+        with pytest.raises(KeyboardInterrupt):
+            with ParquetAppender(path, self.schema) as writer:
+                writer.write(pd.DataFrame({"id": ["new"], "score": [0.5]}))
+                raise KeyboardInterrupt
+        assert pd.read_parquet(path)["id"].tolist() == ["old"]
+        assert not list(tmp_path.glob("*.partial"))
@@ -0,0 +1,62 @@
+"""
+Tests for the topic hyperparameter sweep metrics and grid.
+"""
+
+import multiprocessing as mp
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from src.analysis.topic_sweep import (
+    npmi_coherence,
+    params_key,
+    sweep_grid,
+    topic_diversity,
+    worker_threads,
+)
+
+DOCS = [
+    {"raid", "agents", "street"},
+    {"raid", "agents"},
+    {"rally", "march"},
+    {"rally", "march", "street"},
+]
+
+
+class TestMetrics:
+    def test_diversity(self):
+        assert topic_diversity([["raid", "agents"], ["rally", "march"]]) == 1.0
+        assert topic_diversity([["raid", "street"], ["rally", "street"]]) == 0.75
+        assert topic_diversity([]) == 0.0
+
+    def test_coherent_topics_score_higher(self):
+        coherent = npmi_coherence([["raid", "agents"], ["rally", "march"]], DOCS)
+        mixed = npmi_coherence([["raid", "march"], ["rally", "agents"]], DOCS)
+        assert np.isclose(coherent, 1.0) and np.isclose(mixed, -1.0)
+
+
+class TestGrid:
+    def test_overrides_and_keys(self):
+        grid = sweep_grid({"min_topic_size": [8], "nr_topics": None})
+        assert grid["min_topic_size"] == [8]
+        assert grid["nr_topics"] == ["auto", "none"]
+        variant = {k: v[0] for k, v in grid.items()}
+        assert params_key(variant) == "nn15-nc5-md0.0-mts8-nrauto"
+
+    def test_sampled_sweeps_get_their_own_keys(self):
+        variant = {k: v[0] for k, v in sweep_grid().items()}
+        assert params_key(variant, 5000) == f"{params_key(variant)}-s5000"
+        assert params_key(variant, None) == params_key(variant)
+
+
+def _omp_threads():
+    return os.environ.get("OMP_NUM_THREADS")
+
+
+class TestWorkerThreads:
+    def test_spawned_workers_inherit_limits(self, monkeypatch):
+        monkeypatch.setenv("OMP_NUM_THREADS", "8")
+        with worker_threads(2), ProcessPoolExecutor(1, mp_context=mp.get_context("spawn")) as pool:
+            assert pool.submit(_omp_threads).result() == "2"
+        assert os.environ["OMP_NUM_THREADS"] == "8"
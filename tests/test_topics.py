@@ -0,0 +1,136 @@
+"""
+Tests for the keyword topic fallback, sample fits, refit triggers and topic exports.
+"""
+
+import pandas as pd
+
+import src.analysis.topics as topics
+from src.analysis.topics import (
+    adjusted_rand_index,
+    keyword_topics,
+    needs_refit,
+    stratified_sample,
+    topic_drift,
+    topic_slices,
+)
+from src.utils.db import get_connection, init_database
+
+THRESHOLDS = {"min_posts": 4, "max_outlier_share": 0.5, "max_drift": 0.3}
+STORED = [0, 0, 1, 1, -1]
+
+
+class TestDrift:
+    def test_same_shares_ignoring_outliers(self):
+        assert topic_drift([0, 1, -1, -1], STORED) == 0.0
+
+    def test_disjoint_shares(self):
+        assert topic_drift([2, 2], STORED) == 1.0
+
+
+class TestNeedsRefit:
+    def test_matching_batch_is_assigned(self):
+        assert needs_refit([0, 1, 1, 0], STORED, THRESHOLDS) is None
+
+    def test_outliers_trigger_refit(self):
+        assert "outlier share" in needs_refit([-1, -1, -1, 0], STORED, THRESHOLDS)
+
+    def test_drift_triggers_refit(self):
+        assert "drift" in needs_refit([0, 0, 0, 0], STORED, THRESHOLDS)
+
+    def test_small_batches_never_refit(self):
+        assert needs_refit([-1, -1, -1], STORED, THRESHOLDS) is None
+
+
+class TestKeywordTopics:
+    def test_word_boundaries(self):
+        # 'ice' in 'police' and 'ap' in 'apartment' are not keyword hits
+        out = keyword_topics(pd.Series(["Police at the apartment", "ICE agents, AP says"]))
+        assert out["topic_id"].tolist() == [2, 0]
+        assert out["topic_prob"].tolist() == [0.2, 0.4]
+
+    def test_contained_keywords_still_count(self):
+        out = keyword_topics(pd.Series(["Know your rights, call a lawyer"]))
+        assert out.loc[0, "topic_label"] == "Legal Aid & Rights"
+        assert out.loc[0, "topic_prob"] == 0.6
+
+    def test_outliers_and_alignment(self):
+        out = keyword_topics(pd.Series(["nothing to see", None], index=[7, 3]))
+        assert out["topic_id"].tolist() == [-1, -1]
+        assert out["top_terms"].tolist() == [["outlier"], ["outlier"]]
+
+
+class TestSampleFit:
+    def test_stratified_sample_keeps_every_stratum(self):
+        df = pd.DataFrame(
+            {
+                "phase": ["pre"] * 90 + ["post"] * 10,
+                "platform": ["reddit"] * 95 + ["news_comment"] * 5,
+            },
+            index=range(100, 200),
+        )
+        picked = df.loc[stratified_sample(df, 20)]
+        counts = picked.groupby(["phase", "platform"]).size()
+        assert counts[("pre", "reddit")] == 18 and len(counts) == 3
+        assert picked.index.is_unique and picked.index.isin(df.index).all()
+        assert stratified_sample(df, 500).equals(df.index)
+
+    def test_adjusted_rand_index(self):
+        assert adjusted_rand_index([0, 0, 1, 1], [5, 5, -1, -1]) == 1.0
+        assert adjusted_rand_index([0, 0, 1, 1], [0, 1, 0, 1]) < 0
+
+
+class TestTopicSlices:
+    def test_counts_shares_and_terms(self):
+        df = pd.DataFrame(
+            {
+                "topic_id": [0, 0, 1, 0],
+                "topic_label": ["Raids", "Raids", "Aid", "Raids"],
+                "phase": ["raid", "raid", "raid", "aftermath"],
+                "text_clean": [
+                    "Agents at the school",
+                    "More agents on the block",
+                    "Donate to the fund",
+                    "The door is still broken",
+                ],
+            }
+        )
+        out = topic_slices(df, "phase").set_index(["phase", "topic_id"])
+        assert out.loc[("raid", 0), "n_posts"] == 2
+        assert out.loc[("raid", 0), "share"] == 2 / 3
+        assert out.loc[("aftermath", 0), "share"] == 1.0
+        # Terms are per slice: the raid-phase slice is led by its shared word, no stopwords
+        assert out.loc[("raid", 0), "terms"][0] == "agents"
+        assert "the" not in out.loc[("raid", 1), "terms"]
+
+
+class TestAssignMode:
+    def test_missing_model_refits(self, tmp_path, monkeypatch):
+        db = tmp_path / "topics.duckdb"
+        init_database(db)
+        conn = get_connection(db)
+        conn.executemany(
+            "INSERT INTO posts_clean "
+            "(id, text_clean, dt_utc, phase, word_count, is_duplicate, quality_flag) "
+            "VALUES (?, ?, '2025-10-01 12:00:00+00', 'event', 6, false, 'ok')",
+            [("p1", "Agents came to the school today"), ("p2", "Donate to the mutual aid fund")],
+        )
+        conn.close()
+        fits = []
+
+        def fit_topics(df, min_topic_size, sample_size=None):
+            fits.append(sorted(df["id"]))
+            topics._label_keywords(df)
+
+        monkeypatch.setattr(topics, "MODEL_DIR", tmp_path / "no_model")
+        monkeypatch.setattr(topics, "PROJECT_ROOT", tmp_path)
+        monkeypatch.setattr(topics, "EXPORTS_DIR", tmp_path / "exports")
+        monkeypatch.setattr(topics, "update_index", lambda: None)
+        monkeypatch.setattr(topics, "init_database", lambda: init_database(db))
+        monkeypatch.setattr(topics, "get_connection", lambda: get_connection(db))
+        monkeypatch.setattr(topics, "fit_topics", fit_topics)
+        topics.run_topic_modeling(mode="assign", sample_size=None)
+
+        assert fits == [["p1", "p2"]]
+        conn = get_connection(db)
+        assert conn.execute("SELECT COUNT(*) FROM posts_topics").fetchone()[0] == 2
+        conn.close()
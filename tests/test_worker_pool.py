@@ -0,0 +1,26 @@
+"""
+Tests for sharded multi-process inference.
+"""
+
+import numpy as np
+import pytest
+
+from src.analysis.worker_pool import InferencePool, plan_shards
+
+
+class TestPlanShards:
+    def test_shards_are_sorted_key_ranges(self):
+        keys = ["d", "a", "f", "b", "e", "c"]
+        shards = plan_shards(keys, shard_size=2)
+        ranges = [[keys[i] for i in shard] for shard in shards]
+        assert ranges == [["a", "b"], ["c", "d"], ["e", "f"]]
+
+    def test_covers_every_position_once(self):
+        keys = [f"{i:04x}" for i in np.random.default_rng(0).permutation(100)]
+        flat = np.concatenate(plan_shards(keys, shard_size=7))
+        assert sorted(flat.tolist()) == list(range(100))
+
+
+def test_unknown_model_rejected():
+    with pytest.raises(ValueError):
+        InferencePool("bert-of-theseus")